@@ -0,0 +1,54 @@
+#!/bin/bash
+
+# Set (or reset) the RAPL power limit of every DRAM zone.
+# Usage: ./dram_setup.sh <watts|reset>      (0 is the same as reset)
+# The first set saves each zone's limit and enabled flag to SAVED_STATE;
+# reset puts them back.
+# Requires root privileges and the intel_rapl powercap driver.
+
+POWERCAP_ROOT="/sys/class/powercap"
+SAVED_STATE="${DRAM_SAVED_STATE:-/tmp/dram_setup.saved}"
+
+if [[ $EUID -ne 0 ]]; then
+   echo "This script must be run as root"
+   exit 1
+fi
+
+if [ $# -ne 1 ]; then
+    echo "Usage: $0 <watts|reset>"
+    exit 1
+fi
+
+ZONES=$(grep -lx dram "${POWERCAP_ROOT}"/intel-rapl:*:*/name 2>/dev/null | xargs -r -n1 dirname)
+if [ -z "$ZONES" ]; then
+    echo "Error: no DRAM RAPL zone under ${POWERCAP_ROOT} (no DRAM domain on this CPU?)."
+    exit 1
+fi
+
+if [ "$1" = "reset" ] || [ "$1" = "0" ]; then
+    if [ ! -f "$SAVED_STATE" ]; then
+        echo "No saved DRAM limits (${SAVED_STATE}): nothing to reset."
+        exit 0
+    fi
+    while read -r dir limit enabled; do
+        echo "$limit" > "${dir}/constraint_0_power_limit_uw"
+        echo "$enabled" > "${dir}/enabled"
+    done < "$SAVED_STATE"
+    rm -f "$SAVED_STATE"
+    exit 0
+fi
+
+# Save the settings in effect before the first change only
+if [ ! -f "$SAVED_STATE" ]; then
+    for dir in $ZONES; do
+        echo "$dir $(cat "${dir}/constraint_0_power_limit_uw") $(cat "${dir}/enabled")"
+    done > "$SAVED_STATE"
+fi
+
+for dir in $ZONES; do
+    hw_max=$(cat "${dir}/constraint_0_max_power_uw")
+    target=$(( $1 * 1000000 ))
+    (( hw_max > 0 && target > hw_max )) && target=$hw_max
+    echo "$target" > "${dir}/constraint_0_power_limit_uw"
+    echo 1 > "${dir}/enabled"
+done
@@ -0,0 +1,39 @@
+#!/bin/bash
+
+# Set (or reset) the uncore frequency cap on every package/die through
+# the intel_uncore_frequency driver.
+# Usage: ./uncore_setup.sh <max_khz|reset>
+# Requires root privileges and the intel_uncore_frequency module.
+
+UNCORE_ROOT="/sys/devices/system/cpu/intel_uncore_frequency"
+
+if [[ $EUID -ne 0 ]]; then
+   echo "This script must be run as root"
+   exit 1
+fi
+
+if [ $# -ne 1 ]; then
+    echo "Usage: $0 <max_khz|reset>"
+    exit 1
+fi
+
+if ! ls -d "${UNCORE_ROOT}"/package_*_die_* > /dev/null 2>&1; then
+    echo "Error: ${UNCORE_ROOT} not found (modprobe intel_uncore_frequency)."
+    exit 1
+fi
+
+for dir in "${UNCORE_ROOT}"/package_*_die_*; do
+    hw_min=$(cat "${dir}/initial_min_freq_khz")
+    hw_max=$(cat "${dir}/initial_max_freq_khz")
+    if [ "$1" = "reset" ]; then
+        echo "$hw_max" > "${dir}/max_freq_khz"
+        echo "$hw_min" > "${dir}/min_freq_khz"
+        continue
+    fi
+    target=$1
+    (( target > hw_max )) && target=$hw_max
+    (( target < hw_min )) && target=$hw_min
+    # max_freq_khz may not go below min_freq_khz
+    echo "$hw_min" > "${dir}/min_freq_khz"
+    echo "$target" > "${dir}/max_freq_khz"
+done
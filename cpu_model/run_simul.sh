@@ -10,6 +10,17 @@ MAX_RAPL_FILE="/sys/class/powercap/intel-rapl/intel-rapl:0/constraint_0_max_powe
 # Define MINIMUM and DECREMENT as **INTEGERS**
 MIN_RAPL_W=5
 RAPL_DECREMENT=20
+# Uncore frequency caps to sweep, in kHz (space separated), e.g.
+#   UNCORE_FREQS_KHZ="2400000 1800000 1200000" ./run_simul.sh
+# Empty: the uncore is left alone and data.dat keeps its 6 columns.
+# Otherwise every line gets a 7th column with the uncore cap.
+UNCORE_FREQS_KHZ="${UNCORE_FREQS_KHZ:-}"
+# DRAM RAPL limits to sweep, in W (space separated, 0 = uncapped), e.g.
+#   DRAM_LIMITS_W="0 15 10 5" ./run_simul.sh
+# Set: every line gets a 7th column with the uncore cap (0 when not swept),
+# an 8th with the DRAM limit and a 9th with the measured DRAM power (W),
+# since poll_simul only reports package power.
+DRAM_LIMITS_W="${DRAM_LIMITS_W:-}"
 
 # --- Basic Setup & Checks ---
 set -e # Exit script immediately if any command fails
@@ -52,6 +63,21 @@ fi
 echo "Using Max RAPL (Integer): $MAX_RAPL_W W, Min RAPL: $MIN_RAPL_W W, Decrement: $RAPL_DECREMENT W"
 
 
+# DRAM zones and their energy counters, for the measured DRAM power
+DRAM_ZONES=$(grep -lx dram /sys/class/powercap/intel-rapl:*:*/name 2>/dev/null | xargs -r -n1 dirname)
+if [ -n "$DRAM_LIMITS_W" ] && [ -z "$DRAM_ZONES" ]; then
+    echo "Error: DRAM_LIMITS_W is set but there is no DRAM RAPL zone."
+    exit 1
+fi
+dram_energy() {   # "<energy_uj> <max_energy_range_uj>" per DRAM zone
+    for z in $DRAM_ZONES; do echo "$(cat "$z/energy_uj") $(cat "$z/max_energy_range_uj")"; done
+}
+dram_watts() {    # <energy before> <energy after> <start time> <end time>
+    paste -d' ' <(echo "$1") <(echo "$2") | awk -v t0="$3" -v t1="$4" '
+        { d = $3 - $1; if (d < 0) d += $2; uj += d }   # counter wrapped
+        END { sec = t1 - t0; printf "%.2f", (sec > 0 ? uj / sec / 1e6 : 0) }'
+}
+
 # --- Prepare Output File ---
 echo "Clearing previous results in $OUTPUT_FILE..."
 > "$OUTPUT_FILE"
@@ -67,11 +93,32 @@ for (( num_cores=TOTAL_ACTIVE_CORES; num_cores>=1; num_cores-- )); do
 
         # Loop RAPL Power (Integer Watts): Max down by 20, stops when less than Min
         for (( rapl_w = MAX_RAPL_W; rapl_w >= MIN_RAPL_W; rapl_w -= RAPL_DECREMENT )); do
+          # Loop Uncore: one pass with the uncore untouched unless a sweep is set
+          for uncore_khz in ${UNCORE_FREQS_KHZ:-none}; do
+          # Loop DRAM: one pass with the DRAM limit untouched unless a sweep is set
+          for dram_w in ${DRAM_LIMITS_W:-none}; do
             # Execute the simulation command
             # Output from poll_simul is appended directly to the file
 	    ./init_cgroup_rapl.sh
 	    ./resctl.sh $num_cores $bandwidth $rapl_w
-            "$POLL_SIMUL_EXEC" "$TOTAL_ACTIVE_CORES" "$RUN_SECONDS" "$num_cores" "$bandwidth" "$rapl_w" >> "$OUTPUT_FILE"
+            if [ "$dram_w" != "none" ]; then
+                [ "$uncore_khz" != "none" ] && ./uncore_setup.sh "$uncore_khz"
+                ./dram_setup.sh "$dram_w"
+                e0=$(dram_energy); t0=$(date +%s.%N)
+                out=$("$POLL_SIMUL_EXEC" "$TOTAL_ACTIVE_CORES" "$RUN_SECONDS" "$num_cores" "$bandwidth" "$rapl_w")
+                e1=$(dram_energy); t1=$(date +%s.%N)
+                dram_meas=$(dram_watts "$e0" "$e1" "$t0" "$t1")
+                uncore_col=$([ "$uncore_khz" = "none" ] && echo 0 || echo "$uncore_khz")
+                echo "$out" | sed "s/\$/,${uncore_col},${dram_w},${dram_meas}/" >> "$OUTPUT_FILE"
+            elif [ "$uncore_khz" = "none" ]; then
+                "$POLL_SIMUL_EXEC" "$TOTAL_ACTIVE_CORES" "$RUN_SECONDS" "$num_cores" "$bandwidth" "$rapl_w" >> "$OUTPUT_FILE"
+            else
+                ./uncore_setup.sh "$uncore_khz"
+                "$POLL_SIMUL_EXEC" "$TOTAL_ACTIVE_CORES" "$RUN_SECONDS" "$num_cores" "$bandwidth" "$rapl_w" \
+                    | sed "s/\$/,${uncore_khz}/" >> "$OUTPUT_FILE"
+            fi
+          done # End DRAM loop
+          done # End Uncore loop
             # If a command fails, 'set -e' will cause the script to exit.
             # Remove 'set -e' and add error handling here if you want it to continue.
             # Example: || echo "Warning: Failed Cores=$num_cores BW=$bandwidth RAPL=$rapl_w"
@@ -81,6 +128,9 @@ for (( num_cores=TOTAL_ACTIVE_CORES; num_cores>=1; num_cores-- )); do
     done # End Bandwidth loop
 done # End Cores loop
 
+[ -n "$UNCORE_FREQS_KHZ" ] && ./uncore_setup.sh reset
+[ -n "$DRAM_LIMITS_W" ] && ./dram_setup.sh reset
+
 echo "Evaluation complete. Results are in $OUTPUT_FILE"
 
 exit 0
@@ -36,10 +36,18 @@ def main():
                    help="latency metric to minimize")
     p.add_argument("--resctl", default="./resctl.sh",
                    help="path to resctl.sh script")
+    p.add_argument("--uncore", default="./uncore_setup.sh",
+                   help="path to uncore_setup.sh script")
+    p.add_argument("--dram", default="./dram_setup.sh",
+                   help="path to dram_setup.sh script")
     args = p.parse_args()
 
     df = pd.read_csv(args.data, header=None,
-                     names=["cores","bandwidth","rapl","power","p50","p99"])
+                     names=["cores","bandwidth","rapl","power","p50","p99","uncore",
+                            "dram_limit","dram_power"])
+    # data.dat from a DRAM_LIMITS_W sweep: count the measured DRAM power too
+    if df.dram_power.notna().any():
+        df["power"] = df.power + df.dram_power.fillna(0)
     frontier = pareto_frontier(df, args.metric)
     best = select_best(frontier, args.budget)
 
@@ -58,10 +66,30 @@ def main():
         print(f"Error: {args.resctl} exited with {ret.returncode}", file=sys.stderr)
         sys.exit(ret.returncode)
 
+    # data.dat from an UNCORE_FREQS_KHZ sweep carries the uncore cap too
+    uncore = int(best.uncore) if pd.notna(best.uncore) and best.uncore > 0 else None
+    if uncore is not None:
+        ret = subprocess.run([args.uncore, str(uncore)])
+        if ret.returncode != 0:
+            print(f"Error: {args.uncore} exited with {ret.returncode}", file=sys.stderr)
+            sys.exit(ret.returncode)
+
+    # ... and from a DRAM_LIMITS_W sweep the DRAM limit (0 = uncapped)
+    dram = int(best.dram_limit) if pd.notna(best.dram_limit) else None
+    if dram is not None:
+        ret = subprocess.run([args.dram, str(dram)])
+        if ret.returncode != 0:
+            print(f"Error: {args.dram} exited with {ret.returncode}", file=sys.stderr)
+            sys.exit(ret.returncode)
+
     print("Applied optimal config:")
     print(f"  cores       : {cores}")
     print(f"  bandwidth   : {bw_pct}%")
     print(f"  RAPL limit  : {rapl_lim} W")
+    if uncore is not None:
+        print(f"  uncore max  : {uncore} kHz")
+    if dram is not None:
+        print(f"  DRAM limit  : {f'{dram} W' if dram else 'none'}")
 
 if __name__ == "__main__":
     main()
@@ -34,7 +34,11 @@ def main():
     args = p.parse_args()
 
     df = pd.read_csv(args.data, header=None,
-                     names=["cores","bandwidth","rapl","power","p50","p99"])
+                     names=["cores","bandwidth","rapl","power","p50","p99","uncore",
+                            "dram_limit","dram_power"])
+    # data.dat from a DRAM_LIMITS_W sweep: count the measured DRAM power too
+    if df.dram_power.notna().any():
+        df["power"] = df.power + df.dram_power.fillna(0)
     frontier = pareto_frontier(df, args.metric)
     best = select_best(frontier, args.budget)
 
@@ -46,6 +50,11 @@ def main():
     print(f"  cores       : {int(best.cores)}")
     print(f"  bandwidth   : {best.bandwidth}")
     print(f"  RAPL limit  : {best.rapl}")
+    if pd.notna(best.uncore) and best.uncore > 0:   # from an UNCORE_FREQS_KHZ sweep
+        print(f"  uncore max  : {int(best.uncore)} kHz")
+    if pd.notna(best.dram_limit):   # data.dat from a DRAM_LIMITS_W sweep
+        dram = int(best.dram_limit)
+        print(f"  DRAM limit  : {f'{dram} W' if dram else 'none'} ({best.dram_power:.2f} W measured)")
     print(f"  power       : {best.power:.2f} W")
     print(f"  {args.metric} latency: {best[args.metric]:.2f} ms")
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Parallel, deadline-bounded actuator execution.
+
+Knob changes that do not depend on each other (RAPL, SPDK cpumask,
+cpu.max, SSD QoS …) run concurrently in a small thread pool.  Each one:
+
+  • gets a deadline; the setter receives the remaining time as
+    `timeout=` and must pass it on to subprocess.run
+  • is retried with a short back-off while time remains
+  • reports an outcome dict:
+        {"status": ok | failed | timeout | rolled_back | rollback_failed,
+         "attempts": n, "elapsed": seconds, "error": str or None}
+
+If some changes succeed and others do not, the successful ones are
+rolled back to their previous value (when the caller supplied one), so
+the knobs stay on a state the policy table actually describes.
+A hung subsystem only costs its own deadline; the others still finish.
+"""
+
+import time, subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+DEADLINE_SEC      = 2.0      # per change, including retries
+RETRIES           = 2        # extra attempts after the first failure
+RETRY_BACKOFF_SEC = 0.05     # grows linearly with the attempt number
+MAX_WORKERS       = 8
+
+# ----------------------------------------------------------------------
+
+class ActuationEngine:
+    """
+    Example:
+        engine   = ActuationEngine()
+        outcomes = engine.apply([
+            {"name": "rapl",  "fn": set_cpu_powercap, "value": 110, "old": 150},
+            {"name": "cores", "fn": set_spdk_cpumask, "value": 4,   "old": 8},
+        ])
+        if engine.all_ok(outcomes): ...
+    """
+
+    def __init__(self, deadline: float = DEADLINE_SEC, retries: int = RETRIES,
+                 rollback: bool = True, max_workers: int = MAX_WORKERS):
+        self.deadline = deadline
+        self.retries  = retries
+        self.rollback = rollback
+        self.pool     = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="actuator")
+
+    def _attempt(self, fn, value, deadline_t):
+        t0, attempts, error = time.monotonic(), 0, None
+        while True:
+            remaining = deadline_t - time.monotonic()
+            if remaining <= 0:
+                return {"status": "timeout", "attempts": attempts,
+                        "elapsed": time.monotonic() - t0, "error": error}
+            attempts += 1
+            try:
+                fn(value, timeout=remaining)
+                return {"status": "ok", "attempts": attempts,
+                        "elapsed": time.monotonic() - t0, "error": None}
+            except subprocess.TimeoutExpired as e:
+                return {"status": "timeout", "attempts": attempts,
+                        "elapsed": time.monotonic() - t0, "error": str(e)}
+            except Exception as e:
+                error = str(e)
+            if attempts > self.retries:
+                return {"status": "failed", "attempts": attempts,
+                        "elapsed": time.monotonic() - t0, "error": error}
+            time.sleep(max(min(RETRY_BACKOFF_SEC * attempts,
+                               deadline_t - time.monotonic()), 0))
+
+    def _run_all(self, changes, value_key):
+        """Run every change concurrently; never wait past the latest deadline."""
+        start   = time.monotonic()
+        futures = {}
+        for c in changes:
+            deadline_t = start + c.get("deadline", self.deadline)
+            futures[self.pool.submit(self._attempt, c["fn"], c[value_key], deadline_t)] = c
+        limit = max((c.get("deadline", self.deadline) for c in changes), default=0)
+        done, _ = wait(futures, timeout=limit + 0.05)
+        outcomes = {}
+        for fut, c in futures.items():
+            if fut in done:
+                outcomes[c["name"]] = fut.result()
+            else:   # setter ignored its timeout; leave it running, report it
+                outcomes[c["name"]] = {"status": "timeout", "attempts": 1,
+                                       "elapsed": time.monotonic() - start,
+                                       "error": "deadline exceeded"}
+        return outcomes
+
+    def apply(self, changes):
+        """
+        changes: [{"name", "fn", "value", "old" (None: no rollback),
+                   "deadline" (optional)}]
+        Returns {name: outcome}.
+        """
+        if not changes:
+            return {}
+        outcomes = self._run_all(changes, "value")
+        ok = [c for c in changes if outcomes[c["name"]]["status"] == "ok"]
+        if not self.rollback or len(ok) == len(changes):
+            return outcomes
+
+        undo = [c for c in ok if c.get("old") is not None]
+        for name, res in self._run_all(undo, "old").items():
+            outcomes[name]["status"] = "rolled_back" if res["status"] == "ok" \
+                                       else "rollback_failed"
+            if res["error"]:
+                outcomes[name]["error"] = res["error"]
+        return outcomes
+
+    @staticmethod
+    def all_ok(outcomes) -> bool:
+        return all(o["status"] == "ok" for o in outcomes.values())
+
+    @staticmethod
+    def format(outcomes) -> str:
+        return ", ".join(f"{n}={o['status']}({o['elapsed'] * 1000:.0f} ms"
+                         + (f", {o['error']}" if o["error"] else "") + ")"
+                         for n, o in outcomes.items())
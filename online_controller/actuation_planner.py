@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Actuation planner: fewer, cheaper knob changes.
+
+  • KnobCosts keeps a measured cost per knob: EWMA of the actuation
+    latency reported by the engine, plus the EWMA throughput dip seen on
+    the tick after the knob changed (weighted as seconds of lost I/O)
+  • hold() adds a hysteresis band around policy-row boundaries whose
+    width grows with the cost of the knobs the switch would touch
+  • quantize_qos() rounds SSD limits to a fixed MiB/s grid and
+    qos_delta() / states_delta() keep only the drives whose setting
+    actually changes
+  • PendingChanges merges every change requested during a tick (latest
+    value per knob wins) into one batch for the actuation engine
+"""
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+COST_ALPHA          = 0.3      # EWMA weight of a new cost sample
+DIP_WEIGHT_SEC      = 1.0      # 100 % throughput dip ≙ this many seconds of cost
+HYSTERESIS_BASE_W   = 3.0      # band around a policy boundary (W)
+HYSTERESIS_W_PER_SEC = 10.0    # extra band per second of switch cost
+QOS_QUANTUM_MIB     = 50       # SSD limits are multiples of this (MiB/s)
+
+# ----------------------------------------------------------------------
+
+class KnobCosts:
+    """
+    Example:
+        costs = KnobCosts()
+        costs.observe_outcomes(engine_outcomes)        # after each apply
+        costs.mark(["rapl", "ssd"], bandwidth_mib)     # knobs changed this tick
+        costs.observe_throughput(bandwidth_mib)        # next tick
+        costs.cost(["rapl"])                           # seconds
+    """
+
+    def __init__(self, alpha: float = COST_ALPHA):
+        self.alpha    = alpha
+        self.latency  = {}       # knob -> EWMA seconds
+        self.dip      = {}       # knob -> EWMA fraction of throughput lost
+        self._pending = None     # (knobs, bandwidth before)
+
+    def _ewma(self, table, knob, value):
+        old = table.get(knob)
+        table[knob] = value if old is None else (1 - self.alpha) * old + self.alpha * value
+
+    def observe_outcomes(self, outcomes):
+        for knob, o in outcomes.items():
+            if o["status"] == "ok":
+                self._ewma(self.latency, knob, o["elapsed"])
+
+    def mark(self, knobs, bandwidth_before):
+        """Knobs changed this tick, with the I/O bandwidth just before."""
+        self._pending = (list(knobs), bandwidth_before) if knobs else None
+
+    def observe_throughput(self, bandwidth_now):
+        if self._pending is None or bandwidth_now is None:
+            return
+        knobs, before = self._pending
+        self._pending = None
+        if before:
+            dip = min(max((before - bandwidth_now) / before, 0.0), 1.0)
+            for knob in knobs:
+                self._ewma(self.dip, knob, dip)
+
+    def cost(self, knobs) -> float:
+        """Seconds-equivalent cost of changing `knobs` together."""
+        return sum(self.latency.get(k, 0.0) + DIP_WEIGHT_SEC * self.dip.get(k, 0.0)
+                   for k in knobs)
+
+    def summary(self) -> str:
+        return ", ".join(f"{k}={self.latency.get(k, 0) * 1000:.0f}ms/"
+                         f"{self.dip.get(k, 0) * 100:.0f}%"
+                         for k in sorted(set(self.latency) | set(self.dip)))
+
+
+def changed_knobs(current, nxt, knobs):
+    return [k for k in knobs if current is None or nxt[k] != current.get(k)]
+
+def hold(current, nxt, target_power, knobs, costs: KnobCosts) -> bool:
+    """
+    True if the switch current → nxt should be skipped because
+    target_power is still within the hysteresis band of current["power"].
+    Rows are picked at or below the target, so a step down crosses
+    current["power"] itself and a step up crosses the row just above
+    current (1 W away in the dense part of the table); nxt["power"] is
+    no boundary, as nxt is wherever the target landed.
+    """
+    if current is None or nxt is current:
+        return False
+    changed = changed_knobs(current, nxt, knobs)
+    if not changed:
+        return False
+    band = HYSTERESIS_BASE_W + HYSTERESIS_W_PER_SEC * costs.cost(changed)
+    return abs(target_power - current["power"]) < band
+
+
+def quantize_qos(mibs, quantum: int = QOS_QUANTUM_MIB):
+    """Round limits to the grid (0 stays 0 = unlimited, never below one quantum)."""
+    return [0 if m <= 0 else max(int(round(m / quantum)) * quantum, quantum) for m in mibs]
+
+def qos_delta(devices, applied, target):
+    """
+    {device: (read_mibs, write_mibs)} for drives whose limits change.
+    applied / target: (read_mibs, write_mibs) lists with 0 = unlimited,
+    or None for all unlimited.
+    """
+    n = len(devices)
+    old = list(zip(*applied)) if applied else [(0, 0)] * n
+    new = list(zip(*target))  if target  else [(0, 0)] * n
+    return {d: tuple(new[i]) for i, d in enumerate(devices) if tuple(new[i]) != tuple(old[i])}
+
+def states_delta(applied, target, n: int):
+    """Per-drive power states to send (None: unchanged), or None if nothing changes."""
+    old = applied or [0] * n
+    new = target  or [0] * n
+    delta = [s if s != o else None for s, o in zip(new, old)]
+    return delta if any(s is not None for s in delta) else None
+
+
+class PendingChanges:
+    """
+    Example:
+        pending = PendingChanges()
+        pending.add({"name": "ssd", "fn": set_ssd_qos, "value": delta1, "old": None})
+        pending.add({"name": "ssd", "fn": set_ssd_qos, "value": delta2, "old": None})
+        outcomes = engine.apply(pending.flush())      # one batch, delta2 only
+    """
+
+    def __init__(self):
+        self._changes = {}
+
+    def add(self, change):
+        prev = self._changes.get(change["name"])
+        if prev is not None and prev.get("old") is not None:
+            change = {**change, "old": prev["old"]}   # roll back to the pre-tick value
+        self._changes[change["name"]] = change
+
+    def __bool__(self):
+        return bool(self._changes)
+
+    def flush(self):
+        changes, self._changes = list(self._changes.values()), {}
+        return changes
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Timed budget schedules executed inside the controller.
+
+A schedule file lists budget steps, one per line:
+
+    # offset_sec  watts        (offsets from the schedule start)
+    0     400
+    120   360
+    240   300
+    @1767225600.0  400         (or an absolute Unix time)
+
+An optional `start <unix time>` line pins the start (several controllers
+or hosts can share one); without it the schedule starts when it is
+started.  A background thread switches the budget at each step time,
+sleeping on the monotonic clock, and appends the actual step time to a
+CSV log for analysis.  Every row names the controller and the run (its
+schedule start as Unix time), so several runs and controllers can share
+one log; unix_time is absolute, to align steps with a power trace.
+"""
+
+import threading, time
+from pathlib import Path
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+STEP_LOG = Path("./budget_steps.csv")
+STEP_LOG_HEADER = "controller,run_start_unix,planned_sec,actual_sec,unix_time,watts"
+
+# ----------------------------------------------------------------------
+
+def load_schedule(path: Path):
+    """-> (start unix time or None, [(offset_sec or None, unix time or None, watts)])"""
+    start, steps = None, []
+    with open(path) as f:
+        for n, raw in enumerate(f, 1):
+            line = raw.split("#", 1)[0].replace(",", " ").split()
+            if not line:
+                continue
+            if line[0] == "start":
+                start = float(line[1])
+                continue
+            if len(line) != 2:
+                raise ValueError(f"{path}:{n}: expected '<offset|@unix_time> <watts>'")
+            when, watts = line[0], float(line[1])
+            watts = int(watts) if watts.is_integer() else watts
+            if when.startswith("@"):
+                steps.append((None, float(when[1:]), watts))
+            else:
+                steps.append((float(when), None, watts))
+    if not steps:
+        raise ValueError(f"{path}: no budget steps")
+    return start, steps
+
+
+class BudgetSchedule:
+    """
+    Example:
+        sched = BudgetSchedule(Path("fig13.schedule"), controller="pass").start()
+        budget = sched.current()       # watts of the latest step (None before the first)
+    """
+
+    def __init__(self, path: Path, step_log: Path = STEP_LOG, tag: str = "schedule",
+                 controller: str = None):
+        self.path     = Path(path)
+        self.step_log = Path(step_log) if step_log is not None else None
+        self.tag      = tag
+        self.controller = controller or tag
+        self.start_unix, self.steps = load_schedule(self.path)
+        self.watts    = None
+        self.applied  = []            # (planned_sec, actual_sec, unix_time, watts)
+        self._stop    = threading.Event()
+
+    def start(self, start_unix: float = None):
+        start_unix = start_unix or self.start_unix or time.time()
+        # Map the wall-clock start onto the monotonic clock once
+        self.t0_mono = time.monotonic() + (start_unix - time.time())
+        self.t0_unix = start_unix
+        plan = sorted((off if off is not None else at - start_unix, w)
+                      for off, at, w in self.steps)
+        if self.step_log is not None:
+            self._open_log()
+        # Steps already due at start: only the latest counts
+        due = [s for s in plan if s[0] <= time.monotonic() - self.t0_mono]
+        if due:
+            self._step(*due[-1])
+        threading.Thread(target=self._run, args=(plan[len(due):],), daemon=True,
+                         name="budget-schedule").start()
+        return self
+
+    def _open_log(self):
+        """Start the log, or keep appending if it already has this format."""
+        if self.step_log.exists():
+            with open(self.step_log) as f:
+                if f.readline().strip() == STEP_LOG_HEADER:
+                    return
+            # untagged rows from an older format cannot be told apart
+            self.step_log.replace(self.step_log.with_name(self.step_log.name + ".old"))
+        self.step_log.write_text(STEP_LOG_HEADER + "\n")
+
+    def _run(self, plan):
+        for planned, watts in plan:
+            while not self._stop.is_set():
+                remaining = self.t0_mono + planned - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._stop.wait(min(remaining, 1.0))
+            if self._stop.is_set():
+                return
+            self._step(planned, watts)
+
+    def _step(self, planned, watts):
+        actual = time.monotonic() - self.t0_mono
+        self.watts = watts
+        rec = (planned, actual, self.t0_unix + actual, watts)
+        self.applied.append(rec)
+        print(f"[{self.tag}] budget step -> {watts:g} W at +{actual:.3f} s "
+              f"(planned +{planned:.3f} s)", flush=True)
+        if self.step_log is not None:
+            with open(self.step_log, "a") as f:
+                f.write("%s,%.6f,%.3f,%.6f,%.6f,%g\n" % ((self.controller, self.t0_unix) + rec))
+
+    def current(self):
+        return self.watts
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Crash-safe controller checkpoint.
+
+The controller writes its state every tick.  Writes go to a temporary
+file in the same directory, are fsync'ed and then renamed over the
+checkpoint, so a crash at any point leaves either the old or the new
+state on disk, never a torn file.  On restart a checkpoint younger than
+`max_age` seconds lets the controller resume instead of resetting every
+knob to full power.
+"""
+
+import json, os, tempfile, time
+from pathlib import Path
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path: Path, state: dict):
+    """Atomically replace `path` with `state` (plus version and timestamp)."""
+    path = Path(path)
+    payload = {"version": CHECKPOINT_VERSION, "saved_at": time.time(), **state}
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    # make the rename itself durable
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def load_checkpoint(path: Path, max_age: float):
+    """
+    Return the saved state if it exists, parses, matches this version and
+    is at most `max_age` seconds old; otherwise None.
+    """
+    try:
+        with Path(path).open() as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != CHECKPOINT_VERSION:
+        return None
+    age = time.time() - state.get("saved_at", 0)
+    if not 0 <= age <= max_age:
+        return None
+    state["age"] = age
+    return state
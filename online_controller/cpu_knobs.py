@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+sysfs-backed CPU and memory actuators for the online controller.
+
+Every knob takes a `root` (default /sys) so it can be exercised against
+a fake sysfs tree, remembers the values it found at start-up, and puts
+them back with restore() when the controller exits.
+"""
+
+import time
+from pathlib import Path
+
+SYSFS_ROOT = Path("/sys")
+
+
+def _read(path: Path) -> str:
+    return path.read_text().strip()
+
+def _write(path: Path, value):
+    with open(path, "w") as f:
+        f.write(str(value))
+
+
+class CpuFreqKnob:
+    """
+    Per-core DVFS for the SPDK CPUs (cpufreq scaling_max_freq, plus
+    scaling_setspeed when the `userspace` governor is active, as in
+    cpu_model/single_socket_dvfs/resctl.sh).
+
+    The governor is only switched by activate(), so building the knob
+    writes nothing.
+
+    Example:
+        freq = CpuFreqKnob(cpus=range(8), userspace=True)
+        freq.activate()       # userspace governor from here on
+        freq.set(2000000)     # kHz; 0 -> back to cpuinfo_max_freq
+        freq.restore()
+    """
+
+    def __init__(self, cpus, userspace: bool = False, root: Path = SYSFS_ROOT):
+        self.dirs = {}
+        for cpu in cpus:
+            d = Path(root) / f"devices/system/cpu/cpu{cpu}/cpufreq"
+            if (d / "scaling_max_freq").exists():
+                self.dirs[cpu] = d
+        self.saved = {cpu: {"governor": _read(d / "scaling_governor"),
+                            "max": _read(d / "scaling_max_freq")}
+                      for cpu, d in self.dirs.items()}
+        self.userspace = userspace
+        self.active    = False
+
+    def activate(self):
+        """Switch the SPDK CPUs to the userspace governor (if requested)."""
+        if self.userspace and not self.active:
+            for d in self.dirs.values():
+                _write(d / "scaling_governor", "userspace")
+            self.active = True
+
+    @property
+    def available(self) -> bool:
+        return bool(self.dirs)
+
+    def set(self, khz: int, timeout=None):
+        """Cap (and with userspace, pin) every SPDK CPU at `khz`."""
+        for d in self.dirs.values():
+            hw_min = int(_read(d / "cpuinfo_min_freq"))
+            hw_max = int(_read(d / "cpuinfo_max_freq"))
+            target = hw_max if khz <= 0 else min(max(int(khz), hw_min), hw_max)
+            # max first, so setspeed is never above the current cap
+            _write(d / "scaling_max_freq", target)
+            if self.active and (d / "scaling_setspeed").exists():
+                _write(d / "scaling_setspeed", target)
+
+    def restore(self):
+        for cpu, d in self.dirs.items():
+            if self.active:
+                _write(d / "scaling_governor", self.saved[cpu]["governor"])
+            _write(d / "scaling_max_freq", self.saved[cpu]["max"])
+        self.active = False
+
+
+class UncoreFreqKnob:
+    """
+    Uncore (mesh/LLC) frequency cap through the intel_uncore_frequency
+    driver: <root>/devices/system/cpu/intel_uncore_frequency/package_XX_die_YY/
+    max_freq_khz, bounded by initial_{min,max}_freq_khz.
+
+    Example:
+        uncore = UncoreFreqKnob(packages=[0])
+        uncore.set(1200000)   # kHz; 0 -> back to initial_max_freq_khz
+        uncore.restore()
+    """
+
+    def __init__(self, packages=None, root: Path = SYSFS_ROOT):
+        base = Path(root) / "devices/system/cpu/intel_uncore_frequency"
+        self.dirs = []
+        for d in sorted(base.glob("package_*_die_*")):
+            package = int(d.name.split("_")[1])
+            if packages is None or package in packages:
+                self.dirs.append(d)
+        self.saved = {d: (_read(d / "min_freq_khz"), _read(d / "max_freq_khz"))
+                      for d in self.dirs}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.dirs)
+
+    def set(self, khz: int, timeout=None):
+        for d in self.dirs:
+            hw_min = int(_read(d / "initial_min_freq_khz"))
+            hw_max = int(_read(d / "initial_max_freq_khz"))
+            target = hw_max if khz <= 0 else min(max(int(khz), hw_min), hw_max)
+            # the driver rejects max < min, so pull min down first if needed
+            if int(_read(d / "min_freq_khz")) > target:
+                _write(d / "min_freq_khz", target)
+            _write(d / "max_freq_khz", target)
+
+    def restore(self):
+        for d, (lo, hi) in self.saved.items():
+            _write(d / "max_freq_khz", hi)
+            _write(d / "min_freq_khz", lo)
+
+
+class CpuIdleKnob:
+    """
+    Per-core C-state enables for the SPDK CPUs through
+    <root>/devices/system/cpu/cpuN/cpuidle/stateK/disable.  Active
+    reactors keep only the states whose exit latency is ≤ `shallow_us`;
+    parked CPUs (outside the reactor mask) may use every state.
+
+    Example:
+        idle = CpuIdleKnob(cpus=range(8), shallow_us=2)
+        idle.keep_shallow([0, 1, 2, 3])   # new reactors: deep states off at once
+        idle.set([0, 1, 2])               # CPUs 3-7 parked, deep states on
+        idle.deep_residency([3, 4])       # share of time in deep states since last call
+        idle.restore()
+    """
+
+    def __init__(self, cpus, shallow_us: int = 2, root: Path = SYSFS_ROOT):
+        self.states = {}          # cpu -> [(stateK dir, exit latency µs)]
+        for cpu in cpus:
+            d = Path(root) / f"devices/system/cpu/cpu{cpu}/cpuidle"
+            found = sorted(d.glob("state[0-9]*"), key=lambda s: int(s.name[5:]))
+            found = [(s, int(_read(s / "latency"))) for s in found if (s / "disable").exists()]
+            if found:
+                self.states[cpu] = found
+        self.saved = {s: _read(s / "disable")
+                      for found in self.states.values() for s, _ in found}
+        self.shallow_us = shallow_us
+        self.parked = []          # CPUs with deep states enabled by set()
+        self._last = {}           # cpu -> (monotonic s, deep-state µs)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.states)
+
+    def _apply(self, cpu, deep: bool):
+        for s, latency in self.states[cpu]:
+            value = "0" if deep or latency <= self.shallow_us else "1"
+            if _read(s / "disable") != value:
+                _write(s / "disable", value)
+
+    def keep_shallow(self, active, timeout=None):
+        """Deep states off on `active` only; parked CPUs are left as they are."""
+        active = set(active)
+        for cpu in active & set(self.states):
+            self._apply(cpu, deep=False)
+        self.parked = [c for c in self.parked if c not in active]
+
+    def set(self, active, timeout=None):
+        """`active` CPUs shallow, every other managed CPU parked (all states on)."""
+        active = set(active)
+        for cpu in self.states:
+            self._apply(cpu, deep=cpu not in active)
+        self.parked = sorted(c for c in self.states if c not in active)
+
+    def deep_residency(self, cpus):
+        """Mean share of wall time `cpus` spent in deep states since the previous call."""
+        shares = []
+        for cpu in cpus:
+            if cpu not in self.states:
+                continue
+            now = (time.monotonic(), sum(int(_read(s / "time")) for s, latency
+                                         in self.states[cpu] if latency > self.shallow_us))
+            last, self._last[cpu] = self._last.get(cpu), now
+            if last is not None and now[0] > last[0]:
+                shares.append(min((now[1] - last[1]) / 1e6 / (now[0] - last[0]), 1.0))
+        return sum(shares) / len(shares) if shares else None
+
+    def restore(self):
+        for s, value in self.saved.items():
+            _write(s / "disable", value)
+        self.parked = []
+
+
+class DramPowerKnob:
+    """
+    DRAM RAPL power limit: constraint_0 of every powercap zone named
+    "dram" (<root>/class/powercap/intel-rapl:P:N), optionally only on
+    `packages`.
+
+    Example:
+        dram = DramPowerKnob(packages=[0])
+        dram.set(12)          # W per DRAM zone; 0 -> the limit found at start
+        dram.restore()
+    """
+
+    def __init__(self, packages=None, root: Path = SYSFS_ROOT):
+        self.zones = []
+        for z in sorted((Path(root) / "class/powercap").glob("intel-rapl:*:*")):
+            package = int(z.name.split(":")[1])
+            if (z / "name").exists() and _read(z / "name") == "dram" and \
+                    (z / "constraint_0_power_limit_uw").exists() and \
+                    (packages is None or package in packages):
+                self.zones.append(z)
+        self.saved = {z: (_read(z / "constraint_0_power_limit_uw"),
+                          _read(z / "enabled") if (z / "enabled").exists() else None)
+                      for z in self.zones}
+
+    @property
+    def available(self) -> bool:
+        return bool(self.zones)
+
+    def set(self, watts: float, timeout=None):
+        for z in self.zones:
+            if watts <= 0:
+                limit, enabled = self.saved[z]
+                _write(z / "constraint_0_power_limit_uw", limit)
+                if enabled is not None:
+                    _write(z / "enabled", enabled)
+                continue
+            limit = int(watts * 1_000_000)
+            max_file = z / "constraint_0_max_power_uw"
+            if max_file.exists() and int(_read(max_file)) > 0:
+                limit = min(limit, int(_read(max_file)))
+            _write(z / "constraint_0_power_limit_uw", limit)
+            if (z / "enabled").exists():
+                _write(z / "enabled", 1)
+
+    def restore(self):
+        self.set(0)
+
+
+class CpuHotplugKnob:
+    """
+    Takes idle CPUs outside `protected` offline through
+    <root>/devices/system/cpu/cpuN/online (like cpu_model/*/core_setup.sh),
+    so they drop out of package C-state budgets and stop serving OS noise.
+    CPU 0 and `protected` (the SPDK CPUs) are never touched, so reactor
+    cpumasks always land on online CPUs.  Highest CPU ids go first.
+
+    Example:
+        hp = CpuHotplugKnob(protected=range(8))
+        hp.sample_idle()      # once per tick; offline() only takes idle CPUs
+        hp.set(4)             # 4 CPUs offline (fewer if not enough are idle)
+        hp.restore()          # everything it offlined back online
+    """
+
+    def __init__(self, protected=(), idle_threshold: float = 0.05,
+                 root: Path = SYSFS_ROOT, proc: Path = Path("/proc")):
+        self.base = Path(root) / "devices/system/cpu"
+        self.stat = Path(proc) / "stat"
+        self.idle_threshold = idle_threshold
+        protected = set(protected) | {0}
+        self.candidates = sorted(
+            (int(d.name[3:]) for d in self.base.glob("cpu[0-9]*")
+             if d.name[3:].isdigit() and int(d.name[3:]) not in protected
+             and (d / "online").exists() and _read(d / "online") == "1"),
+            reverse=True)
+        self.offlined = []        # in offline order
+        self.busy = {}            # cpu -> busy fraction since the previous sample
+        self._last = None
+        self.saved_w = {}         # CPUs offline -> measured watts saved (caller fills)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.candidates)
+
+    def _times(self):
+        times = {}
+        for line in self.stat.read_text().splitlines():
+            name, *fields = line.split()
+            if name.startswith("cpu") and name[3:].isdigit():
+                vals = [int(v) for v in fields]
+                idle = vals[3] + (vals[4] if len(vals) > 4 else 0)   # idle + iowait
+                times[int(name[3:])] = (sum(vals), idle)
+        return times
+
+    def sample_idle(self):
+        """Update per-CPU busy fractions from /proc/stat."""
+        now, last = self._times(), self._last
+        self._last = now
+        if last is not None:
+            self.busy = {c: 1 - (now[c][1] - last[c][1]) / (now[c][0] - last[c][0])
+                         for c in now if c in last and now[c][0] > last[c][0]}
+        return self.busy
+
+    def adopt(self, cpus):
+        """Take over CPUs a previous run left offline, so restore() onlines them."""
+        for cpu in cpus:
+            path = self.base / f"cpu{cpu}/online"
+            if cpu in self.offlined or not path.exists() or _read(path) != "0":
+                continue
+            self.offlined.append(cpu)
+            if cpu not in self.candidates:
+                self.candidates = sorted(self.candidates + [cpu], reverse=True)
+
+    def set(self, n_offline: int, timeout=None):
+        """Offline (idle) or re-online CPUs until n_offline are down."""
+        while len(self.offlined) > max(n_offline, 0):
+            cpu = self.offlined.pop()
+            _write(self.base / f"cpu{cpu}/online", 1)
+        for cpu in self.candidates:
+            if len(self.offlined) >= n_offline:
+                break
+            if cpu in self.offlined or self.busy.get(cpu, 1.0) > self.idle_threshold:
+                continue
+            _write(self.base / f"cpu{cpu}/online", 0)
+            self.offlined.append(cpu)
+
+    def restore(self):
+        while self.offlined:
+            _write(self.base / f"cpu{self.offlined.pop()}/online", 1)
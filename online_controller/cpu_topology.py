@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+CPU topology service for SPDK reactor placement.
+
+Reads /sys/devices/system/cpu once and caches, per logical CPU, its
+socket, physical core and NUMA node.  select_cpus(n) then picks n
+logical CPUs the same way cpu_model/*/resctl.sh does during profiling:
+whole physical cores first (hyperthread siblings together), cores in
+(socket, core id) order, but starting on the NUMA node that holds the
+NIC/NVMe devices so reactors stay close to their I/O.
+"""
+
+import re
+from pathlib import Path
+
+SYSFS_ROOT = Path("/sys")
+
+
+def parse_cpulist(text: str):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+def format_cpumask(cpus) -> str:
+    """[0, 1, 4] -> '13' (hex mask, as thread_set_cpumask expects)"""
+    mask = 0
+    for c in cpus:
+        mask |= 1 << c
+    return format(mask, "x")
+
+
+class CpuTopology:
+    """
+    Example:
+        topo = CpuTopology(allowed=range(8), pci_devices=["0000:3b:00.0"])
+        cpus = topo.select_cpus(3)       # e.g. [0, 1, 2] or [0, 32, 1]
+        mask = format_cpumask(cpus)
+    """
+
+    def __init__(self, allowed=None, pci_devices=(), net_ifaces=(),
+                 root: Path = SYSFS_ROOT):
+        self.root    = Path(root)
+        self.cpus    = self._read_cpus()           # cpu -> {socket, core, node}
+        self.allowed = sorted(set(allowed) & set(self.cpus)) if allowed is not None \
+                       else sorted(self.cpus)
+        self.io_node = self._io_node(pci_devices, net_ifaces)
+        self._order  = self._placement_order()
+        self._cache  = {}
+
+    # -- sysfs ----------------------------------------------------------
+    def _read_cpus(self):
+        base = self.root / "devices/system/cpu"
+        node_of = {}
+        for node_dir in (self.root / "devices/system/node").glob("node[0-9]*"):
+            try:
+                for c in parse_cpulist((node_dir / "cpulist").read_text()):
+                    node_of[c] = int(node_dir.name[4:])
+            except OSError:
+                continue
+        cpus = {}
+        for d in base.glob("cpu[0-9]*"):
+            if not re.fullmatch(r"cpu\d+", d.name):
+                continue
+            cpu = int(d.name[3:])
+            try:
+                socket = int((d / "topology/physical_package_id").read_text())
+                core   = int((d / "topology/core_id").read_text())
+            except OSError:
+                continue            # offline CPUs have no topology directory
+            cpus[cpu] = {"socket": socket, "core": core,
+                         "node": node_of.get(cpu, socket)}
+        return cpus
+
+    def _numa_node(self, path: Path):
+        try:
+            node = int(path.read_text())
+        except (OSError, ValueError):
+            return None
+        return node if node >= 0 else None
+
+    def _io_node(self, pci_devices, net_ifaces):
+        """Most common NUMA node among the given PCI devices / NICs."""
+        nodes = [self._numa_node(self.root / "bus/pci/devices" / bdf / "numa_node")
+                 for bdf in pci_devices]
+        nodes += [self._numa_node(self.root / "class/net" / i / "device/numa_node")
+                  for i in net_ifaces]
+        nodes = [n for n in nodes if n is not None]
+        return max(set(nodes), key=nodes.count) if nodes else None
+
+    # -- placement --------------------------------------------------------
+    def _placement_order(self):
+        """Allowed CPUs grouped by physical core, I/O node first."""
+        cores = {}
+        for cpu in self.allowed:
+            info = self.cpus[cpu]
+            cores.setdefault((info["node"], info["socket"], info["core"]), []).append(cpu)
+        def key(coord):
+            node, socket, core = coord
+            return (node != self.io_node, socket, core)
+        return [sorted(cores[c]) for c in sorted(cores, key=key)]
+
+    def select_cpus(self, n: int):
+        """n logical CPUs, whole physical cores first, near the I/O devices."""
+        if n < 1 or n > len(self.allowed):
+            raise ValueError(f"num_cores must be between 1 and {len(self.allowed)}")
+        if n not in self._cache:
+            chosen = []
+            for siblings in self._order:
+                chosen.extend(siblings[:n - len(chosen)])
+                if len(chosen) == n:
+                    break
+            self._cache[n] = sorted(chosen)
+        return self._cache[n]
+
+    def siblings(self, cpu: int):
+        info = self.cpus[cpu]
+        return sorted(c for c, i in self.cpus.items()
+                      if (i["socket"], i["core"]) == (info["socket"], info["core"]))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Fast emergency power-cap loop.
+
+The optimizing controller ticks once per second and may spend another
+second probing SSD-vs-CPU trade-offs.  This loop runs beside it at
+≥20 Hz, watching a fast power signal (the fused estimate).  When power
+exceeds budget·(1 + margin) it immediately applies a conservative clamp
+through a caller-supplied function (RAPL + cpu.max in PASS).  It never
+relaxes the clamp itself: until the optimizing loop picks it up with
+take_clamp(), each further clamp starts from the one in effect and may
+only go deeper; the optimizing loop then raises power at its own pace.
+
+It also measures each budget violation, so time-over-budget after a
+sudden drop can be read from the log.
+"""
+
+import time, threading
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+FAST_LOOP_HZ      = 20
+EMERGENCY_MARGIN  = 0.03    # clamp when power > budget · (1 + margin)
+SETTLE_SEC        = 0.15    # let RAPL/cpu.max act before clamping deeper
+
+# ----------------------------------------------------------------------
+
+class EmergencyCap:
+    """
+    Example:
+        cap = EmergencyCap(power_source=lambda: fusion.estimate()[0],
+                           budget_source=read_budget,
+                           clamp=emergency_clamp).start()
+        ...
+        clamped = cap.take_clamp()   # in the slow loop, once per tick
+    """
+
+    def __init__(self, power_source, budget_source, clamp,
+                 rate_hz: float = FAST_LOOP_HZ, margin: float = EMERGENCY_MARGIN,
+                 settle: float = SETTLE_SEC):
+        self.power_source  = power_source    # () -> watts or None
+        self.budget_source = budget_source   # () -> watts or None
+        self.clamp         = clamp           # (over_watts, held clamp or None) -> applied state or None
+        self.period        = 1.0 / max(rate_hz, FAST_LOOP_HZ)
+        self.margin        = margin
+        self.settle        = settle
+        self.clamps        = 0
+        self.violations    = []              # [(start, duration_s, peak_over_w)]
+        self._pending      = None
+        self._last_clamp_t = float("-inf")
+        self._viol_start   = None
+        self._viol_peak    = 0.0
+        self._lock         = threading.Lock()
+        self._stop         = threading.Event()
+        self._thread       = None
+
+    def step(self, t: float = None):
+        """One fast-loop iteration (called by the thread, or manually)."""
+        t = time.monotonic() if t is None else t
+        power, budget = self.power_source(), self.budget_source()
+        if power is None or budget is None:
+            return
+
+        over = power - budget
+        if over > 0:
+            if self._viol_start is None:
+                self._viol_start, self._viol_peak = t, over
+            self._viol_peak = max(self._viol_peak, over)
+        elif self._viol_start is not None:
+            duration = t - self._viol_start
+            self.violations.append((self._viol_start, duration, self._viol_peak))
+            print(f"[emergency] over budget for {duration * 1000:.0f} ms "
+                  f"(peak +{self._viol_peak:.1f} W)", flush=True)
+            self._viol_start = None
+
+        if power > budget * (1.0 + self.margin) and t - self._last_clamp_t >= self.settle:
+            with self._lock:
+                held = self._pending
+            applied = self.clamp(over, held)
+            self._last_clamp_t = t
+            if applied is not None:
+                self.clamps += 1
+                with self._lock:
+                    self._pending = applied
+                print(f"[emergency] power={power:5.1f} W budget={budget} W "
+                      f"-> clamp {applied}", flush=True)
+
+    def clamp_pending(self) -> bool:
+        """True while a clamp is in effect that the slow loop has not taken yet."""
+        with self._lock:
+            return self._pending is not None
+
+    def take_clamp(self):
+        """Return the latest clamp applied since the previous call (or None)."""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        return pending
+
+    def _run(self):
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                print(f"[emergency] error: {e}", flush=True)
+            next_t += self.period
+            delay = next_t - time.monotonic()
+            if delay < 0:
+                next_t = time.monotonic()
+                delay  = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="emergency-cap",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Energy-window budget: the budget as average watts, not an instant cap.
+
+The bucket keeps the power drawn over the trailing window.  Time spent
+under budget leaves part of the window's budget energy (budget · window)
+unused; bursts spend it, so the controller may run above budget, up to
+a hard ceiling.  The power allowed now is the most that, held for any
+horizon up to SPEND_SEC, keeps every window ending within it at or
+below the budget on average, so the trailing-window average stays at
+or below the budget and power never exceeds the ceiling.  Time before
+the first sample counts as spent at the budget (no burst on a cold
+start).
+"""
+
+from collections import deque
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+WINDOW_SEC      = 60.0       # averaging window of the budget
+SPEND_SEC       = 10.0       # unused energy is spread over this horizon
+
+# ----------------------------------------------------------------------
+
+class EnergyBucket:
+    """
+    Example:
+        bucket = EnergyBucket(window=60)
+        bucket.update(power_w=340, dt=1.0)
+        allowed = bucket.allowed(400, 480)   # ≤ 480 W
+    """
+
+    def __init__(self, window: float = WINDOW_SEC, spend: float = SPEND_SEC,
+                 samples=()):
+        self.window  = window
+        self.spend   = min(spend, window)
+        self.samples = deque(tuple(s) for s in samples)   # (dt, watts), oldest first
+
+    def update(self, power_w: float, dt: float):
+        """Record power_w drawn for the last dt seconds; drop what left the window."""
+        self.samples.append((dt, power_w))
+        span = sum(d for d, _ in self.samples)
+        while span - self.samples[0][0] >= self.window:
+            span -= self.samples.popleft()[0]
+
+    def used(self, seconds: float, budget_w: float) -> float:
+        """J drawn over the last `seconds` (time before the first sample at budget_w)."""
+        energy = 0.0
+        for dt, watts in reversed(self.samples):
+            if seconds <= 0:
+                break
+            take = min(dt, seconds)
+            energy  += take * watts
+            seconds -= take
+        return energy + max(seconds, 0.0) * budget_w
+
+    def banked(self, budget_w: float) -> float:
+        """J of the trailing window's budget energy left unused (< 0: overdrawn)."""
+        return budget_w * self.window - self.used(self.window, budget_w)
+
+    def allowed(self, budget_w: float, ceiling_w: float, tick: float = None) -> float:
+        """
+        Power the controller may run at now, 0 … ceiling_w: held for any
+        horizon up to `spend` (at least one tick, default the last one),
+        no window ending within it averages above budget_w.  Checked at
+        the horizons where a sample boundary leaves the window.
+        """
+        tick = tick or (self.samples[-1][0] if self.samples else self.spend)
+        horizons, age = {self.spend, min(tick, self.spend)}, 0.0
+        for dt, _ in reversed(self.samples):
+            age += dt
+            if self.window - self.spend < age < self.window:
+                horizons.add(self.window - age)
+        left = min((budget_w * self.window - self.used(self.window - h, budget_w)) / h
+                   for h in horizons)
+        return min(max(left, 0.0), ceiling_w)
@@ -1,134 +1,268 @@
-import subprocess
-import os
-import psutil
-import time
-import numpy as np
-import pandas as pd
-import sys
-import warnings
-import time
-import signal
-import threading
-from datetime import datetime
-import random
-
-
-import statistics
-from collections import deque
-
-warnings.filterwarnings(action='ignore', category=UserWarning)
-
-powers = []
-metrics = []
-power_array = [None] * 5
-#period = sys.argv[1]
-output_file_name = "../data/training-data.csv"
-
-prev = 0
-#num_cores = os.cpu_count()
-# num_cores = 1
-num_cores = 8
-start_time = datetime.now()
-
-# Constants
+#!/usr/bin/env python3
+"""
+Thunderbolt baseline: RUMD (random unthrottle, multiplicative decrease)
+CPU bandwidth throttling of the storage applications' cgroups.
+
+One persistent control loop, ticking at --tick-hz:
+  • reads system power from the fused RAPL + IPMI sensor
+    (power_fusion.FastPowerSensor) or, with --sensor ipmi, from IPMI only
+  • reads the budget from --budget-file (first line, integer watts),
+    or uses a fixed --budget; optionally steps it from a --budget-schedule
+    file once its first step is due, logging the actual step times
+    (budget_schedule.py)
+  • over HIGH_THRESHOLD·budget: every cgroup's bandwidth ×HARD_MULTIPLIER,
+    over LOW_THRESHOLD·budget: ×SOFT_MULTIPLIER (never below its minimum
+    share), otherwise, with probability UNTHROTTLE_PROB, every cgroup gets
+    +UNTHROTTLE_STEP scaled by its weight relative to the heaviest one
+  • sizes each cgroup's cpu.max by the CPU count in its
+    cpuset.cpus.effective (re-read every tick)
+  • writes all changed cpu.max files in one pass per tick
+  • prints one structured record per tick (CSV or JSON lines)
+  • with --shadow, lets other controllers decide on the same readings and
+    logs what they would have done (shadow.py)
+
+Example:
+    sudo python3 google_thunderbolt.py --budget-file ./budget --tick-hz 10 \
+        --cgroup /sys/fs/cgroup/fg:3:10 --cgroup /sys/fs/cgroup/bg:1
+"""
+
+import argparse, json, random, signal, sys, time
+from pathlib import Path
+
+from cpu_topology import parse_cpulist
+from power_fusion import FastPowerSensor, read_ipmi_power
+from budget_schedule import STEP_LOG, BudgetSchedule
+from shadow import SHADOW_LOG, ShadowRecorder, thunderbolt_cpu_share, direction
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
 HARD_MULTIPLIER = 0.01
 SOFT_MULTIPLIER = 0.75
-# THROTTLE_MIN = 0.01    
-# THROTTLE_MIN = 0.3
-# THROTTLE_MIN = 1
-THROTTLE_MIN = 0.5
-THROTTLE_MAX = 100
-HIGH_THRESHOLD = 0.98  
-LOW_THRESHOLD = 0.96   
-
-def core_throttling(index):
-    # Define the path to the cgroup v2
-    cgroup_path = '/sys/fs/cgroup/'
-
-    # Create a new cgroup for the application if it doesn't exist
-    app_cgroup = os.path.join(cgroup_path, 'user')
-
-    # Calculate the cores to be used
-    conf_str = str(int(100000 * num_cores * index / 100)) + " 100000"
-
-    # Set the cpuset.cpus for the application cgroup
-    with open(os.path.join(app_cgroup, 'cpu.max'), 'w') as f:
-        f.write(conf_str)
-
-def calculate_power():
-    """Measure IPMI power and store values in the shared list 'samples'."""
-    result = subprocess.run(
-        ["ipmitool", "dcmi", "power", "reading"],
-        capture_output=True,
-        text=True
-    )
-    for line in result.stdout.splitlines():
-        if "Instantaneous" in line:
-            ipmi_power = float(line.split()[3])  # Assuming power value is the 4th field
-            return ipmi_power
-
-def rumd_control(actual_power, target_power, current_bandwidth, random_unthrottle_timeout):
-    # if actual_power > target_power:  # If power exceeds the limit
-    if actual_power > target_power * HIGH_THRESHOLD:  # Apply hard multiplier
-        current_bandwidth *= HARD_MULTIPLIER
-        current_bandwidth = max(current_bandwidth, THROTTLE_MIN)
-    elif actual_power > target_power * LOW_THRESHOLD:  # Apply soft multiplier
-        current_bandwidth *= SOFT_MULTIPLIER
-        current_bandwidth = max(current_bandwidth, THROTTLE_MIN)
-    else:
-        if random.random() < 0.5:
-            current_bandwidth = min(current_bandwidth + 2, THROTTLE_MAX)
+THROTTLE_MIN    = 0.5          # % of num_cores
+THROTTLE_MAX    = 100
+HIGH_THRESHOLD  = 0.98
+LOW_THRESHOLD   = 0.96
+UNTHROTTLE_STEP = 2
+UNTHROTTLE_PROB = 0.5
 
-    core_throttling(current_bandwidth)
-    
-    # Return the updated bandwidth
-    return current_bandwidth
+CPU_PERIOD_US   = 100000       # cpu.max period
 
-start_of_run = True
+FIELDS = ["t", "budget", "power", "power_sigma", "tick_ms"]   # + one bw:<cgroup> each
+
+# ----------------------------------------------------------------------
+
+class CgroupShare:
+    """One throttled cgroup: RUMD bandwidth in % of its own CPUs."""
+
+    def __init__(self, path: Path, weight: float = 1.0, min_share: float = THROTTLE_MIN,
+                 default_cores: int = 8):
+        self.path          = Path(path)
+        self.name          = self.path.name
+        self.weight        = weight
+        self.min_share     = min_share
+        self.default_cores = default_cores
+        self.bandwidth     = THROTTLE_MAX
+        self.applied       = None       # cpu.max line last written
+
+    def cores(self) -> int:
+        """CPUs in cpuset.cpus.effective (default_cores if unreadable)."""
+        try:
+            cpus = parse_cpulist((self.path / "cpuset.cpus.effective").read_text())
+        except OSError:
+            cpus = []
+        return len(cpus) or self.default_cores
+
+    def cpu_max(self) -> str:
+        return f"{int(CPU_PERIOD_US * self.cores() * self.bandwidth / 100)} {CPU_PERIOD_US}"
 
-def run_stress_ng():
-    try:
-        global target_power
-        global current_bandwidth
-        global prev
-        global start_of_run
-        if start_of_run:
-            current_bandwidth = 100
-            start_of_run = False
-        
-        while True:
-            actual_power = float(calculate_power())
-            with open('/home/dedongx/power_aware_storage/budget', 'r') as file:
-                # Read the first line of the file
-                line = file.readline()
-                # Convert the line to an integer
-                target_power = int(line.strip())
 
-            random_unthrottle_timeout = random.randint(1, 5)
+class ThunderboltRUMD:
+    """
+    Example:
+        tb = ThunderboltRUMD([CgroupShare(Path("/sys/fs/cgroup/user"))])
+        bw = tb.step(actual_power=420, target_power=400)   # -> {"user": 1.0} (hard cut)
+    """
 
-            current_bandwidth = rumd_control(actual_power, target_power, current_bandwidth, random_unthrottle_timeout)
+    def __init__(self, shares, rng=random):
+        self.shares = list(shares)
+        self.rng    = rng
 
-            current_time = datetime.now()
+    @property
+    def bandwidth(self):
+        return {c.name: c.bandwidth for c in self.shares}
 
-            timestamp = (current_time - start_time).total_seconds()
-            print(f"{int(timestamp)} | {current_bandwidth} | {target_power} | 0 | 0 | {actual_power}", flush=True)
-            time.sleep(1)
+    def rumd(self, actual_power: float, target_power: float):
+        """The RUMD update for every cgroup, without side effects."""
+        if actual_power > target_power * HIGH_THRESHOLD:    # Apply hard multiplier
+            return [max(c.bandwidth * HARD_MULTIPLIER, c.min_share) for c in self.shares]
+        if actual_power > target_power * LOW_THRESHOLD:     # Apply soft multiplier
+            return [max(c.bandwidth * SOFT_MULTIPLIER, c.min_share) for c in self.shares]
+        if self.rng.random() < UNTHROTTLE_PROB:
+            top = max(c.weight for c in self.shares)
+            return [min(c.bandwidth + UNTHROTTLE_STEP * c.weight / top, THROTTLE_MAX)
+                    for c in self.shares]
+        return [c.bandwidth for c in self.shares]
 
+    def apply(self):
+        """One write pass: cpu.max of every cgroup whose line changed."""
+        for c in self.shares:
+            line = c.cpu_max()
+            if line != c.applied:
+                with open(c.path / "cpu.max", "w") as f:
+                    f.write(line)
+                c.applied = line
 
-    except Exception as e:
-        print(f"An error occurred while running stress-ng: {e}")
+    def step(self, actual_power: float, target_power: float):
+        for c, bw in zip(self.shares, self.rumd(actual_power, target_power)):
+            c.bandwidth = bw
+        self.apply()
+        return self.bandwidth
 
-def signal_handler(sig, frame):
-    if os.path.exists("perf-training.dat"):
-        os.remove("perf-training.dat")
-    exit(0)
+    def restore(self):
+        for c in self.shares:
+            c.bandwidth = THROTTLE_MAX
+        self.apply()
+
+
+def parse_cgroup(spec: str, default_cores: int) -> CgroupShare:
+    """'PATH[:WEIGHT[:MIN_SHARE]]' -> CgroupShare"""
+    path, *rest = spec.split(":")
+    weight    = float(rest[0]) if len(rest) > 0 and rest[0] else 1.0
+    min_share = float(rest[1]) if len(rest) > 1 and rest[1] else THROTTLE_MIN
+    return CgroupShare(Path(path), weight, min_share, default_cores)
+
+
+def budget_source(args):
+    """
+    () -> budget watts, from --budget or the first line of --budget-file;
+    with --budget-schedule, from its steps once the first one is due.
+    """
+    if args.budget is not None:
+        read = lambda: args.budget
+    else:
+        path = Path(args.budget_file)
+        def read():
+            with path.open() as f:
+                return int(f.readline().strip())
+    if args.budget_schedule is None:
+        return read
+    sched = BudgetSchedule(Path(args.budget_schedule), Path(args.budget_step_log),
+                           "thunderbolt", controller="thunderbolt").start()
+    # --budget / --budget-file until the first step is due
+    def scheduled():
+        watts = sched.current()
+        return watts if watts is not None else read()
+    return scheduled
+
+def power_source(args):
+    """() -> (watts, sigma or None)."""
+    if args.sensor == "ipmi":
+        return lambda: (read_ipmi_power(), None)
+    sensor = FastPowerSensor(ipmi_period=args.ipmi_period).start()
+    def read():
+        watts, sigma = sensor.read()
+        if watts is None:                 # no IPMI reading yet
+            return read_ipmi_power(), None
+        return watts, sigma
+    return read
+
+def emit(record, fmt: str):
+    if fmt == "json":
+        print(json.dumps(record), flush=True)
+        return
+    values = [record[k] for k in FIELDS] + list(record["bandwidth"].values())
+    print(",".join("" if v is None else (f"{v:.3f}" if isinstance(v, float) else str(v))
+                   for v in values), flush=True)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Thunderbolt RUMD CPU throttling baseline")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--budget-file", default="./budget",
+                     help="file whose first line is the budget in W (default: ./budget)")
+    src.add_argument("--budget", type=float, default=None,
+                     help="fixed budget in W instead of --budget-file")
+    p.add_argument("--budget-schedule", default=None,
+                   help="timed budget steps ('<offset_s|@unix_time> <watts>' per line), "
+                        "run locally; --budget or --budget-file gives the budget "
+                        "before the first step")
+    p.add_argument("--budget-step-log", default=str(STEP_LOG),
+                   help=f"CSV of the actual step times (default: {STEP_LOG})")
+    p.add_argument("--tick-hz", type=float, default=1.0,
+                   help="control ticks per second (default: 1)")
+    p.add_argument("--sensor", choices=["fused", "ipmi"], default="fused",
+                   help="power sensor: RAPL+IPMI fusion or IPMI only (default: fused)")
+    p.add_argument("--ipmi-period", type=float, default=1.0,
+                   help="IPMI poll period of the fused sensor in s (default: 1)")
+    p.add_argument("--cgroup", action="append", default=None, metavar="PATH[:WEIGHT[:MIN]]",
+                   help="cgroup to throttle, with its unthrottle weight and minimum "
+                        "share in %% (repeatable; default: /sys/fs/cgroup/user)")
+    p.add_argument("--cores", type=int, default=8,
+                   help="CPUs of a cgroup without a readable cpuset (default: 8)")
+    p.add_argument("--format", choices=["csv", "json"], default="csv",
+                   help="per-tick output format (default: csv)")
+    p.add_argument("--seed", type=int, default=None,
+                   help="seed of the random unthrottle")
+    p.add_argument("--shadow", action="append", default=[], choices=["pass"],
+                   help="controller deciding in shadow mode (repeatable; "
+                        "pass needs its policy.csv in the working directory)")
+    p.add_argument("--shadow-log", default=str(SHADOW_LOG),
+                   help=f"shadow-mode JSON-lines log (default: {SHADOW_LOG})")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    read_budget = budget_source(args)
+    read_power  = power_source(args)
+    shares = [parse_cgroup(spec, args.cores)
+              for spec in (args.cgroup or ["/sys/fs/cgroup/user"])]
+    tb = ThunderboltRUMD(shares, random.Random(args.seed))
+
+    stop = []
+    def handle_sigterm(sig, frame):
+        stop.append(sig)
+    signal.signal(signal.SIGINT,  handle_sigterm)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    shadow = None
+    if args.shadow:
+        shadow = ShadowRecorder("thunderbolt", args.shadow, Path(args.shadow_log))
+        applied_share = 1.0
+
+    if args.format == "csv":
+        print(",".join(FIELDS + [f"bw:{c.name}" for c in shares]), flush=True)
+    period = 1.0 / args.tick_hz
+    start  = next_t = time.monotonic()
+    try:
+        while not stop:
+            t0 = time.monotonic()
+            try:
+                power, sigma = read_power()
+                budget = read_budget()
+                if power is not None:
+                    tb.step(power, budget)
+                    if shadow is not None:
+                        share = thunderbolt_cpu_share(tb.shares)
+                        shadow.record(t0 - start, power, budget,
+                                      {"cpu_share": share,
+                                       "direction": direction(applied_share, share),
+                                       "bandwidth": tb.bandwidth})
+                        applied_share = share
+                emit({"t": t0 - start, "bandwidth": tb.bandwidth, "budget": budget,
+                      "power": power, "power_sigma": sigma,
+                      "tick_ms": (time.monotonic() - t0) * 1000}, args.format)
+            except (OSError, ValueError) as e:
+                print(f"[thunderbolt] tick failed: {e}", file=sys.stderr, flush=True)
+            next_t += period
+            delay = next_t - time.monotonic()
+            if delay < 0:               # overran: resync instead of bursting
+                next_t, delay = time.monotonic(), 0
+            time.sleep(delay)
+    finally:
+        try:
+            tb.restore()
+        except OSError as e:
+            print(f"[thunderbolt] restore failed: {e}", file=sys.stderr)
 
 if __name__ == "__main__":
-    # Register the signal handler for SIGINT (Ctrl+C) and SIGTERM
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-
-    while True:
-        stress_thread = threading.Thread(target=run_stress_ng)
-        stress_thread.start()
-        stress_thread.join()
+    main()
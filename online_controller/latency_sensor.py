@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Per-bdev tail-latency sensor built on SPDK latency histograms.
+
+  • Enables histograms once with `bdev_enable_histogram <bdev> -e`;
+    the controller disables them (-d) on exit
+  • Each poll pulls `bdev_get_histogram` for every bdev in one batched
+    rpc.py call
+  • Subtracts the previous snapshot, so percentiles cover only the I/O
+    completed since the last poll
+  • Walks the cumulative bucket counts to get p50/p99 in microseconds
+
+Bucket layout follows SPDK's histogram_data.h / scripts/histogram.py:
+range i, slot j ends at  j+1                                  (i == 0)
+                         (1 << (i+shift-1)) + ((j+1) << (i-1)) (i > 0)
+in TSC ticks.
+"""
+
+import base64, json, struct, subprocess
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+RPC = "./scripts/rpc.py"      # Assuming in the same directory as SPDK
+
+# ----------------------------------------------------------------------
+
+def rpc_batch(lines, rpc: str = RPC):
+    """Run several RPC lines through one rpc.py process; return the JSON results."""
+    out = subprocess.run([rpc], input="\n".join(lines) + "\n", text=True,
+                         capture_output=True, check=True).stdout
+    decoder, results, pos = json.JSONDecoder(), [], 0
+    while True:
+        while pos < len(out) and out[pos].isspace():
+            pos += 1
+        if pos >= len(out):
+            return results
+        obj, pos = decoder.raw_decode(out, pos)
+        results.append(obj)
+
+def decode_histogram(hist: dict):
+    """Return (counts, bucket_end_us) for one bdev_get_histogram result."""
+    raw    = base64.b64decode(hist["histogram"])
+    counts = struct.unpack(f"<{len(raw) // 8}Q", raw)
+    shift  = hist["bucket_shift"]
+    per    = 1 << shift
+    us_per_tick = 1e6 / hist["tsc_rate"]
+    ends = []
+    for idx in range(len(counts)):
+        i, j = divmod(idx, per)
+        tick = (j + 1) if i == 0 else (1 << (i + shift - 1)) + ((j + 1) << (i - 1))
+        ends.append(tick * us_per_tick)
+    return counts, ends
+
+def percentiles(counts, ends, quantiles=(0.5, 0.99)):
+    """Bucket-end latency (µs) at each quantile; None if no I/O."""
+    total = sum(counts)
+    if total == 0:
+        return [None] * len(quantiles)
+    result, so_far, qi = [None] * len(quantiles), 0, 0
+    order = sorted(range(len(quantiles)), key=lambda k: quantiles[k])
+    for c, end in zip(counts, ends):
+        if c == 0:
+            continue
+        so_far += c
+        while qi < len(order) and so_far >= quantiles[order[qi]] * total:
+            result[order[qi]] = end
+            qi += 1
+        if qi == len(order):
+            break
+    return result
+
+
+class LatencySensor:
+    """
+    Example:
+        lat = LatencySensor([f"Nvme{i}n1" for i in range(10)]).enable()
+        stats = lat.poll()      # {bdev: {"p50": us, "p99": us, "ios": n}}
+        worst = lat.worst_p99()
+    """
+
+    def __init__(self, bdevs, rpc: str = RPC):
+        self.bdevs  = list(bdevs)
+        self.rpc    = rpc
+        self.stats  = {}
+        self._prev  = {}      # bdev -> counts tuple
+        self._ends  = {}      # bdev -> bucket ends (fixed per bdev)
+
+    def enable(self):
+        rpc_batch([f"bdev_enable_histogram {b} -e" for b in self.bdevs], self.rpc)
+        return self
+
+    def disable(self):
+        rpc_batch([f"bdev_enable_histogram {b} -d" for b in self.bdevs], self.rpc)
+
+    def poll(self):
+        results = rpc_batch([f"bdev_get_histogram {b}" for b in self.bdevs], self.rpc)
+        stats = {}
+        for bdev, hist in zip(self.bdevs, results):
+            if bdev not in self._ends:
+                counts, self._ends[bdev] = decode_histogram(hist)
+            else:
+                raw = base64.b64decode(hist["histogram"])
+                counts = struct.unpack(f"<{len(raw) // 8}Q", raw)
+            prev = self._prev.get(bdev)
+            delta = counts if prev is None else [c - p for c, p in zip(counts, prev)]
+            self._prev[bdev] = counts
+            p50, p99 = percentiles(delta, self._ends[bdev])
+            stats[bdev] = {"p50": p50, "p99": p99, "ios": sum(delta)}
+        self.stats = stats
+        return stats
+
+    def worst_p99(self, bdevs=None):
+        """Highest p99 (µs) among `bdevs` (default: all) that saw I/O."""
+        vals = [s["p99"] for b, s in self.stats.items()
+                if s["p99"] is not None and (bdevs is None or b in bdevs)]
+        return max(vals) if vals else None
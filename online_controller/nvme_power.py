@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+NVMe power-state actuator and SSD power planner.
+
+bdev QoS only lowers the dynamic part of SSD power; the drive stays in
+its active power state (PS0) and keeps its active floor.  An NVMe power
+state transition caps the drive's power (and its throughput) instead.
+
+  • Sets power states per drive, batched through one rpc.py call, either
+    with the test RPC used by SPDK_config/batch_rpc_commands/power_state_*
+    (`bdev_test_set_nvme_power_state <bdev> <ps>`) or with a raw admin
+    Set Features (FID 0x02, Power Management) via `bdev_nvme_send_cmd`
+  • Models each state's max power, active floor, relative throughput and
+    entry/exit latency (POWER_STATES; from `nvme id-ctrl` and profiling)
+  • plan_ssd_savings() picks, per drive, QoS or a power state by
+    predicted watts saved per MiB/s lost, cheapest drives first, and
+    moves drives to deeper cuts while the saving falls short; cuts
+    already applied are kept
+"""
+
+import base64, struct, subprocess
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+RPC = "./scripts/rpc.py"      # Assuming in the same directory as SPDK
+
+# "test_rpc": bdev_test_set_nvme_power_state (patched SPDK, as in
+#             SPDK_config/batch_rpc_commands/power_state_*)
+# "send_cmd": bdev_nvme_send_cmd admin Set Features (stock SPDK)
+PS_RPC_MODE = "test_rpc"
+
+# Per power state: max power (W, from id-ctrl), active floor (W at
+# ~0 MiB/s, profiled), share of full throughput it sustains, and entry /
+# exit latency (µs).  Placeholders for a typical datacenter NVMe, not a
+# measurement: replace them with the values measured on your drives
+# before turning on USE_NVME_POWER_STATES in the controller.
+POWER_STATES = {
+    0: {"max_w": 25.0, "floor_w": 5.0, "rel_bw": 1.00, "entry_us": 0,   "exit_us": 0},
+    1: {"max_w": 18.0, "floor_w": 4.0, "rel_bw": 0.70, "entry_us": 50,  "exit_us": 50},
+    2: {"max_w": 12.0, "floor_w": 3.0, "rel_bw": 0.40, "entry_us": 100, "exit_us": 100},
+}
+
+# ----------------------------------------------------------------------
+
+def set_features_power_cmd(ps: int) -> str:
+    """base64url 64-byte SQE: Set Features (0x09), FID 0x02, cdw11 = PS."""
+    sqe = bytearray(64)
+    sqe[0] = 0x09
+    struct.pack_into("<II", sqe, 40, 0x02, ps & 0x1F)
+    return base64.urlsafe_b64encode(bytes(sqe)).decode()
+
+def power_state_line(bdev: str, ps: int, mode: str = PS_RPC_MODE) -> str:
+    if mode == "test_rpc":
+        return f"bdev_test_set_nvme_power_state {bdev} {ps}"
+    if mode == "send_cmd":
+        ctrlr = bdev.rsplit("n", 1)[0]           # Nvme3n1 -> Nvme3
+        return (f"bdev_nvme_send_cmd -n {ctrlr} -t admin -r c2h "
+                f"-c {set_features_power_cmd(ps)}")
+    raise ValueError(f"unknown PS_RPC_MODE {mode!r}")
+
+def set_power_states(bdevs, states, rpc: str = RPC, timeout=None):
+    """
+    Set power state states[i] on bdevs[i] in one rpc.py call.
+    A state of None leaves that drive alone.
+    """
+    lines = [power_state_line(b, ps) for b, ps in zip(bdevs, states) if ps is not None]
+    if lines:
+        subprocess.run([rpc], input="\n".join(lines) + "\n", text=True,
+                       capture_output=True, check=True, timeout=timeout)
+
+
+def drive_power(read_mib, write_mib, watt_per_read_mib, watt_per_write_mib, ps=0):
+    """Drive power (W) at the given bandwidth in power state `ps`."""
+    st = POWER_STATES[ps]
+    p = st["floor_w"] + read_mib * watt_per_read_mib + write_mib * watt_per_write_mib
+    return min(p, st["max_w"])
+
+def _tighter(new, old):
+    """The stricter of two limits, 0 = unlimited."""
+    return min(new, old) if new > 0 and old > 0 else (new or old)
+
+def ssd_options(read_mib, write_mib, qos_limits, model, max_exit_us=None,
+                use_states=True, current_ps=0, applied_limits=(0, 0)):
+    """
+    Candidate cuts for one drive running at (read_mib, write_mib) in
+    power state current_ps under applied_limits:
+    [(saved_w, lost_mib, action)] with action ("qos", (r_lim, w_lim)) or
+    ("ps", state).  qos_limits: (r_lim, w_lim), 0 = unlimited; never looser
+    than applied_limits.  Only states deeper than current_ps are offered.
+    model: {"wpr", "wpw", "read_bw", "write_bw"} (W/MiB/s and full MiB/s).
+    States whose entry+exit latency exceeds max_exit_us are skipped
+    (all of them with use_states=False).
+    """
+    wpr, wpw = model["wpr"], model["wpw"]
+    now = drive_power(read_mib, write_mib, wpr, wpw, current_ps)
+    options = []
+    r_lim = _tighter(qos_limits[0], applied_limits[0])
+    w_lim = _tighter(qos_limits[1], applied_limits[1])
+    r = min(read_mib, r_lim) if r_lim > 0 else read_mib
+    w = min(write_mib, w_lim) if w_lim > 0 else write_mib
+    lost = (read_mib - r) + (write_mib - w)
+    if lost > 0:
+        # QoS keeps the active floor: only the dynamic part goes away
+        options.append((now - drive_power(r, w, wpr, wpw, current_ps),
+                        lost, ("qos", (r_lim, w_lim))))
+    for ps, st in sorted(POWER_STATES.items()):
+        if ps <= current_ps or not use_states:
+            continue
+        if max_exit_us is not None and st["entry_us"] + st["exit_us"] > max_exit_us:
+            continue
+        r = min(read_mib, st["rel_bw"] * model["read_bw"])
+        w = min(write_mib, st["rel_bw"] * model["write_bw"])
+        saved = now - drive_power(r, w, wpr, wpw, ps)
+        if saved > 0:
+            options.append((saved, (read_mib - r) + (write_mib - w), ("ps", ps)))
+    return options
+
+def efficiency(option) -> float:
+    """Watts saved per MiB/s lost (a free saving ranks first)."""
+    saved, lost, _ = option
+    return float("inf") if lost <= 0 else saved / lost
+
+def plan_ssd_savings(need_w, read_mibs, write_mibs, qos_limits, model,
+                     max_exit_us=None, ranks=None, use_states=True,
+                     applied_qos=None, applied_states=None):
+    """
+    Cheapest per-drive cuts that together save ≥ need_w watts (or as much
+    as possible).  Greedy: each step gives one drive its next cut, the one
+    with the best extra watts per extra MiB/s lost (ties: more watts), by
+    ascending rank first (tenant class, e.g. best-effort before
+    latency-critical); a drive may move on to a deeper cut while the
+    saving falls short.  applied_qos / applied_states (the cuts in effect,
+    None = none) are the starting point and are never loosened.
+
+    Returns (qos, states, saved_w): qos = [(r_lim, w_lim)] with (0, 0) for
+    unlimited drives, states = [ps] with 0 for drives in PS0.
+    """
+    n = len(read_mibs)
+    applied_qos    = [tuple(q) for q in applied_qos] if applied_qos else [(0, 0)] * n
+    applied_states = list(applied_states) if applied_states else [0] * n
+    opts = [ssd_options(read_mibs[i], write_mibs[i], qos_limits[i], model,
+                        max_exit_us, use_states, applied_states[i], applied_qos[i])
+            for i in range(n)]
+    ranks = ranks or [0] * n
+
+    chosen, saved_w = [None] * n, 0.0
+    while saved_w < need_w:
+        steps = []
+        for i in range(n):
+            cur_saved, cur_lost = chosen[i][:2] if chosen[i] else (0.0, 0.0)
+            for opt in opts[i]:
+                if opt[0] > cur_saved:
+                    extra = (opt[0] - cur_saved, opt[1] - cur_lost, opt[2])
+                    steps.append(((ranks[i], -efficiency(extra), -extra[0]), i, opt, extra[0]))
+        if not steps:
+            break
+        _, i, opt, extra_w = min(steps, key=lambda s: s[0])
+        chosen[i] = opt
+        saved_w += extra_w
+
+    qos, states = list(applied_qos), list(applied_states)
+    for i, opt in enumerate(chosen):
+        if opt is not None:
+            kind, value = opt[2]
+            if kind == "qos":
+                qos[i] = value
+            else:
+                states[i] = value
+    return qos, states, saved_w
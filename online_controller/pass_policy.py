@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+PASS policy table and CPU-side decision, free of side effects.
+
+Importing this module touches no sysfs knob, cgroup, target or log, so
+the controller (powercap_PASS_profile_based.py) and its shadow in
+another controller's process (shadow.py) share the same decision:
+
+  • load_policy() reads the profiled policy.csv
+  • cpu_power_target() is one proportional step on the CPU power target
+  • find_policy() picks the row for a CPU power target: the highest row
+    that fits, preferring rows predicted to keep a p99 target, then
+    uncore-capped rows that keep more cores and DRAM-capped rows that
+    keep more CPU capacity
+"""
+
+import csv
+from pathlib import Path
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+POLICY_FILE       = Path("./policy.csv")
+INITIAL_CPU_POWER = 210           # starting point (W)
+SPDK_CORES        = 8              # number of SPDK cores (0..7)
+
+HIGH_THRESHOLD    = 1.05          # 5% over budget
+NO_ACTION_THRESHOLD = 0.98        # 2% under budget
+
+HIGH_CPU_PROPORTION = 0.6    # 80% of CPU for power decrease
+LOW_CPU_PROPORTION  = 0.3    # 50% of CPU for power decrease
+BELOW_CPU_PROPORTION = 0.5    # 50% of CPU for power increase
+
+# ----------------------------------------------------------------------
+
+def load_policy(path: Path):
+    """
+    Return a list of rows sorted by *ascending* CPU power.
+    Each row is a dict  {power, cores, bandwidth, rapl, freq, uncore, dram, p99}
+    (freq / uncore in kHz, dram in W, 0 when the table has no such column)
+    """
+    with path.open() as f:
+        reader = csv.DictReader(f, skipinitialspace=True)
+        rows   = []
+        for row in reader:
+            rows.append({
+                "power"     : int(row["power"]),
+                "cores"     : int(row["cores"]),
+                "bandwidth" : int(row["bandwidth"]),
+                "rapl"      : int(row["rapl"]),
+                "freq"      : int(row.get("freq") or 0),
+                "uncore"    : int(row.get("uncore") or 0),
+                "dram"      : int(row.get("dram") or 0),
+                "p99"       : float(row.get("p99") or 0),
+            })
+    # ascending order ⇒ rows[0] = lowest-power policy
+    return sorted(rows, key=lambda r: r["power"])
+
+def cpu_power_target(power: float, budget: float, current_cpu_power: float,
+                     high_bar: float = None) -> float:
+    """
+    CPU power target after one proportional step on `power` against
+    `budget` (high_bar: the level above which the high gain applies,
+    default budget · HIGH_THRESHOLD).
+    """
+    if high_bar is None:
+        high_bar = budget * HIGH_THRESHOLD
+    diff_power = power - budget            # (+) means we are *over* budget
+    if power > high_bar:
+        # We are over budget, reduce CPU power
+        return current_cpu_power - diff_power * HIGH_CPU_PROPORTION
+    if power > budget:
+        # We are still over budget, but not too much
+        return current_cpu_power - diff_power * LOW_CPU_PROPORTION
+    if power < budget * NO_ACTION_THRESHOLD:
+        # We are under budget, but not too much
+        return current_cpu_power - diff_power * BELOW_CPU_PROPORTION
+    return current_cpu_power
+
+def estimated_p99(policy, p99_scale: float) -> float:
+    """Predicted bdev p99 (µs) under `policy`, with p99_scale µs per profiled unit."""
+    return policy["p99"] * p99_scale
+
+def without_dram_cut(rows, dram_slack_w=None):
+    """`rows` minus the DRAM-capped ones, unless trading is allowed (or nothing is left)."""
+    if dram_slack_w is not None:
+        return rows
+    return [p for p in rows if p["dram"] == 0] or rows
+
+def prefer_dram_cut(rows, best, dram_slack_w=None):
+    """
+    `best`, unless a DRAM-capped row of `rows` within dram_slack_w of it
+    keeps more CPU capacity (cores, then cpu.max, then RAPL).
+    None: DRAM trading is off.
+    """
+    if dram_slack_w is None:
+        return best
+    capacity = lambda p: (p["cores"], p["bandwidth"], p["rapl"])
+    close = [p for p in rows
+             if p["dram"] > 0 and capacity(p) > capacity(best)
+             and best["power"] - p["power"] <= dram_slack_w]
+    return max(close, key=lambda p: (capacity(p), p["power"]), default=best)
+
+def prefer_uncore_cut(rows, uncore_slack_w=None):
+    """
+    Highest-power row of `rows` (ascending power), unless a row within
+    uncore_slack_w of it keeps more cores by capping the uncore.
+    None: the uncore knob is off.
+    """
+    best = rows[-1]
+    if uncore_slack_w is None:
+        return best
+    close = [p for p in rows
+             if p["uncore"] > 0 and p["cores"] > best["cores"]
+             and best["power"] - p["power"] <= uncore_slack_w]
+    return max(close, key=lambda p: (p["cores"], p["power"]), default=best)
+
+def find_policy(rows, target_cpu_power, p99_target_us=None, p99_scale=None,
+                uncore_slack_w=None, dram_slack_w=None):
+    """
+    Pick the *highest* row of `rows` that is ≤ target_cpu_power.
+    With a p99 target (and a calibrated p99 scale), only rows predicted to
+    keep the target are preferred; if none fits the power, the fitting
+    row with the lowest predicted p99 wins.
+    Near that row, uncore-capped rows that keep more cores are preferred
+    (prefer_uncore_cut), then DRAM-capped rows that keep more CPU
+    capacity (prefer_dram_cut); None turns either preference off.
+    Falls back to the lowest-power row if the target is below table range.
+
+    Example:
+        rows = load_policy(POLICY_FILE)
+        find_policy(rows, 150, uncore_slack_w=5)
+    """
+    eligible = without_dram_cut([p for p in rows if p["power"] <= target_cpu_power],
+                                dram_slack_w)
+    if not eligible:
+        return without_dram_cut(rows, dram_slack_w)[0]
+    if p99_target_us is None or p99_scale is None:
+        return prefer_dram_cut(eligible, prefer_uncore_cut(eligible, uncore_slack_w),
+                               dram_slack_w)
+    meeting = [p for p in eligible if estimated_p99(p, p99_scale) <= p99_target_us]
+    if meeting:
+        return prefer_dram_cut(meeting, prefer_uncore_cut(meeting, uncore_slack_w),
+                               dram_slack_w)
+    return min(reversed(eligible), key=lambda p: estimated_p99(p, p99_scale))
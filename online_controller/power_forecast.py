@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Short-horizon system-power forecasting.
+
+Two forecasters of power a few seconds ahead, fed once per control tick:
+
+  HoltForecaster   level + trend (double exponential smoothing) on the
+                   power alone; handles irregular tick spacing
+  ARForecaster     AR(p) on power with the aggregate read / write MiB/s
+                   of the bdevs as exogenous inputs, refit by least
+                   squares on a sliding history (needs NumPy; falls back
+                   to Holt while the history is short or NumPy is missing)
+
+The controller logs (t, power, budget, forecast) every tick; the report
+pairs each forecast with the power actually seen `horizon` later and
+shows, per window, forecast error next to the time spent over budget.
+
+Report:
+    python3 power_forecast.py report forecast.jsonl
+"""
+
+import argparse, json, sys
+from collections import deque
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:          # AR model unavailable, Holt still works
+    np = None
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+HOLT_ALPHA    = 0.5          # level smoothing
+HOLT_BETA     = 0.3          # trend smoothing
+AR_ORDER      = 3            # power lags
+AR_HISTORY    = 60           # samples used for the fit
+AR_RIDGE      = 1e-3         # keeps the fit stable on flat power
+FORECAST_LOG  = Path("./forecast.jsonl")
+REPORT_WINDOW_SEC = 60.0     # accuracy vs. time over budget, per window
+
+# ----------------------------------------------------------------------
+
+class HoltForecaster:
+    """
+    Example:
+        f = HoltForecaster()
+        f.update(t=0.0, power=400); f.update(t=1.0, power=410)
+        f.predict(3.0)       # ≈ 430 W if the ramp continues
+    """
+    name = "holt"
+
+    def __init__(self, alpha: float = HOLT_ALPHA, beta: float = HOLT_BETA):
+        self.alpha, self.beta = alpha, beta
+        self.level = self.trend = self.t = None
+
+    def update(self, t: float, power: float, read_mib=None, write_mib=None):
+        if self.level is None:
+            self.level, self.trend, self.t = power, 0.0, t
+            return
+        dt = max(t - self.t, 1e-3)
+        prev = self.level
+        self.level = self.alpha * power + (1 - self.alpha) * (prev + self.trend * dt)
+        self.trend = self.beta * (self.level - prev) / dt + (1 - self.beta) * self.trend
+        self.t = t
+
+    def predict(self, horizon: float):
+        """Power `horizon` seconds after the last update (None before any)."""
+        if self.level is None:
+            return None
+        return self.level + self.trend * horizon
+
+
+class ARForecaster:
+    """
+    Example:
+        f = ARForecaster()
+        for t, p, r, w in samples: f.update(t, p, r, w)
+        f.predict(3.0)
+    """
+    name = "ar"
+
+    def __init__(self, order: int = AR_ORDER, history: int = AR_HISTORY):
+        self.order   = order
+        self.samples = deque(maxlen=history)     # (t, power, read_mib, write_mib)
+        self.holt    = HoltForecaster()
+        self.coef    = None
+
+    def update(self, t: float, power: float, read_mib=None, write_mib=None):
+        self.samples.append((t, power, read_mib or 0.0, write_mib or 0.0))
+        self.holt.update(t, power)
+        self.coef = self._fit()
+
+    def _rows(self, p, r, w, i):
+        """Regressors predicting sample i: 1, p[i-1..i-order], r[i-1], w[i-1]."""
+        return [1.0] + [p[i - k] for k in range(1, self.order + 1)] + [r[i - 1], w[i - 1]]
+
+    def _fit(self):
+        n_coef = self.order + 3
+        if np is None or len(self.samples) < self.order + 2 * n_coef:
+            return None
+        _, p, r, w = zip(*self.samples)
+        X = np.array([self._rows(p, r, w, i) for i in range(self.order, len(p))])
+        y = np.array(p[self.order:])
+        # ridge-regularized least squares
+        A = X.T @ X + AR_RIDGE * np.eye(n_coef)
+        return np.linalg.solve(A, X.T @ y)
+
+    def step_sec(self) -> float:
+        ts = [s[0] for s in self.samples]
+        gaps = sorted(b - a for a, b in zip(ts, ts[1:]))
+        return gaps[len(gaps) // 2] if gaps else 1.0
+
+    def predict(self, horizon: float):
+        if self.coef is None:
+            return self.holt.predict(horizon)
+        steps = max(int(round(horizon / max(self.step_sec(), 1e-3))), 1)
+        _, p, r, w = zip(*self.samples)
+        p = list(p)
+        r, w = list(r), list(w)
+        for _ in range(steps):       # iterate, holding bandwidth at its last value
+            i = len(p)
+            p.append(float(np.dot(self.coef, self._rows(p, r, w, i))))
+            r.append(r[-1]); w.append(w[-1])
+        return p[-1]
+
+
+FORECASTERS = {"holt": HoltForecaster, "ar": ARForecaster}
+
+
+def control_power(actual: float, forecast, budget: float) -> float:
+    """
+    Power the controller should act on: the forecast when it crosses the
+    budget first (tighten early) or when both stay under it (relax on the
+    predicted level), but never below the actual power while over budget.
+    """
+    if forecast is None:
+        return actual
+    if actual > budget or forecast > budget:
+        return max(actual, forecast)
+    return forecast
+
+
+def report(path: Path, window: float = REPORT_WINDOW_SEC, out=sys.stdout):
+    """Forecast error and time over budget per window, then totals."""
+    with open(path) as f:
+        ticks = [json.loads(line) for line in f if line.strip()]
+    if len(ticks) < 2:
+        print("[forecast] not enough ticks", file=out)
+        return {}
+    times = [tk["t"] for tk in ticks]
+    errors = {}                      # tick index -> forecast − actual at t + horizon
+    warned = []                      # over-budget ticks that a forecast flagged ahead
+    j = 0
+    for i, tk in enumerate(ticks):
+        if tk.get("forecast") is None:
+            continue
+        target = tk["t"] + tk["horizon"]
+        j = max(j, i)
+        while j < len(ticks) and times[j] < target:
+            j += 1
+        if j < len(ticks):
+            errors[i] = tk["forecast"] - ticks[j]["power"]
+    flagged_until = float("-inf")
+    windows = {}
+    for i, tk in enumerate(ticks):
+        dt = times[i + 1] - tk["t"] if i + 1 < len(ticks) else 0.0
+        wnd = windows.setdefault(int(tk["t"] // window),
+                                 {"over": 0.0, "abs_err": 0.0, "n": 0, "total": 0.0})
+        wnd["total"] += dt
+        over = tk["power"] > tk["budget"]
+        if over:
+            wnd["over"] += dt
+            warned.append(tk["t"] <= flagged_until)
+        if tk.get("forecast") is not None and tk["forecast"] > tk["budget"]:
+            flagged_until = tk["t"] + tk["horizon"]
+        if i in errors:
+            wnd["abs_err"] += abs(errors[i])
+            wnd["n"] += 1
+    print(f"{'window':>8} {'MAE W':>7} {'over s':>7} {'over %':>7}", file=out)
+    for k in sorted(windows):
+        wnd = windows[k]
+        mae = wnd["abs_err"] / wnd["n"] if wnd["n"] else float("nan")
+        pct = 100 * wnd["over"] / wnd["total"] if wnd["total"] else 0.0
+        print(f"{k * window:8.0f} {mae:7.1f} {wnd['over']:7.1f} {pct:7.1f}", file=out)
+    errs = list(errors.values())
+    mae = sum(abs(e) for e in errs) / len(errs) if errs else float("nan")
+    bias = sum(errs) / len(errs) if errs else float("nan")
+    over = sum(wnd["over"] for wnd in windows.values())
+    total = times[-1] - times[0]
+    hit = 100 * sum(warned) / len(warned) if warned else float("nan")
+    print(f"[forecast] MAE {mae:.1f} W, bias {bias:+.1f} W over {len(errs)} forecasts; "
+          f"{over:.1f} s of {total:.1f} s over budget; {hit:.0f}% of over-budget ticks "
+          f"were forecast ahead", file=out)
+    return {"mae": mae, "bias": bias, "over_sec": over, "warned_pct": hit, "windows": windows}
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Power forecast accuracy vs. time over budget")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("report", help="summarize a forecast log")
+    r.add_argument("log", nargs="?", default=str(FORECAST_LOG))
+    r.add_argument("--window", type=float, default=REPORT_WINDOW_SEC,
+                   help=f"report window in s (default: {REPORT_WINDOW_SEC:.0f})")
+    args = p.parse_args(argv)
+    if args.cmd == "report":
+        report(Path(args.log), args.window)
+
+if __name__ == "__main__":
+    main()
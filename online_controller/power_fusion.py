@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Fused system-power estimator.
+
+Three power signals are available on the target:
+
+  • IPMI DCMI system power   – authoritative, but slow and BMC-smoothed
+  • RAPL package/DRAM power  – fast, covers the CPU side only
+  • SSD model power          – fast, derived from bdev bandwidth
+  • fan model power          – optional, from fan RPM (thermal_sensor.py)
+
+Model:  system = rapl + ssd + fan + offset
+where `offset` (PSU loss, NIC, board, SSD idle, unmodelled fans …)
+drifts slowly.
+A scalar Kalman filter tracks the offset: every IPMI reading is compared
+with the fast signals averaged over the same BMC window.  Between IPMI
+readings the estimate follows the fast signals, so control reacts at the
+rate of RAPL/bdev sampling instead of IPMI refresh.
+
+FastPowerSensor packages RAPL sampling, IPMI polling and the fusion for
+controllers that do not model the SSDs themselves (google_thunderbolt.py).
+"""
+
+import math, subprocess, time, threading
+from collections import deque
+
+from rapl_sensor import RaplSampler
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+IPMI_WINDOW_SEC   = 1.0     # BMC averaging window of "Instantaneous" reading
+IPMI_NOISE_W      = 4.0     # std-dev of one IPMI reading (W)
+FAST_NOISE_W      = 3.0     # std-dev of rapl + ssd-model sum (W)
+OFFSET_DRIFT_W    = 2.0     # offset random-walk std-dev per sqrt(second)
+INITIAL_OFFSET_W  = 0.0
+INITIAL_OFFSET_SD = 100.0   # wide prior: first IPMI reading dominates
+FAST_HISTORY_SEC  = 10.0
+
+# ----------------------------------------------------------------------
+
+class PowerFusion:
+    """
+    Example:
+        fusion = PowerFusion()
+        fusion.update_fast(rapl_w, ssd_w)     # at 10–100 Hz
+        fusion.update_ipmi(ipmi_w)            # whenever the BMC refreshes
+        watts, sigma = fusion.estimate()
+    """
+
+    def __init__(self, ipmi_window: float = IPMI_WINDOW_SEC):
+        self.ipmi_window = ipmi_window
+        self.offset      = INITIAL_OFFSET_W
+        self.var         = INITIAL_OFFSET_SD ** 2
+        self.calibrated  = False     # True after the first IPMI reading
+        self.last_ipmi   = None      # (t, watts)
+        self._t_var      = time.monotonic()
+        self._fast       = deque()   # (t, rapl_w + ssd_w)
+        self._lock       = threading.Lock()
+
+    # -- Kalman predict: offset random walk ---------------------------
+    def _predict(self, t: float):
+        dt = max(t - self._t_var, 0.0)
+        self.var   += (OFFSET_DRIFT_W ** 2) * dt
+        self._t_var = t
+
+    def update_fast(self, rapl_w, ssd_w, t: float = None, fan_w=None):
+        """Record the fast signals (any may be None if unavailable)."""
+        t = time.monotonic() if t is None else t
+        fast = (rapl_w or 0.0) + (ssd_w or 0.0) + (fan_w or 0.0)
+        with self._lock:
+            self._fast.append((t, fast))
+            while self._fast and t - self._fast[0][0] > FAST_HISTORY_SEC:
+                self._fast.popleft()
+
+    def _fast_mean(self, t0: float, t1: float):
+        vals = [v for (t, v) in self._fast if t0 <= t <= t1]
+        if vals:
+            return sum(vals) / len(vals)
+        return self._fast[-1][1] if self._fast else 0.0
+
+    def update_ipmi(self, ipmi_w: float, t: float = None):
+        """Kalman update of the offset with one IPMI reading."""
+        t = time.monotonic() if t is None else t
+        with self._lock:
+            self._predict(t)
+            z    = ipmi_w - self._fast_mean(t - self.ipmi_window, t)
+            r    = IPMI_NOISE_W ** 2
+            gain = self.var / (self.var + r)
+            self.offset    += gain * (z - self.offset)
+            self.var        = (1.0 - gain) * self.var
+            self.calibrated = True
+            self.last_ipmi  = (t, ipmi_w)
+
+    def estimate(self, t: float = None):
+        """
+        Return (watts, sigma) for the current system power,
+        or (None, None) before the first IPMI reading.
+        """
+        t = time.monotonic() if t is None else t
+        with self._lock:
+            if not self.calibrated:
+                return None, None
+            self._predict(t)
+            fast = self._fast[-1][1] if self._fast else 0.0
+            return fast + self.offset, math.sqrt(self.var + FAST_NOISE_W ** 2)
+
+
+class IpmiPoller:
+    """
+    Poll a blocking IPMI reader in a background thread and feed a
+    PowerFusion, so `ipmitool` latency never stalls the control loop.
+    """
+
+    def __init__(self, read_power, fusion: PowerFusion, period: float = 1.0):
+        self.read_power = read_power
+        self.fusion     = fusion
+        self.period     = period
+        self.errors     = 0
+        self._stop      = threading.Event()
+        self._thread    = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                watts = self.read_power()
+                if watts is not None:
+                    self.fusion.update_ipmi(float(watts))
+            except Exception:
+                self.errors += 1
+            self._stop.wait(self.period)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ipmi-poller",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def read_ipmi_power():
+    """One IPMI DCMI "Instantaneous" reading (W), or None."""
+    result = subprocess.run(["ipmitool", "dcmi", "power", "reading"],
+                            capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if "Instantaneous" in line:
+            return float(line.split()[3])  # Assuming power value is the 4th field
+    return None
+
+
+class FastPowerSensor:
+    """
+    RAPL (sampled in the background) + IPMI (polled in the background)
+    fused into one non-blocking system-power reading.
+
+    Example:
+        sensor = FastPowerSensor().start()
+        watts, sigma = sensor.read()     # (None, None) until the first IPMI reading
+        sensor.stop()
+    """
+
+    def __init__(self, read_power=read_ipmi_power, ipmi_period: float = 1.0,
+                 rapl_hz: float = 50, window: float = 0.2):
+        self.fusion = PowerFusion()
+        self.rapl   = RaplSampler(rate_hz=rapl_hz)
+        self.window = window
+        self._read_power = read_power
+        self.poller = IpmiPoller(self._read_ipmi, self.fusion, ipmi_period)
+
+    def start(self):
+        self.rapl.start()
+        self.poller.start()
+        return self
+
+    def stop(self):
+        self.poller.stop()
+        self.rapl.stop()
+
+    def _feed(self):
+        rapl_w = self.rapl.total_watts("", self.window) if self.rapl.available else None
+        if rapl_w is not None:
+            self.fusion.update_fast(rapl_w, None)
+
+    def _read_ipmi(self):
+        # keep the fast history current, so the offset is fitted against it
+        self._feed()
+        return self._read_power()
+
+    def read(self):
+        """(watts, sigma) now; (None, None) before the first IPMI reading."""
+        self._feed()
+        return self.fusion.estimate()
@@ -3,39 +3,121 @@
 Simple proportional controller for server-level power.
 
   • Reads the instantaneous system power from IPMI
-  • Reads the target budget from ./budget   (first line, integer watts)
+  • Samples RAPL package/DRAM energy at a high rate (rapl_sensor.py)
+  • Fuses IPMI, RAPL and the SSD bandwidth model into one fast
+    system-power estimate (power_fusion.py)
+  • A 20 Hz emergency loop clamps RAPL/cpu.max on sudden violations;
+    the proportional loop below relaxes the clamp (emergency_cap.py)
+  • Optionally classifies the I/O mix from bdev_get_iostat and switches
+    to the policy table / SSD model profiled for it, if that profile's
+    policy file exists (workload_classifier.py)
+  • Measures per-bdev p50/p99 from SPDK latency histograms and prefers
+    policies that keep the p99 target (latency_sensor.py)
+  • Checkpoints its state every tick and warm-restarts from a fresh
+    checkpoint instead of resetting to full power (checkpoint.py)
+  • Applies independent knobs concurrently, each with a deadline,
+    retries and rollback on partial failure (actuation.py)
+  • Measures the cost of every knob change (latency, throughput dip),
+    holds the current policy inside a cost-scaled hysteresis band,
+    quantizes SSD limits, sends only the drives that change and merges
+    a tick's changes into one batch (actuation_planner.py)
+  • Places SPDK reactors on whole physical cores near the I/O devices,
+    matching the profiled layout (cpu_topology.py)
+  • Optional per-core frequency cap from a policy "freq" column (cpu_knobs.py)
+  • Optional uncore frequency cap from a policy "uncore" column; near the
+    chosen power, rows that lower the uncore win over rows that cut cores
+  • Optional DRAM RAPL limit from a policy "dram" column; while bdev I/O
+    is light (small working set), rows that cap DRAM and keep more CPU
+    capacity win near the chosen power; DRAM watts are in the RAPL log
+  • Optionally, below the lowest policy, takes idle non-SPDK CPUs
+    offline step by step and logs the watts it saves; they come back
+    online on exit
+  • Optionally keeps active reactors in shallow C-states and lets the
+    SPDK CPUs a lower core count parks go deep; the package watts saved
+    are measured and subtracted from the power of policy rows with
+    parked CPUs
+  • When SSDs must give up power, picks per drive between bdev QoS and
+    (optionally, with a measured power-state table) an NVMe power state
+    by predicted watts saved per MiB/s lost, keeping cuts already in
+    effect, and gives the CPU back only what the SSD plan saves
+    (nvme_power.py)
+  • Tenant priority classes: best-effort bdevs are throttled before
+    latency-critical ones; per-class p99 and throughput are logged
+    (tenants.py)
+  • Shadow mode: other controllers (Thunderbolt) decide on the same
+    readings every tick and their would-be actions are logged (shadow.py)
+  • Drives either the SPDK target (rpc.py) or the kernel nvmet target
+    (/sys/block stat, nvmet-wq cpumask, NVMe power states; no SSD
+    bandwidth or cpu.max knob there) (storage_backend.py)
+  • Optional short-horizon power forecast (Holt trend or AR on power
+    and bdev bandwidth): tightens before a predicted crossing and relaxes
+    on a predicted drop; forecasts are logged for the accuracy report
+    (power_forecast.py)
+  • Runs on housekeeping CPUs outside the SPDK mask and logs its own
+    CPU time, helper processes, syscalls, wakeups and estimated watts as
+    a fraction of the budget every tick (self_overhead.py)
+  • Optional fan term in the power model: fan RPM / temperatures from
+    hwmon or IPMI SDR, fan power fitted online as k·Σ(kRPM)³, and the
+    predicted change of fan power added as a feed-forward disturbance
+    instead of being chased with the CPU knobs (thermal_sensor.py)
+  • Reads the target budget from ./budget   (first line, integer watts),
+    or steps it locally from a timed schedule file, logging the actual
+    step times (budget_schedule.py);
+    optionally enforced as average watts over a window with a hard
+    ceiling, spending energy left unused in the trailing window on
+    bursts (energy_budget.py)
   • Computes the error  (actual − budget)
   • Reduces CPU power by Kp · error, but only in discrete steps that
-    exist in policy.csv
+    exist in policy.csv (pass_policy.py, shared with the shadow)
   • Applies the corresponding core-count mask, CPU bandwidth limit
     and RAPL power cap – *only* when those values differ from the
     last settings.
 """
 
-import csv, os, time, subprocess, signal, sys
+import os, time, subprocess, signal, sys, threading
 from pathlib import Path
-import subprocess, json, time, tempfile
+import json
+
+from rapl_sensor import RaplSampler
+from power_fusion import PowerFusion, IpmiPoller
+from emergency_cap import EmergencyCap
+from workload_classifier import WorkloadClassifier
+from latency_sensor import LatencySensor
+from checkpoint import save_checkpoint, load_checkpoint
+from actuation import ActuationEngine
+from cpu_topology import CpuTopology
+from cpu_knobs import CpuFreqKnob, UncoreFreqKnob, DramPowerKnob, CpuIdleKnob, CpuHotplugKnob
+from nvme_power import plan_ssd_savings
+from storage_backend import SpdkBackend, KernelNvmetBackend
+from tenants import TenantMap
+from energy_budget import EnergyBucket
+from budget_schedule import BudgetSchedule
+from thermal_sensor import (ThermalPoller, FanPowerModel, FanPredictor, read_hwmon,
+                            read_ipmi_sdr, fan_load)
+from self_overhead import SelfOverhead, resolve_housekeeping, pin_housekeeping
+from shadow import ShadowRecorder, pass_cpu_share, direction
+from pass_policy import (POLICY_FILE, INITIAL_CPU_POWER, SPDK_CORES, HIGH_THRESHOLD,
+                         load_policy, cpu_power_target, estimated_p99, find_policy)
+from power_forecast import FORECASTERS, control_power
+from actuation_planner import (KnobCosts, PendingChanges, hold, quantize_qos,
+                               qos_delta, states_delta)
 
 # ----------------------------------------------------------------------
 # ----------------  CONFIG -------------------------------------------------
 
 MiB = 1024 * 1024
-IOSTAT = ["./scripts/rpc.py", "bdev_get_iostat"] # Assuming in the same directory as SPDK
+# NVMe-oF target: "spdk" (nvmf_tgt via rpc.py) or "nvmet" (Linux kernel target)
+TARGET_BACKEND = "spdk"
 
-# POLICY_FILE       = Path("policy.csv")
+# POLICY_FILE, INITIAL_CPU_POWER, SPDK_CORES, the thresholds and the
+# proportional gains are in pass_policy.py (shared with shadow.py)
 # BUDGET_FILE       = Path("budget")
-POLICY_FILE       = Path("./policy.csv")
 BUDGET_FILE       = Path("./budget")    # Get power budget from local file
+# Timed budget steps run by the controller itself, e.g. Path("./budget_schedule")
+# (fig13); BUDGET_FILE is only read before the first step
+BUDGET_SCHEDULE   = None
+BUDGET_STEP_LOG   = Path("./budget_steps.csv")
 CTRL_PERIOD_SEC   = 1.0           # control interval
-INITIAL_CPU_POWER = 210           # starting point (W)
-SPDK_CORES        = 8              # number of SPDK cores (0..7)
-
-HIGH_THRESHOLD    = 1.05          # 5% over budget
-NO_ACTION_THRESHOLD = 0.98        # 2% under budget
-
-HIGH_CPU_PROPORTION = 0.6    # 80% of CPU for power decrease
-LOW_CPU_PROPORTION  = 0.3    # 50% of CPU for power decrease
-BELOW_CPU_PROPORTION = 0.5    # 50% of CPU for power increase
 
 # SSD model (single SSD)
 WATT_READ = 7
@@ -47,25 +129,228 @@ WATT_PER_WRITE_MIB = WATT_WRITE / WRITE_BANDWIDTH_MIB
 
 # SSD config
 NUM_SSD = 10
+# adapt to your naming scheme (bdev names for SPDK, block devices for nvmet)
+SSD_BDEVS = [f"Nvme{i}n1" if TARGET_BACKEND == "spdk" else f"nvme{i}n1"
+             for i in range(NUM_SSD)]
+
+# Tenant classes: bdev lists per class (tenants.THROTTLE_ORDER); bdevs not
+# listed are best-effort.  e.g. fig12: {"latency_critical": ["Nvme0n1"]}
+TENANT_CLASSES = {}
+TENANTS = TenantMap(TENANT_CLASSES)
+
+# NVMe power states as an SSD knob next to QoS (model in nvme_power.py).
+# Off by default: turn on only once nvme_power.POWER_STATES holds values
+# measured on your drives (the shipped table is a placeholder)
+USE_NVME_POWER_STATES  = False
+NVME_PS_MAX_LATENCY_US = 500      # skip states with entry+exit latency above this
+
+# RAPL sampler (package + DRAM energy counters)
+RAPL_SAMPLE_HZ    = 50            # 10–100 Hz
+RAPL_WINDOW_SEC   = CTRL_PERIOD_SEC   # averaging window reported each tick
+
+# Power fusion (IPMI + RAPL + SSD model)
+USE_FUSED_POWER   = True          # control on the fused estimate, not raw IPMI
+IPMI_POLL_SEC     = 1.0           # background IPMI refresh period
+FAST_WINDOW_SEC   = 0.2           # RAPL averaging window fed to the fusion
+
+# Fan term of the power model (needs USE_FUSED_POWER)
+USE_FAN_MODEL      = True
+FAN_SOURCE         = "hwmon"      # "hwmon" or "ipmi" (ipmitool sdr, seconds per read)
+FAN_POLL_SEC       = 1.0
+FAN_FF_HORIZON_SEC = 5.0          # fan power change predicted this far ahead
+FAN_FF_MAX_W       = 30.0         # bound of the feed-forward term
+
+# Emergency cap loop (needs USE_FUSED_POWER for a fast power signal)
+USE_EMERGENCY_CAP   = True
+EMERGENCY_HZ        = 20
+EMERGENCY_MARGIN    = 0.03        # clamp above budget + 3%
+EMERGENCY_WINDOW_SEC = 0.1        # RAPL window used by the fast loop
+EMERGENCY_OVERSHOOT = 1.2         # cut 120% of the excess from CPU power
+EMERGENCY_WRITE_TIMEOUT_SEC = 0.5 # bound on the powercap-set fallback (lock held)
+
+# Power forecast: None (react to measured power), "holt" or "ar" (NumPy)
+FORECAST_MODEL       = None
+FORECAST_HORIZON_SEC = 3.0
+FORECAST_LOG         = Path("./forecast.jsonl")
+RAPL_LIMIT_FILE     = Path("/sys/class/powercap/intel-rapl:0/constraint_1_power_limit_uw")
+
+# Workload classes -> profiled policy table and SSD model.
+# A class whose policy file is missing is not switched to (the current
+# profile stays); missing SSD keys fall back to the single-SSD model
+# above.  Add measured "watt_read" / "read_bandwidth_mib" /
+# "watt_write" / "write_bandwidth_mib" per class from your profiling runs.
+USE_WORKLOAD_CLASSIFIER = False
+WORKLOAD_PROFILES = {
+    "rand_read_small":  {"policy": Path("./policy_rand_read_small.csv")},
+    "rand_write_small": {"policy": Path("./policy_rand_write_small.csv")},
+    "seq_write_large":  {"policy": Path("./policy_seq_write_large.csv")},
+    "read_large":       {"policy": Path("./policy_read_large.csv")},
+    "mixed":            {"policy": POLICY_FILE},
+}
+
+# Tail latency (SPDK bdev latency histograms)
+USE_LATENCY_SENSOR = True
+P99_TARGET_US      = 2000         # preferred per-bdev p99; None: power only
+P99_BDEVS          = None         # bdevs the target applies to (None: the
+                                  # latency-critical tenants, else all)
+P99_CALIB_ALPHA    = 0.3          # EWMA weight of measured/profiled p99 ratio
+
+# Budget mode: "instant" (hard cap, the default) or "energy" (average
+# watts over ENERGY_WINDOW_SEC; bursts may spend banked energy up to the
+# ceiling, which must stay at or below the facility limit)
+BUDGET_MODE          = "instant"
+ENERGY_WINDOW_SEC    = 60.0
+ENERGY_SPEND_SEC     = 10.0       # unused energy is spread over this horizon
+BUDGET_CEILING_W     = None       # hard ceiling; None: budget * BUDGET_CEILING_RATIO
+BUDGET_CEILING_RATIO = 1.15
+
+# Shadow controllers deciding on the same sensor stream (shadow.SHADOWS),
+# e.g. ["thunderbolt"]; report with `python3 shadow.py report`
+SHADOW_CONTROLLERS = []
+SHADOW_LOG         = Path("./shadow.jsonl")
+
+# Checkpoint / warm restart
+USE_CHECKPOINT         = True
+CHECKPOINT_FILE        = Path("./controller_state.json")
+CHECKPOINT_MAX_AGE_SEC = 5 * CTRL_PERIOD_SEC   # older checkpoints → cold start
+
+# Actuation engine
+ACTUATOR_DEADLINE_SEC = 2.0       # per knob change, including retries
+ACTUATOR_RETRIES      = 2
+ROLLBACK_ON_PARTIAL_FAILURE = True
+# Hysteresis around policy boundaries and quantized SSD limits
+# (bands and grid in actuation_planner.py); over-budget cuts never wait
+USE_ACTUATION_PLANNER = True
+
+# SPDK reactor placement
+SPDK_CPUS         = list(range(SPDK_CORES))  # CPUs in nvmf_tgt's -m mask (0xFF)
+SPDK_PCI_DEVICES  = []            # NVMe BDFs, e.g. "0000:3b:00.0" (NUMA hint)
+SPDK_NET_IFACES   = []            # NVMe-oF NIC names, e.g. "ens1f0" (NUMA hint)
+
+# CPU frequency knob: policy column "freq" in kHz (0 / absent = no cap)
+USE_DVFS                = True
+DVFS_USERSPACE_GOVERNOR = False   # True: pin with scaling_setspeed (as profiled
+                                  # by cpu_model/single_socket_dvfs)
+
+# Uncore knob: policy column "uncore" in kHz (0 / absent = no cap),
+# profiled with UNCORE_FREQS_KHZ in cpu_model/*/run_simul.sh
+USE_UNCORE        = True
+UNCORE_PACKAGES   = None          # e.g. [0]; None = every package/die
+CORE_KEEP_SLACK_W = 5             # W of policy power given up to keep cores
+                                  # by capping the uncore instead
+
+# DRAM knob: policy column "dram" in W per DRAM zone (0 / absent = no cap),
+# profiled with DRAM_LIMITS_W in cpu_model/*/run_simul.sh
+USE_DRAM_CAP        = True
+DRAM_PACKAGES       = None        # e.g. [0]; None = every package
+DRAM_TRADE_SLACK_W  = 5           # W of policy power given up to keep CPU
+                                  # capacity by capping DRAM instead
+DRAM_TRADE_MAX_MIBS = 2000        # DRAM-capped rows only while bdev read+write
+                                  # MiB/s stays below this (small working set)
+
+# CPU hot-unplug when the target is below the policy table (takes host
+# CPUs offline: opt-in)
+USE_CPU_HOTPLUG      = False
+HOTPLUG_STEP         = 2          # CPUs offlined / onlined per tick
+HOTPLUG_MAX_OFFLINE  = None       # None: every idle non-SPDK CPU
+HOTPLUG_KEEP_ONLINE  = []         # extra CPUs never offlined (housekeeping, IRQs)
+HOTPLUG_IDLE_MAX     = 0.05       # busy fraction above which a CPU is not idle
+
+# C-states of the SPDK CPUs: reactors keep only states with exit latency
+# ≤ CSTATE_SHALLOW_US, CPUs parked by a lower core count may go deep
+# (changes host cpuidle settings: opt-in)
+USE_CSTATE_PARKING   = False
+CSTATE_SHALLOW_US    = 2          # cpuidle stateK/latency still allowed on reactors
+CSTATE_ALPHA         = 0.3        # EWMA weight of a new saving measurement
+
+# Controller threads and helpers run here, never on SPDK_CPUS
+# (None: first online CPU outside SPDK_CPUS, []: no pinning)
+HOUSEKEEPING_CPUS    = None
+USE_SELF_OVERHEAD    = True       # per-tick CPU / fork / syscall / wakeup accounting
 
 # ----------------------------------------------------------------------
 # ----------  CONTROL ACTORS  ---------------------------
+# Serializes knob writes between the control loop and the emergency loop
+ACTUATION_LOCK = threading.Lock()
+# Callables that put host settings back when the controller exits
+RESTORE_ON_EXIT = []
+ENGINE = ActuationEngine(deadline=ACTUATOR_DEADLINE_SEC, retries=ACTUATOR_RETRIES,
+                         rollback=ROLLBACK_ON_PARTIAL_FAILURE)
+# Measured cost per knob, and the knobs changed during the current tick
+COSTS = KnobCosts()
+TICK_KNOBS = set()
+
+if TARGET_BACKEND == "nvmet":
+    BACKEND = KernelNvmetBackend(SSD_BDEVS)
+    for limitation in BACKEND.limitations():
+        print(f"[controller] nvmet: {limitation}", file=sys.stderr)
+else:
+    BACKEND = SpdkBackend(thread_ids=range(1, SPDK_CORES + 2))    # IDs 1..9
+RESTORE_ON_EXIT.append(BACKEND.restore)
+
+SCHEDULE = BudgetSchedule(BUDGET_SCHEDULE, BUDGET_STEP_LOG, "controller", controller="pass") \
+    if BUDGET_SCHEDULE else None
+
+def read_budget() -> int:
+    """Read the power budget (current schedule step, or first line of
+    BUDGET_FILE, integer watts)."""
+    if SCHEDULE is not None and SCHEDULE.current() is not None:
+        return SCHEDULE.current()
+    with BUDGET_FILE.open() as f:
+        return int(f.readline().strip())
+
+def budget_ceiling(budget) -> float:
+    """Hard power ceiling of the energy-window budget mode."""
+    return BUDGET_CEILING_W if BUDGET_CEILING_W is not None else budget * BUDGET_CEILING_RATIO
+
+def read_iostat():
+    """Return the per-bdev counters of one `bdev_get_iostat` call (or its
+    /sys/block equivalent on nvmet)."""
+    return BACKEND.read_iostat()
+
+class BandwidthMeter:
+    """
+    Non-blocking bandwidth sensor: every poll() returns the aggregate
+    read/write MiB/s since the previous poll (one RPC call per poll,
+    or none if the caller passes an iostat result it already has).
+    """
+    def __init__(self):
+        self._last = None    # (t, bytes_read, bytes_written)
+
+    def poll(self, bdevs=None):
+        if bdevs is None:
+            bdevs = read_iostat()
+        t = time.perf_counter()
+        r = sum(b["bytes_read"] for b in bdevs)
+        w = sum(b["bytes_written"] for b in bdevs)
+        last, self._last = self._last, (t, r, w)
+        if last is None or t <= last[0]:
+            return None, None
+        dt = t - last[0]
+        return (r - last[1]) / MiB / dt, (w - last[2]) / MiB / dt
+
+def ssd_model_power(read_mib: float, write_mib: float) -> float:
+    """Dynamic SSD power (W) predicted from aggregate bandwidth."""
+    return read_mib * WATT_PER_READ_MIB + write_mib * WATT_PER_WRITE_MIB
+
 def get_instant_bandwidth(interval: float = 1.0):
     """
     Measure aggregate SSD bandwidth over `interval` seconds
     using exactly two RPC calls.
 
-    Returns a 5-tuple:
-        (total_MiB_s, read_MiB_s, write_MiB_s, raw_read_MiB_s, raw_write_MiB_s)
+    Returns a 4-tuple:
+        (read_MiB_s, write_MiB_s, per-SSD read_MiB_s, per-SSD write_MiB_s)
+    with the per-SSD lists in SSD_BDEVS order (0 for a bdev not reported),
+    whatever order bdev_get_iostat lists them in.
     """
 
     def _totals():
-        out   = subprocess.check_output(IOSTAT)
-        bdevs = json.loads(out)["bdevs"]
-        bdev_reads = [b["bytes_read"] for b in bdevs]
-        bdev_writes = [b["bytes_written"] for b in bdevs]
-        r = sum(bdev_reads)
-        w = sum(bdev_writes)
+        bdevs = read_iostat()
+        by_name = {b["name"]: b for b in bdevs}
+        bdev_reads = [by_name[n]["bytes_read"] if n in by_name else 0 for n in SSD_BDEVS]
+        bdev_writes = [by_name[n]["bytes_written"] if n in by_name else 0 for n in SSD_BDEVS]
+        r = sum(b["bytes_read"] for b in bdevs)
+        w = sum(b["bytes_written"] for b in bdevs)
         return r, w, bdev_reads, bdev_writes
 
     r0, w0, br0, bw0 = _totals()
@@ -95,78 +380,61 @@ def calculate_power() -> int:
             ipmi_power = int(line.split()[3])  # Assuming power value is the 4th field
             return ipmi_power
 
-def set_ssd_bandwidth(read_mibs, write_mibs):
-    """
-    Set SSD bandwidth limit using SPDK bdev_set_qos_limit.
-    The limit is set as a percentage of the total SSD bandwidth.
-    """
-    # # If read or write mib/s is 0, it means no change, so no rpc needed
-    if len(read_mibs) != NUM_SSD or len(write_mibs) != NUM_SSD:
-        raise ValueError("read_mibs and write_mibs must both have length NUM_SSD")
-
-    # Build one QoS line per SSD that actually needs a change
-    lines = []
-    for idx in range(NUM_SSD):
-        r_limit = int(read_mibs[idx])
-        w_limit = int(write_mibs[idx])
-
-        if r_limit == 0 and w_limit == 0:
-            continue            # nothing to do for this SSD
-        args = []
-        if r_limit > 0:
-            args.append(f"--r-mbytes-per-sec {r_limit}")
-        if w_limit > 0:
-            args.append(f"--w-mbytes-per-sec {w_limit}")
-
-        if len(args) > 0:
-            bdev = f"Nvme{idx}n1"   # adapt to your naming scheme
-            lines.append(f"bdev_set_qos_limit {bdev} " + " ".join(args))
-
-    if not lines:               # every limit was 0 → nothing to change
-        return
+def set_nvme_power_states(states, timeout=None):
+    """Engine setter: states = power state per SSD_BDEVS entry (None: leave)."""
+    BACKEND.set_power_states(SSD_BDEVS, states, timeout=timeout)
 
-    # Batch-execute via stdin to a single rpc invocation
-    with tempfile.NamedTemporaryFile("w", delete=False) as tf:
-        tf.write("\n".join(lines) + "\n")
-        tf.flush()
-        print("\n".join(lines) + "\n")
-        subprocess.run("./scripts/rpc.py", stdin=open(tf.name), text=True, check=True)
-    os.unlink(tf.name)
+def set_ssd_qos(limits, timeout=None):
+    """Engine setter: limits = {bdev: (read_mibs, write_mibs)}, 0 = unlimited."""
+    BACKEND.set_ssd_qos(limits, timeout=timeout)
 
-def set_ssd_unlimited():
+def ssd_changes(limits, states, applied_limits=None, applied_states=None):
     """
-    Set SSD bandwidth limit to unlimited using SPDK bdev_set_qos_limit.
+    Engine changes taking the SSDs from (applied_limits, applied_states)
+    to QoS `limits` and NVMe power `states` (None: unlimited / PS0).
+    Only drives whose setting changes are sent; rollback restores them.
     """
-    # Build one QoS line per SSD that actually needs a change
-    lines = []
-    for idx in range(NUM_SSD):
-        bdev = f"Nvme{idx}n1"   # adapt to your naming scheme
-        lines.append(f"bdev_set_qos_limit {bdev} --r-mbytes-per-sec 0 --w-mbytes-per-sec 0")
-
-    # Batch-execute via stdin to a single rpc invocation
-    with tempfile.NamedTemporaryFile("w", delete=False) as tf:
-        tf.write("\n".join(lines) + "\n")
-        tf.flush()
-        subprocess.run("./scripts/rpc.py", stdin=open(tf.name), text=True, check=True)
-    os.unlink(tf.name)
-
-def set_cpu_powercap(cpu_powercap: int):
+    changes = []
+    delta = qos_delta(SSD_BDEVS, applied_limits, limits) if BACKEND.supports_qos else None
+    if delta:
+        back = qos_delta(SSD_BDEVS, limits, applied_limits)
+        changes.append({"name": "ssd", "fn": set_ssd_qos, "value": delta, "old": back})
+    if USE_NVME_POWER_STATES:
+        ps = states_delta(applied_states, states, NUM_SSD)
+        if ps is not None:
+            changes.append({"name": "nvme_ps", "fn": set_nvme_power_states, "value": ps,
+                            "old": states_delta(states, applied_states, NUM_SSD)})
+    return changes
+
+def set_cpu_powercap(cpu_powercap: int, timeout=None):
     """Set RAPL powercap for power target on CPU"""
     result = subprocess.run(
             ["powercap-set", "intel-rapl", "-z", "0", "-c", "1", "-l", f"{cpu_powercap}000000"],
-            capture_output=False
+            capture_output=False, check=True, timeout=timeout
         )
 
-def set_cpu_bandwidth(limit_percentage: int):
+def write_cpu_powercap(cpu_powercap: int, timeout=None):
+    """
+    Same limit as set_cpu_powercap, written straight to sysfs so the
+    emergency loop does not pay for a powercap-set fork; the powercap-set
+    fallback is bounded by `timeout`.
+    """
+    try:
+        RAPL_LIMIT_FILE.write_text(f"{cpu_powercap}000000")
+    except OSError:
+        set_cpu_powercap(cpu_powercap, timeout=timeout)
+
+def set_cpu_bandwidth(limit_percentage: int, timeout=None):
     """
     Set CPU bandwidth limit for the application cgroup.
     The limit is set as a percentage of the total CPU bandwidth.
+    (`timeout` is accepted for the actuation engine; a cgroupfs write
+    does not block.)  No-op on backends without such a cgroup (nvmet,
+    reported at start-up).
     """
-    # Define the path to the cgroup v2
-    cgroup_path = '/sys/fs/cgroup/'
-
-    # Create a new cgroup for the application if it doesn't exist
-    app_cgroup = os.path.join(cgroup_path, 'user')
+    app_cgroup = BACKEND.cpu_cgroup
+    if app_cgroup is None:
+        return
 
     # Calculate the percentage to be used
     conf_str = str(int(1000000 * limit_percentage / 100)) + " 1000000"
@@ -175,131 +443,518 @@ def set_cpu_bandwidth(limit_percentage: int):
     with open(os.path.join(app_cgroup, 'cpu.max'), 'w') as f:
         f.write(conf_str)
 
-def set_spdk_cpumask(num_cores: int):
+TOPOLOGY = CpuTopology(allowed=SPDK_CPUS, pci_devices=SPDK_PCI_DEVICES,
+                       net_ifaces=SPDK_NET_IFACES)
+
+def spdk_cpus_for(num_cores: int):
+    """
+    Logical CPUs for num_cores reactors: whole physical cores on the I/O
+    NUMA node first (the resctl.sh layout), or the lowest num_cores CPUs
+    if the topology could not be read.
+    """
+    if len(TOPOLOGY.allowed) >= SPDK_CORES:
+        return TOPOLOGY.select_cpus(num_cores)
+    return list(range(num_cores))
+
+def set_spdk_cpumask(num_cores: int, timeout=None):
     """
-    Tell every SPDK thread (ID 1‑SPDK_CORES+1) to run on the lowest num_cores CPUs.
+    Confine the target's I/O threads to num_cores CPUs chosen by
+    spdk_cpus_for(): every SPDK thread (ID 1‑SPDK_CORES+1) via
+    thread_set_cpumask, or the cpumask of nvmet-wq.
+    `timeout` bounds all RPC calls together.
     Example:
-        num_cores = 3  -> mask 0x7  (binary 0b0000_0111)
+        num_cores = 3  -> CPUs [0, 1, 2] -> mask 0x7  (binary 0b0000_0111)
     """
     if num_cores < 1 or num_cores > SPDK_CORES:
         raise ValueError(f"num_cores must be between 1 and {SPDK_CORES}")
-    mask_hex = format((1 << num_cores) - 1, 'x')      # 1‑>1, 2‑>3, 3‑>7, …
-    for tid in range(1, SPDK_CORES+2):                           # IDs 1..9
-        subprocess.run(
-            ["/home/dedongx/power_aware_storage/scripts/rpc.py", "thread_set_cpumask",
-             "--cpumask", mask_hex, "--id", str(tid)],
-            capture_output=False
-        )
+    cpus = spdk_cpus_for(num_cores)
+    BACKEND.set_cpumask(cpus, timeout=timeout)
+    if CSTATES is not None and CSTATES.available:
+        # parked CPUs go deep once the control loop can measure the saving
+        CSTATES.keep_shallow(cpus)
+
+CSTATES = CpuIdleKnob(SPDK_CPUS, shallow_us=CSTATE_SHALLOW_US) if USE_CSTATE_PARKING else None
+if CSTATES is not None:
+    RESTORE_ON_EXIT.append(CSTATES.restore)
+
+CPU_FREQ = CpuFreqKnob(SPDK_CPUS, userspace=DVFS_USERSPACE_GOVERNOR) if USE_DVFS else None
+if CPU_FREQ is not None:
+    RESTORE_ON_EXIT.append(CPU_FREQ.restore)
+
+def set_cpu_frequency(freq_khz: int, timeout=None):
+    """Cap the SPDK CPUs at freq_khz (0: hardware maximum)."""
+    if CPU_FREQ is not None and CPU_FREQ.available:
+        CPU_FREQ.set(freq_khz)
+
+UNCORE = UncoreFreqKnob(UNCORE_PACKAGES) if USE_UNCORE else None
+if UNCORE is not None:
+    RESTORE_ON_EXIT.append(UNCORE.restore)
+
+def set_uncore_frequency(freq_khz: int, timeout=None):
+    """Cap the uncore of UNCORE_PACKAGES at freq_khz (0: hardware maximum)."""
+    if UNCORE is not None and UNCORE.available:
+        UNCORE.set(freq_khz)
 
-def load_policy(path: Path):
+DRAM = DramPowerKnob(DRAM_PACKAGES) if USE_DRAM_CAP else None
+if DRAM is not None:
+    RESTORE_ON_EXIT.append(DRAM.restore)
+
+def set_dram_power_limit(watts: int, timeout=None):
+    """Cap every DRAM zone of DRAM_PACKAGES at `watts` (0: limit found at start)."""
+    if DRAM is not None and DRAM.available:
+        DRAM.set(watts)
+
+HOUSEKEEPING = resolve_housekeeping(HOUSEKEEPING_CPUS, SPDK_CPUS)
+
+# SPDK CPUs are protected, so reactor cpumasks never include an offline CPU
+HOTPLUG = CpuHotplugKnob(SPDK_CPUS + HOTPLUG_KEEP_ONLINE + HOUSEKEEPING,
+                         idle_threshold=HOTPLUG_IDLE_MAX) if USE_CPU_HOTPLUG else None
+if HOTPLUG is not None:
+    RESTORE_ON_EXIT.append(HOTPLUG.restore)
+
+def hotplug_target(n_offline: int, target_cpu_power) -> int:
     """
-    Return a list of rows sorted by *ascending* CPU power.
-    Each row is a dict  {power, cores, bandwidth, rapl}
+    CPUs to have offline next tick: HOTPLUG_STEP more while the CPU power
+    target is below the lowest policy, HOTPLUG_STEP fewer once above it.
     """
-    with path.open() as f:
-        reader = csv.DictReader(f, skipinitialspace=True)
-        rows   = []
-        for row in reader:
-            rows.append({
-                "power"     : int(row["power"]),
-                "cores"     : int(row["cores"]),
-                "bandwidth" : int(row["bandwidth"]),
-                "rapl"      : int(row["rapl"]),
-            })
-    # ascending order ⇒ rows[0] = lowest-power policy
-    return sorted(rows, key=lambda r: r["power"])
+    limit = len(HOTPLUG.candidates)
+    if HOTPLUG_MAX_OFFLINE is not None:
+        limit = min(limit, HOTPLUG_MAX_OFFLINE)
+    if target_cpu_power < POLICY[0]["power"]:
+        return min(n_offline + HOTPLUG_STEP, limit)
+    if target_cpu_power > POLICY[0]["power"]:
+        return max(n_offline - HOTPLUG_STEP, 0)
+    return n_offline
+
+# Policy knob -> setter, for the actuation engine
+KNOB_SETTERS = {
+    "rapl"      : set_cpu_powercap,
+    "cores"     : set_spdk_cpumask,
+    "bandwidth" : set_cpu_bandwidth,
+    "freq"      : set_cpu_frequency,
+    "uncore"    : set_uncore_frequency,
+    "dram"      : set_dram_power_limit,
+}
+
+def actuate(changes, what: str):
+    """Run knob changes through ENGINE and log per-actuator outcomes."""
+    outcomes = ENGINE.apply(changes)
+    COSTS.observe_outcomes(outcomes)
+    TICK_KNOBS.update(k for k, o in outcomes.items() if o["status"] == "ok")
+    if outcomes:
+        level = sys.stdout if ENGINE.all_ok(outcomes) else sys.stderr
+        print(f"[controller] {what}: {ENGINE.format(outcomes)}", file=level)
+    return outcomes
 
 POLICY = load_policy(POLICY_FILE)
+WORKLOAD_CLASS = None       # active entry of WORKLOAD_PROFILES (None: defaults)
+
+def activate_profile(workload_class: str):
+    """
+    Switch the policy table and SSD model to the profile of `workload_class`.
+    Returns False (and changes nothing) if its policy file does not exist.
+    """
+    global POLICY, WATT_PER_READ_MIB, WATT_PER_WRITE_MIB, WORKLOAD_CLASS
+    profile = WORKLOAD_PROFILES.get(workload_class, {})
+    policy_file = profile.get("policy", POLICY_FILE)
+    if not policy_file.exists():
+        print(f"[controller] workload class {workload_class}: {policy_file} missing, "
+              f"keeping the {WORKLOAD_CLASS or 'default'} profile", file=sys.stderr)
+        return False
+    POLICY = apply_cstate_savings(load_policy(policy_file))
+    WATT_PER_READ_MIB  = (profile.get("watt_read", WATT_READ)
+                          / profile.get("read_bandwidth_mib", READ_BANDWIDTH_MIB))
+    WATT_PER_WRITE_MIB = (profile.get("watt_write", WATT_WRITE)
+                          / profile.get("write_bandwidth_mib", WRITE_BANDWIDTH_MIB))
+    WORKLOAD_CLASS = workload_class
+    print(f"[controller] workload class -> {workload_class} "
+          f"(policy={policy_file}, W/MiB read={WATT_PER_READ_MIB:.5f} "
+          f"write={WATT_PER_WRITE_MIB:.5f})")
+    return True
+
+P99_SCALE = None            # measured µs per profiled p99 unit (None: uncalibrated)
+
+def calibrate_p99(measured_p99_us, policy):
+    """
+    Track how the profiled p99 of the applied policy maps onto the
+    measured bdev p99, so other rows' p99 can be predicted in µs.
+    """
+    global P99_SCALE
+    if measured_p99_us is None or policy is None or policy.get("p99", 0) <= 0:
+        return
+    ratio = measured_p99_us / policy["p99"]
+    P99_SCALE = ratio if P99_SCALE is None else \
+        (1 - P99_CALIB_ALPHA) * P99_SCALE + P99_CALIB_ALPHA * ratio
+
+CSTATE_W_PER_CPU = None     # measured package W saved per parked SPDK CPU in deep C-states
+
+def apply_cstate_savings(rows):
+    """
+    Lower the profiled power of `rows` (in place) by the measured deep
+    C-state saving of the SPDK CPUs each row parks; keeps ascending order.
+    The table is left as loaded until a saving has been measured.
+    """
+    if not USE_CSTATE_PARKING or CSTATE_W_PER_CPU is None:
+        return rows
+    saved = CSTATE_W_PER_CPU
+    for p in rows:
+        p.setdefault("profiled_power", p["power"])
+        p["power"] = p["profiled_power"] - int(round(saved * (SPDK_CORES - p["cores"])))
+    rows.sort(key=lambda r: r["power"])
+    return rows
+
+def record_cstate_saving(watts: float, n_cpus: int):
+    """Fold one measurement (package W saved by parking n_cpus deep) into the policy."""
+    global CSTATE_W_PER_CPU
+    per_cpu = max(watts / n_cpus, 0.0)
+    CSTATE_W_PER_CPU = per_cpu if CSTATE_W_PER_CPU is None else \
+        (1 - CSTATE_ALPHA) * CSTATE_W_PER_CPU + CSTATE_ALPHA * per_cpu
+    apply_cstate_savings(POLICY)
+
+IO_MIBS = None              # bdev read+write MiB/s of the last tick (None: unknown)
+
+def observe_io(read_mib, write_mib):
+    global IO_MIBS
+    IO_MIBS = read_mib + write_mib if read_mib is not None else None
+
+def dram_trade_ok() -> bool:
+    """DRAM-capped rows are only safe while little data streams through memory."""
+    return USE_DRAM_CAP and IO_MIBS is not None and IO_MIBS <= DRAM_TRADE_MAX_MIBS
 
 def find_policy_for(target_cpu_power: int):
     """
-    Pick the *highest* policy that is ≤ target_cpu_power.
-    Falls back to the lowest-power policy if the target is below table range.
+    find_policy() on the active table, with the p99 target and its
+    calibration, the uncore preference when USE_UNCORE and DRAM trading
+    while bdev I/O is light (dram_trade_ok).
     """
-    eligible = [p for p in POLICY if p["power"] <= target_cpu_power]
-    return eligible[-1] if eligible else POLICY[0]
+    return find_policy(POLICY, target_cpu_power, P99_TARGET_US, P99_SCALE,
+                       CORE_KEEP_SLACK_W if USE_UNCORE else None,
+                       DRAM_TRADE_SLACK_W if dram_trade_ok() else None)
+
+def restore_model_state(state: dict):
+    """Restore the workload profile, p99 calibration and C-state saving from a checkpoint."""
+    global P99_SCALE, CSTATE_W_PER_CPU
+    if state.get("workload_class"):
+        activate_profile(state["workload_class"])
+    P99_SCALE = state.get("p99_scale")
+    if USE_CSTATE_PARKING:
+        CSTATE_W_PER_CPU = state.get("cstate_w_per_cpu")
+        apply_cstate_savings(POLICY)
+
+def p99_at_risk(target_cpu_power) -> bool:
+    """True if the policy for target_cpu_power is predicted to miss P99_TARGET_US."""
+    if P99_TARGET_US is None or P99_SCALE is None:
+        return False
+    return estimated_p99(find_policy_for(target_cpu_power), P99_SCALE) > P99_TARGET_US
 
-def execute_cpu_policy(current_policy, current_cpu_power, target_cpu_power):
+def execute_cpu_policy(current_policy, current_cpu_power, target_cpu_power,
+                       force=False, pending=None):
     """
-    Apply the given policy to the system.
+    Apply the given policy to the system.  Unless `force`, a switch whose
+    target is still inside the hysteresis band of the current row is
+    skipped.  With `pending`, the changes are queued there instead and
+    the caller settles the outcome when it flushes the batch.
     """
     # Find the next policy
     next_policy      = find_policy_for(target_cpu_power)
 
+    if USE_ACTUATION_PLANNER and not force and \
+            hold(current_policy, next_policy, target_cpu_power, KNOB_SETTERS, COSTS):
+        print(f"[controller] hold policy {current_policy['power']} W "
+              f"(target {target_cpu_power:.1f} W in hysteresis band; costs: {COSTS.summary()})")
+        return current_policy, current_cpu_power
+
     # Apply policy if anything changed
     if (current_policy is None) or any(
             next_policy[k] != current_policy.get(k)
-            for k in ("cores", "bandwidth", "rapl")):
+            for k in KNOB_SETTERS):
 
         print(f"[controller] -> apply policy {next_policy}")
 
-        if current_policy is None or next_policy["rapl"] != current_policy["rapl"]:
-            set_cpu_powercap(next_policy["rapl"])
-
-        if current_policy is None or next_policy["cores"] != current_policy["cores"]:
-            set_spdk_cpumask(next_policy["cores"])
-
-        if current_policy is None or next_policy["bandwidth"] != current_policy["bandwidth"]:
-            set_cpu_bandwidth(next_policy["bandwidth"])
+        changes = [{"name" : k, "fn" : KNOB_SETTERS[k], "value" : next_policy[k],
+                    "old"  : None if current_policy is None else current_policy.get(k)}
+                   for k in KNOB_SETTERS
+                   if current_policy is None or next_policy[k] != current_policy.get(k)]
+        if pending is not None:
+            for c in changes:
+                pending.add(c)
+            return next_policy, next_policy["power"]
+        with ACTUATION_LOCK:
+            outcomes = actuate(changes, "apply policy")
 
-        current_policy   = next_policy
-        current_cpu_power = next_policy["power"]
+        if ENGINE.all_ok(outcomes):
+            current_policy   = next_policy
+            current_cpu_power = next_policy["power"]
+        elif current_policy is not None:
+            # Keep what is actually in effect: new value only where it stuck
+            current_policy = {**current_policy, **{
+                k: next_policy[k] for k, o in outcomes.items()
+                if o["status"] in ("ok", "rollback_failed")}}
+        # current_policy None: state unknown, everything is re-applied next time
     return current_policy, current_cpu_power
 
 def proportional_control():
     current_policy = None         # None: nothing applied yet
     current_cpu_power = INITIAL_CPU_POWER
-    # Set initial CPU power
-    set_cpu_powercap(280)
-    set_spdk_cpumask(SPDK_CORES)
-    set_cpu_bandwidth(100)        # 100% CPU bandwidth
-    set_ssd_unlimited()           # unlimited SSD bandwidth
-    ssd_limited = False
+    fusion = PowerFusion()
+    ssd_limits = None             # (read_mibs, write_mibs) while SSDs are throttled
+    ssd_states = None             # NVMe power state per SSD while any is below PS0
+    budget = None
+    bucket = EnergyBucket(ENERGY_WINDOW_SEC, ENERGY_SPEND_SEC) if BUDGET_MODE == "energy" else None
+    last_tick = None
+    if SCHEDULE is not None:
+        SCHEDULE.start()
+    state = load_checkpoint(CHECKPOINT_FILE, CHECKPOINT_MAX_AGE_SEC) if USE_CHECKPOINT else None
+    if state is not None and state.get("policy"):
+        # Warm restart: re-assert the checkpointed knobs, no full-power reset
+        print(f"[controller] warm restart from checkpoint ({state['age']:.1f} s old): "
+              f"policy={state['policy']}, budget={state['budget']} W")
+        restore_model_state(state)
+        current_policy, current_cpu_power = state["policy"], state["cpu_power"]
+        budget = state["budget"]
+        ssd_limits = state.get("ssd_limits")
+        ssd_states = state.get("ssd_power_states")
+        initial = {**{k: current_policy.get(k, 0) for k in KNOB_SETTERS},
+                   "ssd": qos_delta(SSD_BDEVS, None, ssd_limits) if ssd_limits else None,
+                   "nvme_ps": ssd_states or [0] * NUM_SSD}
+        fusion.offset, fusion.var = state["fusion_offset"], state["fusion_var"]
+        if bucket is not None:
+            bucket.samples.extend(tuple(x) for x in state.get("energy_samples") or [])
+        if HOTPLUG is not None:
+            HOTPLUG.adopt(state.get("cpus_offline") or [])
+    else:
+        # Set initial CPU power: 280 W RAPL, all cores, 100% CPU bandwidth,
+        # unlimited SSD bandwidth
+        initial = {"rapl": 280, "cores": SPDK_CORES, "bandwidth": 100, "freq": 0,
+                   "uncore": 0, "dram": 0, "ssd": None, "nvme_ps": [0] * NUM_SSD}
+    if not USE_NVME_POWER_STATES:
+        del initial["nvme_ps"]
+    else:
+        RESTORE_ON_EXIT.append(lambda: set_nvme_power_states([0] * NUM_SSD))
+    # every drive is asserted: unthrottled ones explicitly unlimited
+    initial["ssd"] = {b: (initial["ssd"] or {}).get(b, (0, 0)) for b in SSD_BDEVS}
+    if not BACKEND.supports_qos:
+        del initial["ssd"]
+    setters = {**KNOB_SETTERS, "ssd": set_ssd_qos, "nvme_ps": set_nvme_power_states}
+    actuate([{"name": k, "fn": setters[k], "value": v, "old": None}
+             for k, v in initial.items()], "initial state")
+    TICK_KNOBS.clear()
+    ssd_limited = bool(ssd_limits) or any(ssd_states or [])
+    rapl = RaplSampler(rate_hz=RAPL_SAMPLE_HZ).start()
+    if not rapl.available:
+        print("[controller] RAPL energy counters not readable, RAPL sensing disabled",
+              file=sys.stderr)
+    bw_meter = BandwidthMeter()
+    classifier = WorkloadClassifier(initial=WORKLOAD_CLASS)
+    latency = None
+    if USE_LATENCY_SENSOR and BACKEND.supports_histograms:
+        sensor = LatencySensor(SSD_BDEVS)
+        # Turned off on exit, also after a partial enable
+        RESTORE_ON_EXIT.append(sensor.disable)
+        try:
+            latency = sensor.enable()
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"[controller] cannot enable bdev histograms: {e}", file=sys.stderr)
+    ssd_w = None                  # latest SSD model power, shared with the fast loop
+    fan_w = None                  # latest fan model power, shared with the fast loop
+    thermal = None
+    if USE_FUSED_POWER and USE_FAN_MODEL:
+        thermal = ThermalPoller(read_ipmi_sdr if FAN_SOURCE == "ipmi" else read_hwmon,
+                                FAN_POLL_SEC).start()
+        fan_model, fan_pred, fitted_ipmi_t = FanPowerModel(), FanPredictor(), None
+    shadow = ShadowRecorder("pass", SHADOW_CONTROLLERS, SHADOW_LOG) if SHADOW_CONTROLLERS else None
+    start_t, applied_share = time.monotonic(), 1.0
+    forecaster = FORECASTERS[FORECAST_MODEL]() if FORECAST_MODEL else None
+    overhead = SelfOverhead() if USE_SELF_OVERHEAD else None
+    forecast_log = open(FORECAST_LOG, "a") if forecaster is not None else None
+    hotplug_before = None         # (CPUs offline, package W) before the last hotplug change
+    cstate_before = None          # (SPDK CPUs newly parked deep, package W) before that change
+    cstate_settled = None         # parked SPDK CPUs seen last tick
+    if USE_FUSED_POWER:
+        IpmiPoller(calculate_power, fusion, IPMI_POLL_SEC).start()
+
+    def fast_power():
+        """Fresh RAPL + last SSD model power through the fusion."""
+        if rapl.available:
+            fusion.update_fast(rapl.total_watts("", EMERGENCY_WINDOW_SEC), ssd_w, fan_w=fan_w)
+        return fusion.estimate()[0]
+
+    def emergency_clamp(over_watts, held=None):
+        """
+        Cut CPU power by the excess via RAPL + cpu.max only (no RPC).
+        A clamp the slow loop has not taken yet (`held`) is the base, and
+        RAPL / cpu.max only ever go further down from it.
+        """
+        base = held or current_policy or find_policy_for(current_cpu_power)
+        clamp = find_policy_for(base["power"] - over_watts * EMERGENCY_OVERSHOOT)
+        rapl_w, bandwidth = min(clamp["rapl"], base["rapl"]), min(clamp["bandwidth"], base["bandwidth"])
+        if rapl_w == base["rapl"] and bandwidth == base["bandwidth"]:
+            return None           # already at or below this level
+        with ACTUATION_LOCK:
+            write_cpu_powercap(rapl_w, timeout=EMERGENCY_WRITE_TIMEOUT_SEC)
+            set_cpu_bandwidth(bandwidth)
+        # cores are untouched; the slow loop re-applies them if needed
+        return {**base, "power": min(clamp["power"], base["power"]), "rapl": rapl_w,
+                "bandwidth": bandwidth}
+
+    def safe_budget():
+        if bucket is not None:
+            return budget          # allowed power incl. banked energy, ≤ ceiling
+        try:
+            return read_budget()
+        except (OSError, ValueError):
+            return None
+
+    emergency = None
+    if USE_FUSED_POWER and USE_EMERGENCY_CAP:
+        emergency = EmergencyCap(fast_power, safe_budget, emergency_clamp,
+                                 rate_hz=EMERGENCY_HZ, margin=EMERGENCY_MARGIN).start()
 
     while True:
+        if emergency is not None:
+            clamped = emergency.take_clamp()
+            if clamped is not None:
+                # Adopt the clamp; the proportional step below relaxes it
+                current_policy, current_cpu_power = clamped, clamped["power"]
         try:
-            actual_power  = float(calculate_power())
-            with BUDGET_FILE.open() as f:
-                budget = int(f.readline().strip())
-                high_bar = budget * HIGH_THRESHOLD
-                no_action = budget * NO_ACTION_THRESHOLD
+            bdevs, tick_bw = None, None
+            read_mib = write_mib = None
+            if USE_FUSED_POWER or USE_WORKLOAD_CLASSIFIER or TENANT_CLASSES:
+                bdevs = read_iostat()
+            # The class is only committed once its profile is active; a
+            # failed switch is proposed again on the next tick
+            if USE_WORKLOAD_CLASSIFIER and classifier.observe(bdevs) and \
+                    activate_profile(classifier.proposed):
+                classifier.accept()
+                # Re-map the current CPU power onto the new table
+                current_policy, current_cpu_power = execute_cpu_policy(
+                    current_policy, current_cpu_power, current_cpu_power, force=True
+                )
+            if USE_FUSED_POWER:
+                rapl_w = rapl.total_watts("", FAST_WINDOW_SEC) if rapl.available else None
+                read_mib, write_mib = bw_meter.poll(bdevs)
+                ssd_w = ssd_model_power(read_mib, write_mib) if read_mib is not None else None
+                observe_io(read_mib, write_mib)
+                if read_mib is not None:
+                    tick_bw = read_mib + write_mib
+                    COSTS.observe_throughput(tick_bw)   # dip after last tick's changes
+                if thermal is not None and thermal.latest[1]:
+                    t_fans, fans, temps = thermal.latest
+                    fan_w = fan_model.power(fans)
+                    fan_pred.update(t_fans, fans, temps)
+                    ipmi = fusion.last_ipmi
+                    if ipmi is not None and ipmi[0] != fitted_ipmi_t and rapl_w is not None:
+                        # fit k on what RAPL and the SSD model leave unexplained
+                        fitted_ipmi_t = ipmi[0]
+                        fan_model.observe(ipmi[1] - rapl_w - (ssd_w or 0.0), fan_load(fans))
+                fusion.update_fast(rapl_w, ssd_w, fan_w=fan_w)
+                actual_power, power_sigma = fusion.estimate()
+                if actual_power is None:      # no IPMI reading yet
+                    actual_power, power_sigma = float(calculate_power()), None
+            else:
+                actual_power, power_sigma = float(calculate_power()), None
+            budget    = read_budget()
+            if bucket is not None:
+                # Control on what keeps the trailing window at the budget
+                now, ceiling = time.monotonic(), budget_ceiling(budget)
+                if last_tick is not None:
+                    bucket.update(actual_power, now - last_tick)
+                last_tick = now
+                allowed = bucket.allowed(budget, ceiling, CTRL_PERIOD_SEC)
+                print(f"[controller] energy budget: {budget} W avg, ceiling {ceiling:.0f} W, "
+                      f"banked {bucket.banked(budget):.0f} J -> allow {allowed:.1f} W")
+                budget = allowed
+            high_bar  = None
+            if bucket is not None:
+                # never tolerate power above the ceiling
+                high_bar = min(budget * HIGH_THRESHOLD, ceiling)
         except Exception as e:
             print(f"[controller] error reading sensors/files: {e}", file=sys.stderr)
             time.sleep(CTRL_PERIOD_SEC)
             continue
 
-        diff_power = actual_power - budget         # (+) means we are *over* budget
+        # Act on the forecast power when a model is configured
+        control_w = actual_power
+        if forecaster is not None:
+            t_now = time.monotonic() - start_t
+            forecaster.update(t_now, actual_power, read_mib, write_mib)
+            forecast = forecaster.predict(FORECAST_HORIZON_SEC)
+            control_w = control_power(actual_power, forecast, budget)
+            if forecast is not None:
+                print(f"[controller] forecast {FORECAST_HORIZON_SEC:.0f} s: {forecast:5.1f} W "
+                      f"({forecaster.name}) -> control on {control_w:5.1f} W")
+            forecast_log.write(json.dumps({"t": t_now, "power": actual_power, "budget": budget,
+                                           "forecast": forecast,
+                                           "horizon": FORECAST_HORIZON_SEC}) + "\n")
+            forecast_log.flush()
+
+        # Fan power still to come (or to go) is a known disturbance:
+        # act on it now instead of chasing it with the CPU knobs later
+        if thermal is not None and fan_pred.fans:
+            coming_w = fan_model.power_at(fan_pred.predict(FAN_FF_HORIZON_SEC).values()) - fan_w
+            coming_w = min(max(coming_w, -FAN_FF_MAX_W), FAN_FF_MAX_W)
+            control_w += coming_w
+            print(f"[controller] fans: {fan_w:4.1f} W now (k={fan_model.k:.4f}), "
+                  f"{coming_w:+4.1f} W in {FAN_FF_HORIZON_SEC:.0f} s, hottest {fan_pred.temp:.0f} C")
+
+        diff_power = control_w - budget            # (+) means we are *over* budget
         print(f"[controller] system power={actual_power:5.1f} W, "
               f"budget={budget} W, diff={diff_power:+5.1f} W, ", f"policy={current_policy}")
+        if power_sigma is not None:
+            print(f"[controller] fused power={actual_power:5.1f} ± {2 * power_sigma:4.1f} W "
+                  f"(offset={fusion.offset:5.1f} W, last IPMI={fusion.last_ipmi[1]:5.1f} W)")
+        if latency is not None:
+            try:
+                lat_stats = latency.poll()
+                calibrate_p99(latency.worst_p99(
+                    P99_BDEVS or TENANTS.members("latency_critical", SSD_BDEVS) or None),
+                    current_policy)
+                print("[controller] latency " + ", ".join(
+                    f"{b}: p50={st['p50']:.0f}us p99={st['p99']:.0f}us"
+                    for b, st in lat_stats.items() if st["p99"] is not None))
+            except Exception as e:
+                print(f"[controller] error reading latency histograms: {e}", file=sys.stderr)
+        if TENANT_CLASSES and bdevs is not None:
+            for cls, st in sorted(TENANTS.report(
+                    bdevs, latency.stats if latency is not None else None).items()):
+                p99 = f"{st['p99']:.0f}us" if st["p99"] is not None else "n/a"
+                print(f"[controller] class {cls}: p99={p99} "
+                      f"read={st['read_mib']:.0f} MiB/s write={st['write_mib']:.0f} MiB/s")
+        if rapl.available:
+            rapl_watts = rapl.all_watts(RAPL_WINDOW_SEC)
+            print("[controller] RAPL " + ", ".join(
+                f"{d}={w:5.1f} W" for d, w in sorted(rapl_watts.items())))
 
         # Calculate target CPU power
-        target_cpu_power = current_cpu_power
-        if actual_power > high_bar:
-            # We are over budget, reduce CPU power
-            target_cpu_power = current_cpu_power - diff_power * HIGH_CPU_PROPORTION
-        elif actual_power > budget:
-            # We are still over budget, but not too much
-            target_cpu_power = current_cpu_power - diff_power * LOW_CPU_PROPORTION
-        elif actual_power < no_action:
-            # We are under budget, but not too much
-            target_cpu_power = current_cpu_power - diff_power * BELOW_CPU_PROPORTION
+        target_cpu_power = cpu_power_target(control_w, budget, current_cpu_power, high_bar)
         print(f"[controller] CPU power: current: {current_cpu_power} W target: {target_cpu_power} W")
         
         # Only if we want to change, we change
         if target_cpu_power != current_cpu_power:
             # Based on if we want to change CPU power, we do the following:
             pre_change_cpu_power = current_cpu_power
+            pre_change_policy = current_policy
+            over_budget = control_w > budget         # cuts over budget never wait in a band
+            # Probe SSD throttling at low CPU power, or when the CPU policy
+            # alone would miss the p99 target
+            probe_ssd = target_cpu_power < 110 or p99_at_risk(target_cpu_power)
             # We need to monitor SSD bandwidth
-            if target_cpu_power < 110:
+            if probe_ssd:
                 before_read_mib, before_write_mib, before_read_all_mib, before_write_all_mib = get_instant_bandwidth(0.5)
 
             # We need to change CPU power
             current_policy, current_cpu_power = execute_cpu_policy(
-                current_policy, current_cpu_power, target_cpu_power
+                current_policy, current_cpu_power, target_cpu_power, force=over_budget
             )
-            time.sleep(0.5)  # Give some time to the system to stabilize
+            # Nothing to measure if the switch was held
+            probe_ssd = probe_ssd and current_policy is not pre_change_policy
+            if probe_ssd:
+                time.sleep(0.5)  # Give some time to the system to stabilize
 
-            if target_cpu_power < 110:
+            # SSD and CPU changes decided below go out as one batch
+            pending = PendingChanges()
+            ssd_target = None             # (limits, states) at the end of this tick
+            if probe_ssd:
                 # We monitor SSD bandwidth again: if throttle/unthrottle SSD has better performance, we execute SSD first.
                 after_read_mib, after_write_mib, after_read_all_mib, after_write_all_mib = get_instant_bandwidth(0.5)
                 delta_read_mib = after_read_mib - before_read_mib
@@ -318,22 +973,164 @@ def proportional_control():
                             ssd_read_mibs[i] = after_read_all_mib[i] - 0.5 * delta_read_mib / NUM_SSD
                         if delta_write_mib < 0:
                             ssd_write_mibs[i] = after_write_all_mib[i] - 0.5 * delta_write_mib / NUM_SSD
-                    # Set SSD bandwidth limit
+                    # Per drive: keep the QoS cut, or drop to a power state
+                    # if that saves more watts per MiB/s lost; best-effort
+                    # tenants are cut before latency-critical ones
+                    # The per-drive model has no NUM_SSD factor: ask it for
+                    # the unscaled watts, no more than what is over budget
+                    need_w = min(-(delta_read_mib * WATT_PER_READ_MIB
+                                   + delta_write_mib * WATT_PER_WRITE_MIB),
+                                 max(diff_power, 0.0))
+                    qos, ssd_ps, saved_w = plan_ssd_savings(
+                        need_w, before_read_all_mib,
+                        before_write_all_mib,
+                        list(zip(ssd_read_mibs, ssd_write_mibs)) if BACKEND.supports_qos
+                        else [(0, 0)] * NUM_SSD,
+                        {"wpr": WATT_PER_READ_MIB, "wpw": WATT_PER_WRITE_MIB,
+                         "read_bw": READ_BANDWIDTH_MIB, "write_bw": WRITE_BANDWIDTH_MIB},
+                        NVME_PS_MAX_LATENCY_US,
+                        ranks=[TENANTS.rank(b) for b in SSD_BDEVS],
+                        use_states=USE_NVME_POWER_STATES,
+                        applied_qos=list(zip(*ssd_limits)) if ssd_limits else None,
+                        applied_states=ssd_states)
+                    ssd_read_mibs  = [r for r, _ in qos]
+                    ssd_write_mibs = [w for _, w in qos]
+                    if USE_ACTUATION_PLANNER:
+                        ssd_read_mibs  = quantize_qos(ssd_read_mibs)
+                        ssd_write_mibs = quantize_qos(ssd_write_mibs)
+                    ssd_ps = ssd_ps if USE_NVME_POWER_STATES else None
+                    print(f"[controller] SSD plan: power states {ssd_ps}, "
+                          f"predicted saving {saved_w:.1f} W")
                     print(f"[controller] set SSD bandwidth limit: {ssd_read_mibs}, {ssd_write_mibs}")
-                    set_ssd_bandwidth(ssd_read_mibs, ssd_write_mibs)
-                    ssd_limited = True
-                    # Unthrottle CPU
-                    current_policy, current_cpu_power = execute_cpu_policy(
-                        current_policy, current_cpu_power, pre_change_cpu_power
-                    )
+                    ssd_target = ((ssd_read_mibs, ssd_write_mibs), ssd_ps)
+                    # Unthrottle CPU by what the SSD plan saves, in the same
+                    # batch as the SSD cut, unless an emergency clamp landed
+                    probe_cpu_power = current_cpu_power
+                    give_back = min(saved_w, pre_change_cpu_power - current_cpu_power)
+                    if emergency is not None and emergency.clamp_pending():
+                        print("[controller] emergency clamp in effect: CPU stays throttled")
+                    elif give_back > 0:
+                        current_policy, current_cpu_power = execute_cpu_policy(
+                            current_policy, current_cpu_power, current_cpu_power + give_back,
+                            force=True, pending=pending
+                        )
                 if ssd_delta_power > 0:
                     # We should unthrottle SSDs if not already
-                    # Unthrottle SSDs
-                    set_ssd_unlimited()
-                    ssd_limited = False
-            if ssd_limited:
-                set_ssd_unlimited()
-                ssd_limited = False
+                    ssd_target = (None, None)
+            if ssd_limited and ssd_target is None:
+                # CPU moved without a new SSD decision: release the SSDs
+                ssd_target = (None, None)
+            if ssd_target is not None:
+                for c in ssd_changes(*ssd_target, ssd_limits, ssd_states):
+                    pending.add(c)
+            if pending:
+                changes = pending.flush()
+                with ACTUATION_LOCK:
+                    outcomes = actuate(changes, "batched update")
+                if all(outcomes[k]["status"] == "ok" for k in ("ssd", "nvme_ps") if k in outcomes):
+                    limits, states = ssd_target
+                    ssd_limits = limits if limits and any(map(any, limits)) else None
+                    ssd_states = states if any(states or []) else None
+                    ssd_limited = bool(ssd_limits) or bool(ssd_states)
+                for c in changes:
+                    o = outcomes[c["name"]]
+                    if c["name"] in KNOB_SETTERS and o["status"] not in ("ok", "rollback_failed"):
+                        # keep what is actually in effect
+                        current_cpu_power = probe_cpu_power
+                        current_policy = None if c["old"] is None else \
+                            {**current_policy, c["name"]: c["old"]}
+                        if current_policy is None:
+                            break
+
+        if shadow is not None and current_policy is not None:
+            share = pass_cpu_share(current_policy, SPDK_CORES)
+            shadow.record(time.monotonic() - start_t, actual_power, budget,
+                          {"cpu_share": share, "direction": direction(applied_share, share),
+                           "policy": current_policy})
+            applied_share = share
+
+        if HOTPLUG is not None and HOTPLUG.available:
+            try:
+                HOTPLUG.sample_idle()
+            except OSError as e:
+                print(f"[controller] error reading /proc/stat: {e}", file=sys.stderr)
+            pkg_w = rapl.total_watts("package", RAPL_WINDOW_SEC) if rapl.available else None
+            if hotplug_before is not None and pkg_w is not None and \
+                    hotplug_before[1] is not None and not TICK_KNOBS:
+                # only the hotplug step changed since the last tick
+                n_before, w_before = hotplug_before
+                # credit the change since the last step to the CPUs now offline
+                HOTPLUG.saved_w[len(HOTPLUG.offlined)] = \
+                    HOTPLUG.saved_w.get(n_before, 0.0) + (w_before - pkg_w)
+                print(f"[controller] hotplug: {len(HOTPLUG.offlined)} CPUs offline "
+                      f"{HOTPLUG.offlined}, saving ≈ "
+                      f"{HOTPLUG.saved_w[len(HOTPLUG.offlined)]:.1f} W package power")
+            hotplug_before = None
+            n_offline = hotplug_target(len(HOTPLUG.offlined), target_cpu_power)
+            if n_offline != len(HOTPLUG.offlined):
+                # measure only steps not mixed with this tick's other knob changes
+                hotplug_before = (len(HOTPLUG.offlined), pkg_w) if not TICK_KNOBS else None
+                with ACTUATION_LOCK:
+                    actuate([{"name": "hotplug", "fn": HOTPLUG.set, "value": n_offline,
+                              "old": None}], "CPU hotplug")
+
+        if CSTATES is not None and CSTATES.available and current_policy is not None:
+            pkg_w = rapl.total_watts("package", RAPL_WINDOW_SEC) if rapl.available else None
+            active = spdk_cpus_for(current_policy["cores"])
+            parked = [c for c in SPDK_CPUS if c not in active and c in CSTATES.states]
+            if cstate_before is not None and pkg_w is not None and not TICK_KNOBS:
+                # only the C-states changed since the last tick
+                newly, w_before = cstate_before
+                record_cstate_saving(w_before - pkg_w, len(newly))
+                residency = CSTATES.deep_residency(newly)
+                residency = f"{100 * residency:.0f}%" if residency is not None else "n/a"
+                print(f"[controller] C-states: SPDK CPUs {newly} parked deep "
+                      f"(deep residency {residency}), saving ≈ {w_before - pkg_w:.1f} W; "
+                      f"policy uses {CSTATE_W_PER_CPU:.2f} W per parked CPU")
+            cstate_before = None
+            # deepen only once the parked set has held for a tick, so the
+            # saving is not mixed up with the core-count change itself
+            if parked != CSTATES.parked and parked == cstate_settled and not TICK_KNOBS:
+                newly = [c for c in parked if c not in CSTATES.parked]
+                if newly and pkg_w is not None:
+                    cstate_before = (newly, pkg_w)
+                    CSTATES.deep_residency(newly)       # start the residency window
+                with ACTUATION_LOCK:
+                    actuate([{"name": "cstates", "fn": CSTATES.set, "value": active,
+                              "old": None}], "C-states")
+            cstate_settled = parked
+
+        COSTS.mark(TICK_KNOBS, tick_bw)
+        TICK_KNOBS.clear()
+
+        if overhead is not None:
+            tick = overhead.sample(rapl.total_watts("package", RAPL_WINDOW_SEC)
+                                   if rapl.available else None)
+            syscalls = tick["syscalls"] if tick["syscalls"] is not None else "n/a"
+            print(f"[controller] self: {tick['cpu_sec'] * 1000:.1f} ms CPU "
+                  f"({100 * tick['cpus']:.2f}% of a CPU), {tick['forks']} helpers, "
+                  f"{syscalls} syscalls, {tick['wakeups']} wakeups, ≈{tick['watts']:.2f} W "
+                  f"= {100 * tick['watts'] / budget:.3f}% of budget "
+                  f"(mean {100 * overhead.mean_watts() / budget:.3f}%)")
+
+        if USE_CHECKPOINT:
+            try:
+                save_checkpoint(CHECKPOINT_FILE, {
+                    "policy"         : current_policy,
+                    "cpu_power"      : current_cpu_power,
+                    "budget"         : budget,
+                    "ssd_limits"     : ssd_limits,
+                    "ssd_power_states" : ssd_states,
+                    "cpus_offline"   : HOTPLUG.offlined if HOTPLUG is not None else [],
+                    "workload_class" : WORKLOAD_CLASS,
+                    "p99_scale"      : P99_SCALE,
+                    "cstate_w_per_cpu" : CSTATE_W_PER_CPU,
+                    "fusion_offset"  : fusion.offset,
+                    "fusion_var"     : fusion.var,
+                    "energy_samples" : list(bucket.samples) if bucket is not None else None,
+                })
+            except OSError as e:
+                print(f"[controller] checkpoint failed: {e}", file=sys.stderr)
         time.sleep(CTRL_PERIOD_SEC)
 
 def main():
@@ -343,7 +1140,23 @@ def main():
 
     signal.signal(signal.SIGINT,  handle_sigterm)
     signal.signal(signal.SIGTERM, handle_sigterm)
-    proportional_control()
+    # Before any thread starts, so all of them inherit the affinity
+    try:
+        if pin_housekeeping(HOUSEKEEPING):
+            print(f"[controller] pinned to housekeeping CPUs {HOUSEKEEPING}")
+    except OSError as e:
+        print(f"[controller] cannot pin to CPUs {HOUSEKEEPING}: {e}", file=sys.stderr)
+    try:
+        # Governor switch deferred to here: importing the module writes no knob
+        if CPU_FREQ is not None and CPU_FREQ.available:
+            CPU_FREQ.activate()
+        proportional_control()
+    finally:
+        for restore in RESTORE_ON_EXIT:
+            try:
+                restore()
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"[controller] restore failed: {e}", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
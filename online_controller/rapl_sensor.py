@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+High-rate RAPL energy sampler.
+
+  • Discovers package and DRAM zones under /sys/class/powercap/intel-rapl
+  • Samples every zone's energy_uj at 10–100 Hz in a background thread
+  • Unwraps counter overflow with max_energy_range_uj (same rule as
+    cpu_model/*/poll_simul.c)
+  • Reports per-domain average watts over any window still in history
+
+IPMI DCMI stays the whole-system reference; this sensor gives the
+controller sub-second CPU/DRAM power.
+"""
+
+import os, time, threading
+from collections import deque
+from pathlib import Path
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+RAPL_BASE_PATH   = Path("/sys/class/powercap")
+RAPL_DOMAINS     = ("package", "dram")   # zone name prefixes to sample
+DEFAULT_RATE_HZ  = 50
+MIN_RATE_HZ      = 10
+MAX_RATE_HZ      = 100
+HISTORY_SEC      = 30.0          # how far back watts() can look
+
+# ----------------------------------------------------------------------
+
+class RaplZone:
+    """One powercap zone, e.g. intel-rapl:0 (package-0) or intel-rapl:0:1 (dram)."""
+
+    def __init__(self, path: Path, domain: str):
+        self.path         = path
+        self.domain       = domain
+        self.max_range_uj = int((path / "max_energy_range_uj").read_text())
+        self._fd          = os.open(path / "energy_uj", os.O_RDONLY)
+        self._last_raw    = self.read_raw()
+        self.total_uj     = 0     # unwrapped energy since the sampler started
+
+    def read_raw(self) -> int:
+        return int(os.pread(self._fd, 32, 0))
+
+    def update(self) -> int:
+        """Read the counter, fold any wraparound into total_uj and return it."""
+        raw = self.read_raw()
+        if raw >= self._last_raw:
+            self.total_uj += raw - self._last_raw
+        else:
+            self.total_uj += self.max_range_uj - self._last_raw + raw
+        self._last_raw = raw
+        return self.total_uj
+
+    def close(self):
+        os.close(self._fd)
+
+
+def discover_zones(base: Path = RAPL_BASE_PATH, domains=RAPL_DOMAINS):
+    """
+    Return {domain: RaplZone} for every readable intel-rapl zone whose
+    name starts with one of `domains`.
+    Socket zones are keyed by their own name (package-0, package-1);
+    sub-zones are suffixed with the socket index (dram-0, dram-1).
+    """
+    zones = {}
+    for path in sorted(base.glob("intel-rapl:*")):
+        try:
+            name = (path / "name").read_text().strip()
+        except OSError:
+            continue
+        if not name.startswith(domains):
+            continue
+        socket = path.name.split(":")[1]
+        key    = name if name.startswith("package") else f"{name}-{socket}"
+        try:
+            zones[key] = RaplZone(path, key)
+        except (OSError, ValueError):
+            continue        # zone exists but is not readable (non-root)
+    return zones
+
+
+class RaplSampler:
+    """
+    Background sampler over all discovered RAPL zones.
+
+    Example:
+        sampler = RaplSampler(rate_hz=50).start()
+        pkg_w   = sampler.watts("package-0", window=0.2)
+        cpu_w   = sampler.total_watts("package", window=0.2)
+    """
+
+    def __init__(self, rate_hz: float = DEFAULT_RATE_HZ,
+                 history_sec: float = HISTORY_SEC,
+                 base: Path = RAPL_BASE_PATH):
+        self.rate_hz = min(max(rate_hz, MIN_RATE_HZ), MAX_RATE_HZ)
+        self.period  = 1.0 / self.rate_hz
+        self.zones   = discover_zones(base)
+        maxlen       = int(history_sec * self.rate_hz) + 1
+        # one (timestamp, {domain: unwrapped_uj}) entry per sample
+        self._hist   = deque(maxlen=maxlen)
+        self._lock   = threading.Lock()
+        self._stop   = threading.Event()
+        self._thread = None
+
+    @property
+    def available(self) -> bool:
+        return bool(self.zones)
+
+    def sample(self):
+        """Take one sample of every zone (called by the thread, or manually)."""
+        t = time.monotonic()
+        energy = {d: z.update() for d, z in self.zones.items()}
+        with self._lock:
+            self._hist.append((t, energy))
+
+    def _run(self):
+        next_t = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_t += self.period
+            delay = next_t - time.monotonic()
+            if delay < 0:           # overran: resync instead of bursting
+                next_t = time.monotonic()
+                delay  = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        if self.available and self._thread is None:
+            self.sample()
+            self._thread = threading.Thread(target=self._run, name="rapl-sampler",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for z in self.zones.values():
+            z.close()
+
+    def _window(self, window: float):
+        """Return (oldest, newest) samples spanning at least `window` seconds."""
+        with self._lock:
+            if len(self._hist) < 2:
+                return None
+            newest = self._hist[-1]
+            oldest = self._hist[0]
+            for entry in reversed(self._hist):
+                if newest[0] - entry[0] >= window:
+                    oldest = entry
+                    break
+        return oldest, newest
+
+    def watts(self, domain: str, window: float = 1.0):
+        """Average watts of one domain over the last `window` seconds (None if unknown)."""
+        span = self._window(window)
+        if span is None or domain not in self.zones:
+            return None
+        (t0, e0), (t1, e1) = span
+        if t1 <= t0:
+            return None
+        return (e1[domain] - e0[domain]) / 1e6 / (t1 - t0)
+
+    def all_watts(self, window: float = 1.0):
+        """{domain: watts} over the last `window` seconds."""
+        span = self._window(window)
+        if span is None:
+            return {}
+        (t0, e0), (t1, e1) = span
+        if t1 <= t0:
+            return {}
+        return {d: (e1[d] - e0[d]) / 1e6 / (t1 - t0) for d in self.zones}
+
+    def total_watts(self, prefix: str, window: float = 1.0):
+        """Sum of all domains starting with `prefix` (e.g. every package socket)."""
+        per_domain = self.all_watts(window)
+        vals = [w for d, w in per_domain.items() if d.startswith(prefix)]
+        return sum(vals) if vals else None
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+What the controller itself costs the storage target.
+
+  • SelfOverhead samples, per tick, the CPU time of the controller and
+    its reaped helpers (getrusage), helper processes started (audit
+    hook on subprocess / fork / spawn), read+write syscalls
+    (/proc/self/io syscr + syscw) and wakeups (voluntary context
+    switches), and attributes package power to that CPU time by its
+    share of all busy CPU time in /proc/stat
+  • pin_housekeeping() moves the controller's threads onto housekeeping
+    CPUs outside the SPDK mask; helpers inherit the affinity
+"""
+
+import os, resource, sys, time
+from pathlib import Path
+
+from cpu_topology import parse_cpulist
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+CPU_ACTIVE_W = 4.0           # W of one fully busy CPU when RAPL is unavailable
+SPAWN_EVENTS = {"subprocess.Popen", "os.fork", "os.forkpty", "os.posix_spawn",
+                "os.posix_spawnp", "os.system"}
+
+# ----------------------------------------------------------------------
+
+def online_cpus(root: Path = Path("/sys/devices/system/cpu")):
+    try:
+        return parse_cpulist((root / "online").read_text())
+    except OSError:
+        return list(range(os.cpu_count() or 1))
+
+def resolve_housekeeping(cpus, spdk_cpus):
+    """
+    Housekeeping CPUs: `cpus` minus the SPDK ones, or with cpus=None the
+    first online CPU outside the SPDK mask; [] disables pinning.
+    """
+    if cpus is None:
+        spare = [c for c in online_cpus() if c not in spdk_cpus]
+        return spare[:1]
+    return [c for c in cpus if c not in spdk_cpus]
+
+def pin_housekeeping(cpus):
+    """Set the affinity of every controller thread; new threads and helpers inherit it."""
+    if not cpus:
+        return []
+    for tid in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(tid), set(cpus))
+        except ProcessLookupError:        # thread exited meanwhile
+            pass
+    return sorted(cpus)
+
+
+class SelfOverhead:
+    """
+    Example:
+        over = SelfOverhead()
+        ...                                   # one control tick
+        tick = over.sample(pkg_w=95.0)
+        tick["cpu_sec"], tick["forks"], tick["watts"]
+    """
+
+    def __init__(self):
+        self.forks  = 0
+        self.totals = {"ticks": 0, "sec": 0.0, "cpu_sec": 0.0, "forks": 0, "watts": 0.0}
+        sys.addaudithook(self._audit)
+        self._last  = self._read()
+
+    def _audit(self, event, args):
+        if event in SPAWN_EVENTS:
+            self.forks += 1
+
+    def _read(self):
+        me, kids = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+        syscalls = None
+        try:
+            io = dict(line.split(":") for line in Path("/proc/self/io").read_text().splitlines())
+            syscalls = int(io["syscr"]) + int(io["syscw"])
+        except (OSError, KeyError, ValueError):
+            pass
+        with open("/proc/stat") as f:
+            vals = [int(v) for v in f.readline().split()[1:]]
+        clk = os.sysconf("SC_CLK_TCK")
+        busy_sec = (sum(vals) - vals[3] - (vals[4] if len(vals) > 4 else 0)) / clk  # minus idle, iowait
+        return {"t": time.monotonic(),
+                "cpu_sec": me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime,
+                "forks": self.forks, "syscalls": syscalls,
+                "wakeups": me.ru_nvcsw, "preempted": me.ru_nivcsw, "busy_sec": busy_sec}
+
+    def sample(self, pkg_w=None):
+        """Overhead since the previous sample; `pkg_w` is the package RAPL power."""
+        now, last = self._read(), self._last
+        self._last = now
+        dt = now["t"] - last["t"]
+        tick = {k: (now[k] - last[k] if now[k] is not None and last[k] is not None else None)
+                for k in ("cpu_sec", "forks", "syscalls", "wakeups", "preempted")}
+        tick["sec"] = dt
+        tick["cpus"] = tick["cpu_sec"] / dt if dt > 0 else 0.0
+        busy = now["busy_sec"] - last["busy_sec"]
+        if pkg_w is not None and busy > 0:
+            tick["watts"] = pkg_w * min(tick["cpu_sec"] / busy, 1.0)
+        else:
+            tick["watts"] = tick["cpus"] * CPU_ACTIVE_W
+        t = self.totals
+        t["ticks"] += 1
+        t["sec"] += dt
+        t["cpu_sec"] += tick["cpu_sec"]
+        t["forks"] += tick["forks"]
+        t["watts"] += tick["watts"] * dt
+        return tick
+
+    def mean_watts(self) -> float:
+        return self.totals["watts"] / self.totals["sec"] if self.totals["sec"] else 0.0
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Shadow mode: one controller actuates, others only decide.
+
+Every tick the actuating controller hands its sensor readings (power,
+budget) and what it applied to a ShadowRecorder.  Each shadow runs its
+own decision logic on the same readings, keeping its own state as if
+its decisions had been applied, and the recorder logs one JSON line
+per tick.  Decisions are compared on a common scale:
+
+  cpu_share   fraction of the storage CPUs the controller allows
+              (PASS: min(cores, cpu.max CPUs) / SPDK_CORES, Thunderbolt:
+              cpu.max share over the cgroups' CPUs)
+  direction   -1 throttle, 0 hold, +1 unthrottle
+
+Report:
+    python3 shadow.py report shadow.jsonl
+"""
+
+import argparse, json, sys
+from pathlib import Path
+
+from pass_policy import (POLICY_FILE, INITIAL_CPU_POWER, SPDK_CORES, load_policy,
+                         cpu_power_target, find_policy)
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+SHADOW_LOG      = Path("./shadow.jsonl")
+DIVERGENCE_FLAG = 0.10       # cpu_share difference marked in the report
+
+# ----------------------------------------------------------------------
+
+def direction(old: float, new: float) -> int:
+    return (new > old + 1e-9) - (new < old - 1e-9)
+
+
+class ShadowPass:
+    """
+    PASS's CPU-side decision (proportional step + policy lookup from
+    pass_policy), assuming every policy it picks sticks.  It decides on
+    the profiled table alone: no p99 calibration or DRAM trading, which
+    need the controller's own measurements, and no uncore preference
+    unless uncore_slack_w is given (the controller's CORE_KEEP_SLACK_W).
+    """
+    name = "pass"
+
+    def __init__(self, policy_file: Path = POLICY_FILE, uncore_slack_w=None):
+        self.rows      = load_policy(policy_file)
+        self.uncore_slack_w = uncore_slack_w
+        self.cpu_power = INITIAL_CPU_POWER
+        self.policy    = None
+        self.share     = 1.0
+
+    def step(self, power: float, budget: float):
+        target = cpu_power_target(power, budget, self.cpu_power)
+        if target != self.cpu_power or self.policy is None:
+            self.policy    = find_policy(self.rows, target, uncore_slack_w=self.uncore_slack_w)
+            self.cpu_power = self.policy["power"]
+        old, self.share = self.share, pass_cpu_share(self.policy, SPDK_CORES)
+        return {"cpu_share": self.share, "direction": direction(old, self.share),
+                "policy": self.policy, "target_cpu_power": target}
+
+def pass_cpu_share(policy, spdk_cores: int) -> float:
+    # "bandwidth" is cpu.max in % of one CPU (800 = 8 CPUs), bounded by the cores
+    return min(policy["cores"], policy["bandwidth"] / 100) / spdk_cores
+
+
+class ShadowThunderbolt:
+    """Thunderbolt RUMD on its own bandwidth state; cpu.max is never written."""
+    name = "thunderbolt"
+
+    def __init__(self, shares=None, seed=None):
+        import random
+        from google_thunderbolt import ThunderboltRUMD, CgroupShare
+        shares = shares or [CgroupShare(Path("/sys/fs/cgroup/user"))]
+        self.tb    = ThunderboltRUMD(shares, random.Random(seed))
+        self.share = 1.0
+
+    def step(self, power: float, budget: float):
+        for c, bw in zip(self.tb.shares, self.tb.rumd(power, budget)):
+            c.bandwidth = bw
+        old, self.share = self.share, thunderbolt_cpu_share(self.tb.shares)
+        return {"cpu_share": self.share, "direction": direction(old, self.share),
+                "bandwidth": self.tb.bandwidth}
+
+def thunderbolt_cpu_share(shares) -> float:
+    cores = [c.cores() for c in shares]
+    return sum(n * c.bandwidth for n, c in zip(cores, shares)) / sum(cores) / 100
+
+
+SHADOWS = {"pass": ShadowPass, "thunderbolt": ShadowThunderbolt}
+
+
+class ShadowRecorder:
+    """
+    Example:
+        rec = ShadowRecorder("pass", ["thunderbolt"])
+        rec.record(t, power, budget, {"cpu_share": 0.5, "direction": -1})
+    """
+
+    def __init__(self, actuator: str, shadows, path: Path = SHADOW_LOG):
+        self.actuator = actuator
+        self.shadows  = [SHADOWS[s]() if isinstance(s, str) else s for s in shadows]
+        self.file     = open(path, "a")
+
+    def record(self, t: float, power: float, budget: float, applied: dict):
+        line = {"t": t, "power": power, "budget": budget,
+                "actuator": {"name": self.actuator, **applied}, "shadows": {}}
+        for sh in self.shadows:
+            try:
+                d = sh.step(power, budget)
+            except Exception as e:
+                line["shadows"][sh.name] = {"error": str(e)}
+                continue
+            d["divergence"] = abs(d["cpu_share"] - applied["cpu_share"])
+            d["disagree"]   = d["direction"] != applied["direction"]
+            line["shadows"][sh.name] = d
+        self.file.write(json.dumps(line, default=str) + "\n")
+        self.file.flush()
+        return line
+
+    def close(self):
+        self.file.close()
+
+
+def report(path: Path, out=sys.stdout):
+    """Per-tick divergence table, then a summary per shadow."""
+    totals = {}
+    print(f"{'t':>8} {'power':>7} {'budget':>7} {'actuator':>14} {'shadow':>14} "
+          f"{'share':>6} {'shadow':>6} {'div':>6}", file=out)
+    with open(path) as f:
+        for raw in f:
+            line = json.loads(raw)
+            act = line["actuator"]
+            for name, d in line["shadows"].items():
+                if "error" in d:
+                    continue
+                flag = " *" if d["divergence"] >= DIVERGENCE_FLAG or d["disagree"] else ""
+                print(f"{line['t']:8.1f} {line['power']:7.1f} {line['budget']:7.1f} "
+                      f"{act['name']:>14} {name:>14} {act['cpu_share']:6.2f} "
+                      f"{d['cpu_share']:6.2f} {d['divergence']:6.2f}{flag}", file=out)
+                tot = totals.setdefault(name, {"ticks": 0, "div": 0.0, "max": 0.0,
+                                               "disagree": 0})
+                tot["ticks"] += 1
+                tot["div"]   += d["divergence"]
+                tot["max"]    = max(tot["max"], d["divergence"])
+                tot["disagree"] += d["disagree"]
+    for name, tot in totals.items():
+        print(f"[shadow] {name}: {tot['ticks']} ticks, mean divergence "
+              f"{tot['div'] / tot['ticks']:.3f}, max {tot['max']:.3f}, direction "
+              f"disagrees on {100 * tot['disagree'] / tot['ticks']:.1f}% of ticks", file=out)
+    return totals
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Shadow-mode divergence report")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("report", help="summarize a shadow log")
+    r.add_argument("log", nargs="?", default=str(SHADOW_LOG))
+    args = p.parse_args(argv)
+    if args.cmd == "report":
+        report(Path(args.log))
+
+if __name__ == "__main__":
+    main()
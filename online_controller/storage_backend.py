@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Storage-target backends for the online controller.
+
+The controller drives one of the two NVMe-oF targets we deploy through
+the same small interface:
+
+  read_iostat()                 per-device counters in bdev_get_iostat shape
+                                {"name", "bytes_read", "bytes_written",
+                                 "num_read_ops", "num_write_ops"}
+  set_ssd_qos(limits)           {device: (read_mibs, write_mibs)}, 0 = unlimited;
+                                only the listed devices are touched
+                                (only with supports_qos)
+  set_cpumask(cpus)             CPUs the target's I/O threads may run on
+  set_power_states(devices, states)
+  cpu_cgroup                    cgroup whose cpu.max throttles the target
+                                (None: not throttleable that way)
+  supports_qos                  set_ssd_qos throttles the target
+  supports_histograms           SPDK latency histograms available
+  limitations()                 knobs this backend cannot apply, for a warning
+  restore()                     undo host-wide changes on exit
+
+SpdkBackend talks to nvmf_tgt through rpc.py.  KernelNvmetBackend drives
+the Linux nvmet target (utils/setup_linux_nvmf_target.sh):
+/sys/block/<dev>/stat counters, the cpumask of nvmet's own sysfs-visible
+workqueues, and nvme-cli for power states.  nvmet issues its bios from
+kernel workers in the root cgroup, so neither io.max nor cpu.max can
+throttle it: it has no SSD bandwidth knob and no cpu.max knob.
+"""
+
+import json, os, subprocess, tempfile, time
+from pathlib import Path
+
+from cpu_topology import format_cpumask
+from nvme_power import set_power_states as spdk_set_power_states
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+RPC        = "./scripts/rpc.py"      # Assuming in the same directory as SPDK
+THREAD_RPC = "/home/dedongx/power_aware_storage/scripts/rpc.py"
+SPDK_CPU_CGROUP = Path("/sys/fs/cgroup/user")
+
+SECTOR_BYTES = 512                   # /sys/block/*/stat counts 512 B sectors
+# nvmet's own WQ_SYSFS workqueues (kernel-dependent).  Never the global
+# /sys/devices/virtual/workqueue/cpumask: that re-pins every unbound
+# workqueue on the host.
+NVMET_WQ_CPUMASK_FILES = [Path("/sys/devices/virtual/workqueue/nvmet-wq/cpumask")]
+
+# ----------------------------------------------------------------------
+
+class SpdkBackend:
+    """
+    Example:
+        be = SpdkBackend(thread_ids=range(1, 10))
+        be.set_ssd_qos({"Nvme0n1": (500, 0)})        # MiB/s, 0 = unlimited
+        be.set_cpumask([0, 1, 2, 3])
+    """
+    name = "spdk"
+    supports_histograms = True
+    supports_qos = True
+
+    def __init__(self, thread_ids, rpc: str = RPC, thread_rpc: str = THREAD_RPC,
+                 cpu_cgroup: Path = SPDK_CPU_CGROUP):
+        self.thread_ids = list(thread_ids)
+        self.rpc        = rpc
+        self.thread_rpc = thread_rpc
+        self.cpu_cgroup = cpu_cgroup
+
+    def _batch(self, lines, timeout=None):
+        # Batch-execute via stdin to a single rpc invocation
+        with tempfile.NamedTemporaryFile("w", delete=False) as tf:
+            tf.write("\n".join(lines) + "\n")
+            tf.flush()
+            subprocess.run(self.rpc, stdin=open(tf.name), text=True, check=True,
+                           timeout=timeout)
+        os.unlink(tf.name)
+
+    def read_iostat(self):
+        out = subprocess.check_output([self.rpc, "bdev_get_iostat"])
+        return json.loads(out)["bdevs"]
+
+    def set_ssd_qos(self, limits, timeout=None):
+        # bdev_set_qos_limit: 0 disables that limit
+        lines = [f"bdev_set_qos_limit {bdev} --r-mbytes-per-sec {int(r)} --w-mbytes-per-sec {int(w)}"
+                 for bdev, (r, w) in limits.items()]
+        if lines:
+            self._batch(lines, timeout)
+
+    def set_cpumask(self, cpus, timeout=None):
+        """thread_set_cpumask for every SPDK thread; `timeout` bounds them all."""
+        mask_hex = format_cpumask(cpus)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for tid in self.thread_ids:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.001)
+            subprocess.run(
+                [self.thread_rpc, "thread_set_cpumask", "--cpumask", mask_hex, "--id", str(tid)],
+                capture_output=False, check=True, timeout=remaining
+            )
+
+    def set_power_states(self, devices, states, timeout=None):
+        spdk_set_power_states(devices, states, rpc=self.rpc, timeout=timeout)
+
+    def limitations(self):
+        return []
+
+    def restore(self):
+        pass
+
+
+class KernelNvmetBackend:
+    """
+    Example:
+        be = KernelNvmetBackend([f"nvme{i}n1" for i in range(10)])
+        be.set_cpumask([0, 1, 2, 3])                 # nvmet-wq only
+        be.set_power_states(["nvme0n1"], [2])
+    """
+    name = "nvmet"
+    supports_histograms = False
+    supports_qos = False       # bios come from root-cgroup kernel workers
+    cpu_cgroup = None          # kernel workers are not in a cpu.max cgroup
+
+    def __init__(self, devices, wq_cpumask_files=NVMET_WQ_CPUMASK_FILES,
+                 block_root: Path = Path("/sys/block")):
+        self.devices    = list(devices)
+        self.wq_files   = [Path(p) for p in wq_cpumask_files if Path(p).exists()]
+        self.block_root = Path(block_root)
+        self.saved_wq   = {p: p.read_text().strip() for p in self.wq_files}
+
+    def read_iostat(self):
+        bdevs = []
+        for dev in self.devices:
+            f = [int(v) for v in (self.block_root / dev / "stat").read_text().split()]
+            bdevs.append({"name": dev,
+                          "num_read_ops": f[0],  "bytes_read":    f[2] * SECTOR_BYTES,
+                          "num_write_ops": f[4], "bytes_written": f[6] * SECTOR_BYTES})
+        return bdevs
+
+    def set_cpumask(self, cpus, timeout=None):
+        mask_hex = format_cpumask(cpus)
+        for path in self.wq_files:
+            path.write_text(mask_hex)
+
+    def set_power_states(self, devices, states, timeout=None):
+        for dev, ps in zip(devices, states):
+            if ps is None:
+                continue
+            ctrlr = "/dev/" + dev.rsplit("n", 1)[0]          # nvme3n1 -> /dev/nvme3
+            subprocess.run(["nvme", "set-feature", ctrlr, "-f", "2", "-v", str(ps)],
+                           capture_output=True, check=True, timeout=timeout)
+
+    def limitations(self):
+        out = ["no SSD bandwidth knob (io.max does not reach nvmet's kernel workers); "
+               "SSD power is only cut through NVMe power states",
+               "no cpu.max knob: the policy 'bandwidth' column is not applied"]
+        if not self.wq_files:
+            out.append("none of %s exists: the core-count knob is not applied"
+                       % ", ".join(str(p) for p in NVMET_WQ_CPUMASK_FILES))
+        return out
+
+    def restore(self):
+        for path, mask in self.saved_wq.items():
+            path.write_text(mask)
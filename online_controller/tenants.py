@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tenant priority classes for SSD throttling.
+
+Each bdev belongs to one class; bdevs not listed are best-effort.  When
+SSD power has to go, the controller cuts classes in THROTTLE_ORDER, so
+latency-critical bdevs stay unlimited as long as cutting the
+best-effort ones saves enough.  report() gives per-class throughput
+(from iostat deltas) and the worst p99 (from the latency sensor).
+"""
+
+import time
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+DEFAULT_CLASS  = "best_effort"
+THROTTLE_ORDER = ["best_effort", "latency_critical"]   # cut first → last
+
+MiB = 1024 * 1024
+
+# ----------------------------------------------------------------------
+
+class TenantMap:
+    """
+    Example (fig12: 1-disk random-read tenant next to a 9-disk writer):
+        tenants = TenantMap({"latency_critical": ["Nvme0n1"]})
+        tenants.rank("Nvme3n1")        # 0: throttled first
+        per_class = tenants.report(bdevs, latency.stats)
+    """
+
+    def __init__(self, classes: dict):
+        self.class_of_bdev = {b: c for c, bdevs in classes.items() for b in bdevs}
+        self._last = None     # (t, {bdev: (bytes_read, bytes_written)})
+
+    def class_of(self, bdev: str) -> str:
+        return self.class_of_bdev.get(bdev, DEFAULT_CLASS)
+
+    def rank(self, bdev: str) -> int:
+        """Throttle order of `bdev`'s class (lower = cut earlier)."""
+        cls = self.class_of(bdev)
+        return THROTTLE_ORDER.index(cls) if cls in THROTTLE_ORDER else 0
+
+    def members(self, cls: str, bdevs):
+        return [b for b in bdevs if self.class_of(b) == cls]
+
+    def report(self, bdevs, latency_stats=None):
+        """
+        {class: {"read_mib": MiB/s, "write_mib": MiB/s, "p99": µs or None}}
+        from one bdev_get_iostat result (rates since the previous call).
+        """
+        t = time.perf_counter()
+        now = {b["name"]: (b["bytes_read"], b["bytes_written"]) for b in bdevs}
+        last, self._last = self._last, (t, now)
+        per_class = {}
+        for name in now:
+            per_class.setdefault(self.class_of(name),
+                                 {"read_mib": 0.0, "write_mib": 0.0, "p99": None})
+        if last is not None and t > last[0]:
+            dt = t - last[0]
+            for name, (r, w) in now.items():
+                if name in last[1]:
+                    entry = per_class[self.class_of(name)]
+                    entry["read_mib"]  += (r - last[1][name][0]) / MiB / dt
+                    entry["write_mib"] += (w - last[1][name][1]) / MiB / dt
+        for name, st in (latency_stats or {}).items():
+            entry = per_class.setdefault(self.class_of(name),
+                                         {"read_mib": 0.0, "write_mib": 0.0, "p99": None})
+            if st.get("p99") is not None:
+                entry["p99"] = st["p99"] if entry["p99"] is None else max(entry["p99"], st["p99"])
+        return per_class
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from actuation_planner import HYSTERESIS_BASE_W, KnobCosts, hold
+from pass_policy import cpu_power_target, find_policy, load_policy
+
+POLICY = load_policy(Path(__file__).with_name("policy.csv"))
+KNOBS = ["cores", "bandwidth", "rapl"]
+
+
+def test_hold_climbs_through_dense_rows():
+    # 1 W apart from 99 to 210 W: every step up used to fall in the band
+    costs = KnobCosts()
+    for under_w in (10, 20, 30, 50, 80):
+        current = find_policy(POLICY, 100)
+        budget = 400
+        for _ in range(50):
+            target = cpu_power_target(budget - under_w, budget, current["power"])
+            nxt = find_policy(POLICY, target)
+            if nxt is current or hold(current, nxt, target, KNOBS, costs):
+                break
+            current = nxt
+        assert current["power"] == POLICY[-1]["power"], under_w
+
+
+def test_hold_inside_band():
+    costs = KnobCosts()
+    current = find_policy(POLICY, 150)
+    for target in (current["power"] - HYSTERESIS_BASE_W / 2,
+                   current["power"] + HYSTERESIS_BASE_W / 2):
+        nxt = find_policy(POLICY, target)
+        if nxt is not current:
+            assert hold(current, nxt, target, KNOBS, costs)
+    assert not hold(current, find_policy(POLICY, 140), 140, KNOBS, costs)
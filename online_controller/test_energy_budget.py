@@ -0,0 +1,26 @@
+from energy_budget import EnergyBucket
+
+BUDGET, CEILING, WINDOW = 400.0, 480.0, 60.0
+
+
+def run(bucket, seconds, demand_w, trace):
+    # 1 s ticks; the host draws what it wants, up to the allowed power
+    for _ in range(seconds):
+        power = min(demand_w, bucket.allowed(BUDGET, CEILING))
+        bucket.update(power, 1.0)
+        trace.append(power)
+
+
+def test_idle_then_burst_keeps_window_average():
+    bucket, trace = EnergyBucket(window=WINDOW, spend=10), []
+    run(bucket, 120, 250, trace)          # idle, well under budget
+    run(bucket, 300, 1000, trace)         # burst as hard as allowed
+    assert max(trace) <= CEILING
+    assert max(trace[120:]) == CEILING    # the idle time does pay for a burst
+    n = int(WINDOW)
+    for end in range(n, len(trace) + 1):
+        assert sum(trace[end - n:end]) / n <= BUDGET + 1e-6, end
+
+
+def test_cold_start_allows_budget_only():
+    assert EnergyBucket(window=WINDOW).allowed(BUDGET, CEILING) == BUDGET
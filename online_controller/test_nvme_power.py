@@ -0,0 +1,27 @@
+from nvme_power import plan_ssd_savings
+
+MODEL = {"wpr": 7 / 7000, "wpw": 10 / 3600, "read_bw": 7000, "write_bw": 3600}
+
+
+def test_best_effort_cuts_cover_need():
+    # Nvme0n1: latency-critical reader; the other 9: best-effort writers
+    reads  = [2000] + [0] * 9
+    writes = [0] + [300] * 9
+    limits = [(1310, 0)] + [(0, 90)] * 9
+    ranks  = [1] + [0] * 9
+    qos, states, saved_w = plan_ssd_savings(2.0, reads, writes, limits, MODEL,
+                                            ranks=ranks, use_states=False)
+    assert saved_w >= 2.0
+    assert qos[0] == (0, 0)
+    assert states == [0] * 10
+
+
+def test_latency_critical_cut_last():
+    reads  = [2000] + [0] * 9
+    writes = [0] + [300] * 9
+    limits = [(1310, 0)] + [(0, 90)] * 9
+    ranks  = [1] + [0] * 9
+    qos, _, _ = plan_ssd_savings(100.0, reads, writes, limits, MODEL,
+                                 ranks=ranks, use_states=False)
+    assert qos[0] == (1310, 0)
+    assert all(q == (0, 90) for q in qos[1:])
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Fan and temperature sensing, and a fan term for the system power model.
+
+  • read_hwmon() / read_ipmi_sdr() return fan RPMs and temperatures (°C)
+    from /sys/class/hwmon or `ipmitool sdr`; ThermalPoller reads either
+    in the background
+  • FanPowerModel: fan power follows the fan affinity law,
+        fan_w = k · Σ (rpm / 1000)³
+    k is fitted online (recursive least squares with forgetting) from
+    the part of IPMI power the fast signals do not explain, starting
+    from a prior or an offline fit
+  • FanPredictor: fans chase a temperature-dependent target speed with
+    a first-order lag; predicts RPM `horizon` seconds ahead, so the
+    controller can add the coming change of fan power as a known
+    disturbance instead of chasing it with the CPU knobs
+
+Offline fit from fio/target/collect_rapl_ipmi_power_fans_speed.sh output:
+    python3 thermal_sensor.py fit <prefix>    # <prefix>.power / .fans / .raplpower
+"""
+
+import argparse, math, re, subprocess, threading, time
+from pathlib import Path
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+HWMON_ROOT      = Path("/sys/class/hwmon")
+FAN_W_PER_KRPM3 = 0.05       # prior k (W per (kRPM)³ summed over fans)
+FIT_FORGET      = 0.995      # RLS forgetting factor per sample
+FAN_LAG_SEC     = 20.0       # time constant of fan speed after a temperature change
+RPM_PER_C       = 150.0      # prior slope of target RPM over the hottest temperature
+
+SDR_LINE = re.compile(r"^(?P<name>[^|]+)\|[^|]*\|\s*ok\s*\|[^|]*\|\s*(?P<val>[-\d.]+)\s+(?P<unit>RPM|degrees C)")
+
+# ----------------------------------------------------------------------
+
+def read_hwmon(root: Path = HWMON_ROOT):
+    """-> ({fan: rpm}, {sensor: °C}) from every hwmon chip."""
+    fans, temps = {}, {}
+    for chip in sorted(root.glob("hwmon*")):
+        try:
+            chip_name = (chip / "name").read_text().strip()
+        except OSError:
+            chip_name = chip.name
+        for f in chip.glob("fan*_input"):
+            try:
+                fans[f"{chip_name}/{f.name[:-6]}"] = float(f.read_text())
+            except (OSError, ValueError):
+                pass
+        for f in chip.glob("temp*_input"):
+            label = f.with_name(f.name.replace("_input", "_label"))
+            name = label.read_text().strip() if label.exists() else f.name[:-6]
+            try:
+                temps[f"{chip_name}/{name}"] = float(f.read_text()) / 1000
+            except (OSError, ValueError):
+                pass
+    return fans, temps
+
+def parse_sdr(text: str):
+    fans, temps = {}, {}
+    for line in text.splitlines():
+        m = SDR_LINE.match(line)
+        if m:
+            (fans if m["unit"] == "RPM" else temps)[m["name"].strip()] = float(m["val"])
+    return fans, temps
+
+def read_ipmi_sdr(timeout: float = 10.0):
+    """-> ({fan: rpm}, {sensor: °C}) from the BMC (slow: seconds)."""
+    out = ""
+    for kind in ("Fan", "Temperature"):
+        out += subprocess.run(["ipmitool", "sdr", "type", kind], capture_output=True,
+                              text=True, timeout=timeout).stdout
+    return parse_sdr(out)
+
+def fan_load(fans) -> float:
+    """Σ (rpm / 1000)³, the regressor of the fan-power model."""
+    return sum((rpm / 1000) ** 3 for rpm in fans.values())
+
+
+class ThermalPoller:
+    """
+    Example:
+        thermal = ThermalPoller(read_hwmon, period=1.0).start()
+        t, fans, temps = thermal.latest       # (None, {}, {}) before the first read
+    """
+
+    def __init__(self, read, period: float = 1.0):
+        self.read   = read
+        self.period = period
+        self.latest = (None, {}, {})
+        self.errors = 0
+        self._stop  = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                fans, temps = self.read()
+                self.latest = (time.monotonic(), fans, temps)
+            except Exception:
+                self.errors += 1
+            self._stop.wait(self.period)
+
+    def start(self):
+        threading.Thread(target=self._run, name="thermal-poller", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+class FanPowerModel:
+    """
+    Example:
+        model = FanPowerModel()
+        model.observe(ipmi_w - (rapl_w + ssd_w), fan_load(fans))   # per IPMI reading
+        fan_w = model.power(fans)
+    """
+
+    def __init__(self, k: float = FAN_W_PER_KRPM3, forget: float = FIT_FORGET):
+        # residual = c + k·x ; c absorbs everything else (PSU, NIC, board)
+        self.theta  = [0.0, k]
+        self.P      = [[1e4, 0.0], [0.0, 1.0]]
+        self.forget = forget
+        self.n      = 0
+
+    def observe(self, residual_w: float, x: float):
+        phi = (1.0, x)
+        P, lam = self.P, self.forget
+        Pphi = [P[0][0] * phi[0] + P[0][1] * phi[1], P[1][0] * phi[0] + P[1][1] * phi[1]]
+        denom = lam + phi[0] * Pphi[0] + phi[1] * Pphi[1]
+        gain = [Pphi[0] / denom, Pphi[1] / denom]
+        err = residual_w - (self.theta[0] + self.theta[1] * x)
+        self.theta = [self.theta[0] + gain[0] * err, max(self.theta[1] + gain[1] * err, 0.0)]
+        self.P = [[(P[i][j] - gain[i] * Pphi[j]) / lam for j in range(2)] for i in range(2)]
+        self.n += 1
+
+    @property
+    def k(self) -> float:
+        return self.theta[1]
+
+    def power(self, fans) -> float:
+        return self.k * fan_load(fans)
+
+    def power_at(self, rpms) -> float:
+        return self.k * sum((r / 1000) ** 3 for r in rpms)
+
+
+class FanPredictor:
+    """
+    Each fan's target speed is linear in the hottest temperature, learned
+    from the samples; the fan approaches it with time constant FAN_LAG_SEC.
+
+    Example:
+        pred = FanPredictor()
+        pred.update(t, fans, temps)
+        rpms = pred.predict(horizon=5.0)      # {fan: rpm}
+        coming_w = model.power_at(rpms.values()) - model.power(fans)
+    """
+
+    def __init__(self, lag: float = FAN_LAG_SEC):
+        self.lag  = lag
+        self.fans, self.temp, self.t = {}, None, None
+        self.fit  = {}             # fan -> [n, mean_T, mean_rpm, cov, var_T]
+
+    def update(self, t: float, fans, temps):
+        if not fans or not temps:
+            return
+        hottest = max(temps.values())
+        for name, rpm in fans.items():
+            n, mt, mr, cov, var = self.fit.get(name, [0, 0.0, 0.0, 0.0, 0.0])
+            n += 1
+            dt_, dr = hottest - mt, rpm - mr
+            mt += dt_ / n
+            mr += dr / n
+            cov += dt_ * (rpm - mr)
+            var += dt_ * (hottest - mt)
+            self.fit[name] = [n, mt, mr, cov, var]
+        self.fans, self.temp, self.t = dict(fans), hottest, t
+
+    def target_rpm(self, name: str) -> float:
+        n, mt, mr, cov, var = self.fit[name]
+        slope = cov / var if n > 2 and var > 1e-6 else RPM_PER_C
+        return max(mr + slope * (self.temp - mt), 0.0)
+
+    def predict(self, horizon: float):
+        decay = math.exp(-horizon / self.lag)
+        return {name: self.target_rpm(name) + (rpm - self.target_rpm(name)) * decay
+                for name, rpm in self.fans.items()}
+
+
+# ---- offline fit from the collection script's files ---------------------
+
+def _read_power(path):
+    """.power: ipmitool dcmi lines; (timestamp, W) pairs from Instantaneous + timestamp."""
+    out, watts = [], None
+    for line in open(path):
+        if "Instantaneous" in line:
+            watts = float(line.split()[3])
+        elif "timestamp" in line.lower() and watts is not None:
+            stamp = line.split(":", 1)[1].strip()
+            try:
+                t = time.mktime(time.strptime(stamp, "%a %b %d %H:%M:%S %Y"))
+            except ValueError:
+                continue
+            out.append((t, watts))
+            watts = None
+    return out
+
+def _read_fans(path):
+    """.fans: a Unix time line, then `ipmitool sensor` FAN rows -> [(t, {fan: rpm})]."""
+    out = []
+    for line in open(path):
+        fields = [f.strip() for f in line.split("|")]
+        if len(fields) == 1 and fields[0].isdigit():
+            out.append((float(fields[0]), {}))
+        elif out and len(fields) > 2 and fields[2] == "RPM":
+            try:
+                out[-1][1][fields[0]] = float(fields[1])
+            except ValueError:
+                pass
+    return out
+
+def _read_rapl(path, start):
+    """.raplpower: perf stat -I lines '<sec> <J> Joules power/energy-*/' -> [(t, W)]."""
+    per_t, last_t = {}, {}
+    for line in open(path):
+        f = line.split()
+        if len(f) >= 4 and f[2] == "Joules":
+            try:
+                t, joules = float(f[0]), float(f[1].replace(",", ""))
+            except ValueError:
+                continue
+            dt = t - last_t.get(f[3], 0.0)
+            last_t[f[3]] = t
+            per_t[t] = per_t.get(t, 0.0) + joules / dt if dt > 0 else per_t.get(t, 0.0)
+    return [(start + t, w) for t, w in sorted(per_t.items())]
+
+def fit_files(prefix: str):
+    """Least-squares fit of IPMI − RAPL = c + k·Σ(kRPM)³ over one collection run."""
+    start = float(open(prefix + ".raplpower.starttime").read().split()[0])
+    power, fans, rapl = _read_power(prefix + ".power"), _read_fans(prefix + ".fans"), \
+        _read_rapl(prefix + ".raplpower", start)
+    def nearest(series, t):
+        return min(series, key=lambda s: abs(s[0] - t)) if series else None
+    model = FanPowerModel(forget=1.0)
+    for t, w in power:
+        f, r = nearest(fans, t), nearest(rapl, t)
+        if f and r and abs(f[0] - t) <= 2 and abs(r[0] - t) <= 2 and f[1]:
+            model.observe(w - r[1], fan_load(f[1]))
+    return model
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fan-power model fit")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    f = sub.add_parser("fit", help="fit k from a collect_rapl_ipmi_power_fans_speed.sh run")
+    f.add_argument("prefix", help="output file prefix (<prefix>.power, .fans, .raplpower)")
+    args = p.parse_args(argv)
+    if args.cmd == "fit":
+        model = fit_files(args.prefix)
+        print(f"[thermal] {model.n} samples: fan_w = {model.k:.4f} W · Σ(kRPM)³, "
+              f"rest = {model.theta[0]:.1f} W (set FAN_W_PER_KRPM3 = {model.k:.4f})")
+
+if __name__ == "__main__":
+    main()
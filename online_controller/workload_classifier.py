@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Online workload classifier over SPDK bdev_get_iostat counters.
+
+  • Keeps a sliding window of aggregate op/byte counters
+  • Derives read ratio, average I/O size and IOPS over the window
+  • Maps them to a workload class (first matching rule in WORKLOAD_CLASSES)
+  • Hysteresis: the current class keeps matching with widened ranges, and
+    a new class must win HOLD_SAMPLES consecutive samples before a switch
+
+The controller keeps one profiled policy table and SSD model per class.
+"""
+
+import time
+from collections import deque
+
+# ----------------------------------------------------------------------
+# ----------------  CONFIG -------------------------------------------------
+
+KiB = 1024
+
+WINDOW_SEC     = 5.0       # sliding window for the features
+HOLD_SAMPLES   = 3         # consecutive wins needed to switch class
+HYSTERESIS     = 0.15      # current class ranges are widened by 15%
+IDLE_IOPS      = 1000      # below this the workload is not classified
+
+# First match wins; ranges are [lo, hi) on each feature.
+WORKLOAD_CLASSES = [
+    # fig4 / fig12 foreground: 4 KiB random reads
+    ("rand_read_small",  {"read_ratio": (0.7, 1.01), "avg_io_kib": (0, 16)}),
+    # fig5 / fig7: 128 KiB sequential writes
+    ("seq_write_large",  {"read_ratio": (0.0, 0.3),  "avg_io_kib": (64, float("inf"))}),
+    # fig6 / fig1 background: small random writes
+    ("rand_write_small", {"read_ratio": (0.0, 0.3),  "avg_io_kib": (0, 64)}),
+    ("read_large",       {"read_ratio": (0.7, 1.01), "avg_io_kib": (16, float("inf"))}),
+    # applications (YCSB, db_bench, filebench) and anything else
+    ("mixed",            {}),
+]
+
+# ----------------------------------------------------------------------
+
+def iostat_totals(bdevs):
+    """Aggregate (read_ops, write_ops, bytes_read, bytes_written) over bdevs."""
+    return (sum(b["num_read_ops"] for b in bdevs),
+            sum(b["num_write_ops"] for b in bdevs),
+            sum(b["bytes_read"] for b in bdevs),
+            sum(b["bytes_written"] for b in bdevs))
+
+def _matches(rule, features, widen: float = 0.0):
+    for key, (lo, hi) in rule.items():
+        span = (hi - lo) if hi != float("inf") else lo
+        if not (lo - widen * span <= features[key] < hi + widen * span):
+            return False
+    return True
+
+
+class WorkloadClassifier:
+    """
+    Example:
+        clf = WorkloadClassifier()
+        changed = clf.observe(read_iostat())   # once per control tick
+        if changed and activate_profile(clf.proposed):
+            clf.accept()                       # else proposed again next tick
+    """
+
+    def __init__(self, classes=WORKLOAD_CLASSES, window: float = WINDOW_SEC,
+                 hold: int = HOLD_SAMPLES, initial: str = None):
+        self.classes   = classes
+        self.rules     = dict(classes)
+        self.window    = window
+        self.hold      = hold
+        self.current   = initial
+        self.proposed  = None       # class due to switch to, until accept()
+        self.features  = None
+        self._samples  = deque()    # (t, read_ops, write_ops, bytes_r, bytes_w)
+        self._candidate, self._wins = None, 0
+
+    def _update_features(self):
+        t1, r1, w1, br1, bw1 = self._samples[-1]
+        t0, r0, w0, br0, bw0 = self._samples[0]
+        ops, dt = (r1 - r0) + (w1 - w0), t1 - t0
+        if dt <= 0:
+            return None
+        if ops <= 0:
+            return {"read_ratio": 0.0, "avg_io_kib": 0.0, "iops": 0.0}
+        return {
+            "read_ratio" : (r1 - r0) / ops,
+            "avg_io_kib" : ((br1 - br0) + (bw1 - bw0)) / ops / KiB,
+            "iops"       : ops / dt,
+        }
+
+    def classify(self, features):
+        """Rule lookup with hysteresis toward the current class."""
+        if self.current is not None and _matches(self.rules[self.current], features, HYSTERESIS):
+            return self.current
+        for name, rule in self.classes:
+            if _matches(rule, features):
+                return name
+        return self.current
+
+    def observe(self, bdevs, t: float = None) -> bool:
+        """
+        Feed one bdev_get_iostat result; return True if a switch to
+        self.proposed is due.  self.current only changes on accept().
+        """
+        t = time.monotonic() if t is None else t
+        self._samples.append((t, *iostat_totals(bdevs)))
+        while len(self._samples) > 2 and t - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+        if len(self._samples) < 2:
+            return False
+
+        self.features = self._update_features()
+        if self.features is None or self.features["iops"] < IDLE_IOPS:
+            self._candidate, self._wins = None, 0
+            return False
+
+        cls = self.classify(self.features)
+        if cls == self.current:
+            self._candidate, self._wins, self.proposed = None, 0, None
+            return False
+        if cls == self._candidate:
+            self._wins += 1
+        else:
+            self._candidate, self._wins = cls, 1
+        if self._wins >= self.hold or self.current is None:
+            self.proposed = cls
+            return True
+        return False
+
+    def accept(self):
+        """Commit self.proposed, once its profile is active."""
+        self.current, self.proposed = self.proposed, None
+        self._candidate, self._wins = None, 0
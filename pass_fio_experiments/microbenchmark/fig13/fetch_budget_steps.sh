@@ -0,0 +1,23 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Copy the budget step log written by the controller on the remote end
+# (budget_steps.csv in its working directory) next to the plot script.
+# Only present when the controller ran a timed schedule (BUDGET_SCHEDULE
+# / --budget-schedule).
+
+# --- Configuration ---
+REMOTE_USER="dedongx"
+REMOTE_IP="192.168.1.103"
+SSH_KEY="/home/dedongx/.ssh/id_ed25519"
+
+REMOTE_STEP_LOG="/home/dedongx/power_aware_storage/budget_steps.csv"
+
+ssh_opts=(-i "$SSH_KEY" -o IdentitiesOnly=yes)
+
+if scp "${ssh_opts[@]}" "${REMOTE_USER}@${REMOTE_IP}:${REMOTE_STEP_LOG}" budget_steps.csv; then
+  echo "Saved: budget_steps.csv"
+else
+  echo "No budget step log on the remote; the plot uses dynamic_power_budget.schedule"
+  rm -f budget_steps.csv
+fi
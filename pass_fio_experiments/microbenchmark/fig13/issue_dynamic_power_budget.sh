@@ -1,4 +1,6 @@
 # issues dynamic power budget on remote end
+# (each step pays SSH latency; for exact step times run the same steps
+# from dynamic_power_budget.schedule inside the controller instead)
 current_path=$(pwd)
 configs_path="$current_path/../../../utils"
 # Write 400W power budget
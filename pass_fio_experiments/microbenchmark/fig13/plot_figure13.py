@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
@@ -27,12 +28,44 @@ plt.plot(pass_df['Seconds'], pass_df['Power (Watts)'], label='PASS (Ours)', line
 # Define stepped power cap line
 max_time = max(pass_df['Seconds'].max(), spdk_df['Seconds'].max())
 
-# Plot step lines: 400W -> 350W -> 300W
-plt.hlines(400, 0, 120, colors='green', linestyles='dashed', label='Power budget')
-plt.hlines(350, 120, 240, colors='green', linestyles='dashed')
-plt.hlines(300, 240, 360, colors='green', linestyles='dashed')
-plt.hlines(400, 360, 480, colors='green', linestyles='dashed')
-plt.hlines(375, 480, max_time, colors='green', linestyles='dashed')
+# Plot step lines from the real step times the controller logged
+# (budget_steps.csv, fetched from the remote end), else from the schedule
+# both controllers ran. The log holds every run of both controllers, so take
+# the latest PASS run and place its steps on the trace's Seconds axis with
+# the remote start time read_remote_power.sh saved (pass_timeseries.start).
+def logged_steps(path, trace_start_file):
+    log = pd.read_csv(path)
+    for controller in ('pass', 'thunderbolt'):
+        runs = log[log['controller'] == controller]
+        if len(runs):
+            break
+    else:
+        return None
+    run = runs[runs['run_start_unix'] == runs['run_start_unix'].max()]
+    if os.path.exists(trace_start_file):
+        with open(trace_start_file) as f:
+            trace_start = float(f.read().strip())
+        times = run['unix_time'] - trace_start
+    else:
+        print(f"{trace_start_file} not found; budget steps are placed "
+              "relative to the schedule start, not the trace")
+        times = run['actual_sec']
+    return list(zip(times, run['watts']))
+
+steps = None
+if os.path.exists('budget_steps.csv'):
+    steps = logged_steps('budget_steps.csv', 'pass_timeseries.start')
+if not steps:
+    steps = []
+    with open('dynamic_power_budget.schedule') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split()
+            if len(fields) == 2:
+                steps.append((float(fields[0]), float(fields[1])))
+ends = [t for t, _ in steps[1:]] + [max_time]
+for i, ((start, watts), end) in enumerate(zip(steps, ends)):
+    plt.hlines(watts, start, end, colors='green', linestyles='dashed',
+               label='Power budget' if i == 0 else None)
 
 # Formatting
 # plt.title('System Power Over Time')
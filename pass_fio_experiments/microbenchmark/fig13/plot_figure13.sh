@@ -41,5 +41,6 @@ echo "Cleaning up"
 $configs_path/disconnect_nvmf_target.sh spdk
 $configs_path/stop_spdk_nvmf_target.sh
 
-# Plot results
+# Plot results (with the step times logged on the remote end, if any)
+bash fetch_budget_steps.sh
 python3 plot_figure13.py
\ No newline at end of file
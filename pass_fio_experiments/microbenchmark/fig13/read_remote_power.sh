@@ -31,11 +31,14 @@ echo "Base name: $BASE_NAME"
 echo "Duration: ${DURATION}s"
 
 # Run the collector on the remote for DURATION seconds with experiment name = BASE_NAME.
-# Then, print out the newest .power file path so we can scp it back.
+# Print the remote clock at the start (the trace's Seconds origin, on the
+# same clock as the controller's budget_steps.csv), then the newest .power
+# file path so we can scp it back.
 REMOTE_OUT=$(
   ssh "${ssh_opts[@]}" "${REMOTE_USER}@${REMOTE_IP}" bash -lc "'
     set -euo pipefail
     mkdir -p \"$REMOTE_DIR\"
+    echo \"START:\$(date +%s.%N)\"
     sudo \"$REMOTE_SCRIPT\" -t ${DURATION} -d \"$REMOTE_DIR\" -e \"${BASE_NAME}\"
 
     POWER_OUT=\$(ls -1t \"$REMOTE_DIR\"/*_${BASE_NAME}.power | head -n1 || true)
@@ -56,6 +59,13 @@ if [[ -z "${POWER_PATH:-}" ]]; then
   exit 3
 fi
 
+# Remote start time, for plot_figure13.py to align the budget steps
+START_TIME="$(echo "$REMOTE_OUT" | awk -F: '/^START:/{print $2}')"
+if [[ -n "${START_TIME:-}" ]]; then
+  echo "$START_TIME" > "${BASE_NAME}.start"
+  echo "Saved: ${BASE_NAME}.start"
+fi
+
 echo "== Remote power file =="
 echo "$POWER_PATH"
 